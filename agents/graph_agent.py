@@ -49,6 +49,8 @@ def create_graph_agent(graph_mcp):
             - User asks what a specific file says → call read_file or read_multiple_files.
             - Files already in [Session Context] → use their IDs directly, do not search again.
             - Question spans multiple files already found → call read_multiple_files with all relevant IDs in one call.
+            - Looking for a specific fact in a file (a rule, amount, code) → pass the key terms as `query`
+              to read_file / read_multiple_files so the relevant sections are returned, not just the start.
 
             STRICT TOOL SELECTION RULES — follow these exactly:
             - ONLY call tools that are directly required by the user's current request.
@@ -60,12 +62,18 @@ def create_graph_agent(graph_mcp):
             - NEVER call the same tool twice in a single turn unless each call uses different parameters required by the request.
             - If a tool returns sufficient data, stop and answer — do NOT call more tools.
             - NEVER call read_email more than once for the same email ID.
+            - Need the text of several emails → call read_emails once with all IDs instead of read_email per ID.
             - If read_email returns empty or unreadable content, report that to the user instead of retrying.
 
             PERSON RESOLUTION
             - Whenever the user mentions a person (name, sender, colleague), call findpeople first.
             - Never guess or fabricate an email address.
 
+            BROAD SEARCH
+            - Question about a topic, customer or project that may span emails, files and meetings
+              ("everything about X", "what do we have on Y") → call search_everything once instead of
+              search_email, search_files and search_calendar separately.
+
             EMAIL SEARCH
             - When searching by person, resolve with findpeople first, then pass the resolved email to search_email.
             - Prefer search_email over list_email when any filter is implied.
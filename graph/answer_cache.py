@@ -0,0 +1,150 @@
+"""
+Semantic answer cache for search_documents.
+
+Users keep asking the same HR and policy questions in slightly different
+words. Every answer is kept with the embedding of the question that produced
+it; a new question whose embedding lies within GRAPHRAG_ANSWER_CACHE_DISTANCE
+(cosine distance, default 0.05) of a cached one gets that answer and its
+sources back without the LanceDB search and the chat completion.
+
+Questions that differ only in a policy code, article number or product name
+embed almost identically, yet need different answers. So every entry also
+keeps the question's exact terms (codes, numbers and words that are rare in
+the index, see _GraphRAGIndex.exact_terms), and a hit needs the same set.
+
+An entry is only served while it is younger than GRAPHRAG_ANSWER_CACHE_TTL
+seconds (default 3600) and while the index on disk has the version it was
+answered from; once the index is rebuilt, every older entry is dropped.
+GRAPHRAG_ANSWER_CACHE=off disables the cache.
+
+The answers come from the shared document index, not from a user's own data,
+so one cache serves every user. Lookups are in memory (one matrix-vector
+product over at most a few hundred entries), so the searcher calls it on the
+event loop; a lock keeps it safe for callers in threads.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+log = logging.getLogger("graph.graphrag")
+
+_DEFAULT_DISTANCE = 0.05
+_DEFAULT_TTL = 3600.0
+_DEFAULT_MAX_ENTRIES = 512
+
+
+@dataclass
+class _Entry:
+    answer: dict
+    version: str
+    created: float
+    tokens: int
+    terms: frozenset[str]
+
+
+def _unit(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_distance: float = _DEFAULT_DISTANCE,
+        ttl: float = _DEFAULT_TTL,
+        max_entries: int = _DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_distance = max_distance
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._vectors: np.ndarray | None = None    # one unit vector per row
+        self._entries: list[_Entry] = []
+        self._version: str | None = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+        self.term_mismatches = 0
+        self.tokens_saved = 0
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache | None":
+        if os.environ.get("GRAPHRAG_ANSWER_CACHE", "on").lower() in ("off", "0", "false", "no"):
+            return None
+        return cls(
+            max_distance=float(os.environ.get("GRAPHRAG_ANSWER_CACHE_DISTANCE", _DEFAULT_DISTANCE)),
+            ttl=float(os.environ.get("GRAPHRAG_ANSWER_CACHE_TTL", _DEFAULT_TTL)),
+        )
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._entries:
+                log.info("[answer_cache] index version changed, dropping %d answer(s)", len(self._entries))
+                self.invalidated += len(self._entries)
+            self._vectors, self._entries, self._version = None, [], version
+
+    def _remove(self, rows: list[int]) -> None:
+        keep = [i for i in range(len(self._entries)) if i not in set(rows)]
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else None
+
+    def get(self, vector, version: str, terms: frozenset[str] = frozenset()) -> dict | None:
+        """The cached answer of the nearest earlier question with the same *terms*, if close enough."""
+        q = _unit(vector)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is not None:
+                now = self._clock()
+                old = [i for i, e in enumerate(self._entries) if now - e.created > self._ttl]
+                if old:
+                    self.expired += len(old)
+                    self._remove(old)
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            similarity = self._vectors @ q
+            nearest = int(np.argmax(similarity))
+            same_terms = [i for i, e in enumerate(self._entries) if e.terms == terms]
+            best = max(same_terms, key=lambda i: similarity[i]) if same_terms else nearest
+            if not same_terms or 1.0 - float(similarity[best]) > self.max_distance:
+                if 1.0 - float(similarity[nearest]) <= self.max_distance:
+                    self.term_mismatches += 1
+                self.misses += 1
+                return None
+            entry = self._entries[best]
+            self.hits += 1
+            self.tokens_saved += entry.tokens
+            log.info("[answer_cache] hit (distance %.4f)", 1.0 - float(similarity[best]))
+            return {**entry.answer, "sources": list(entry.answer.get("sources", []))}
+
+    def put(
+        self, vector, answer: dict, version: str, tokens: int = 0, terms: frozenset[str] = frozenset()
+    ) -> None:
+        q = _unit(vector)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is not None and len(self._entries) >= self._max_entries:
+                self._remove([0])                       # oldest first
+            self._entries.append(_Entry(answer, version, self._clock(), tokens, frozenset(terms)))
+            self._vectors = q[None, :] if self._vectors is None else np.vstack([self._vectors, q])
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "invalidated": self.invalidated,
+            "term_mismatches": self.term_mismatches,
+            "llm_calls_saved": self.hits,
+            "llm_tokens_saved": self.tokens_saved,
+        }
@@ -0,0 +1,76 @@
+"""
+Okapi BM25 over an in-memory corpus, with an inverted index.
+
+Used to rank the sections of one document against a query (read_file with a
+``query``) and, over all GraphRAG text units, as the keyword half of the
+hybrid search_documents retrieval. Tokens are lower-cased runs of letters and
+digits, accents kept, so policy codes ("HR-12" → "hr", "12") and Dutch/French
+words both match.
+
+Postings are kept per term, so a query only touches the documents that
+contain one of its terms.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25:
+    """BM25 scores of *docs* (lists of tokens) for a query."""
+
+    def __init__(self, docs: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._n = len(docs)
+        lengths = [len(d) for d in docs]
+        avg = (sum(lengths) / self._n) if self._n else 0.0
+        # Per document the length part of the denominator, computed once.
+        self._norm = [k1 * (1 - b + b * n / avg) if avg else k1 for n in lengths]
+        self._postings: dict[str, tuple[list[int], list[int]]] = {}
+        for i, doc in enumerate(docs):
+            for term, tf in Counter(doc).items():
+                ids, tfs = self._postings.setdefault(term, ([], []))
+                ids.append(i)
+                tfs.append(tf)
+        self._idf = {
+            t: math.log(1 + (self._n - len(ids) + 0.5) / (len(ids) + 0.5))
+            for t, (ids, _) in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return self._n
+
+    def document_frequency(self, term: str) -> int:
+        """Number of documents that contain *term*."""
+        posting = self._postings.get(term)
+        return len(posting[0]) if posting else 0
+
+    def _accumulate(self, query: list[str]) -> dict[int, float]:
+        acc: dict[int, float] = {}
+        k1 = self.k1
+        for term in dict.fromkeys(query):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            idf = self._idf[term]
+            for i, tf in zip(*posting):
+                acc[i] = acc.get(i, 0.0) + idf * tf * (k1 + 1) / (tf + self._norm[i])
+        return acc
+
+    def scores(self, query: list[str]) -> list[float]:
+        out = [0.0] * self._n
+        for i, score in self._accumulate(query).items():
+            out[i] = score
+        return out
+
+    def top(self, query: list[str], k: int) -> list[tuple[int, float]]:
+        """The *k* best (document index, score) pairs with a score above zero, best first."""
+        acc = self._accumulate(query)
+        return heapq.nlargest(k, acc.items(), key=lambda kv: (kv[1], -kv[0]))
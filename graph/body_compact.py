@@ -0,0 +1,304 @@
+"""
+Compaction of email bodies: quoted reply history and repeated signatures out.
+
+In a long thread most of every body is the history quoted below the reply,
+which the agent can read in the earlier messages themselves, and a signature
+it has seen many times. After HTML-to-text conversion (and before the body is
+truncated) a body is reduced to what is new in it:
+
+- reply history starts at the first quote boundary: an Outlook header block
+  ("From:/Van: ... Sent:/Verzonden: ..."), an "-----Original Message-----"
+  or underscore separator, an "On ... wrote:" line, or a trailing block of
+  "> " lines. A quoted message is only cut when its source is at hand: an
+  earlier message of the same conversation from the quoted sender that the
+  compactor has returned before, or that the caller found in the mailbox
+  (the mail mirror). Quoted messages are cut newest first up to the first
+  one without a source, which stays, with everything older: a user who
+  joined the thread late, or history from outside the mailbox, keeps it.
+  One line takes the place of the cut messages (count, latest sender and
+  date). Forwards (FW:/Fwd: subjects or forward markers) are left whole:
+  there the quoted part is the content.
+- a signature is recognised by repetition: the closing blocks of each body
+  (starting after a blank line or at a "--" delimiter) are remembered per
+  sender and message, and a block that closed at least two *other* messages
+  of the sender is replaced by a short note. Re-reading the same message
+  never matches its own blocks, and a block much longer than the text above
+  it is content, not a signature.
+
+One compactor per user (it lives on the repository); the sender and thread
+memories are bounded. GRAPH_BODY_COMPACTION=0 turns compaction off.
+"""
+import logging
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable
+
+from graph.models import Email
+
+log = logging.getLogger("graph.body_compact")
+
+_MAX_SENDERS = 512
+_MAX_BLOCKS_PER_SENDER = 128
+_MAX_THREADS = 1024
+_MAX_THREAD_MESSAGES = 64
+_MAX_SIGNATURE_LINES = 12
+_MIN_SIGNATURE_CHARS = 20
+_MAX_SIGNATURE_CHARS = 400
+_SIGNATURE_RATIO = 4    # a signature is at most this many times the text kept above it
+_SIGNATURE_SEEN = 2     # other messages a closing block must have ended before it is cut
+_HEADER_LOOKAHEAD = 6   # lines after From: in which the other header fields must follow
+
+_HEADER_FROM = re.compile(r"^\W{0,2}(?:From|Van|De|Von|Da)\W{0,2}:\W{0,2}\s*(?P<who>\S.*)$", re.IGNORECASE)
+_HEADER_FIELD = re.compile(
+    r"^\W{0,2}(?P<field>Sent|Date|Verzonden|Datum|Envoyé|Gesendet|Subject|Onderwerp|Objet|Betreff|To|Aan|À|An)"
+    r"\W{0,2}:\W{0,2}\s*(?P<value>.*)$",
+    re.IGNORECASE,
+)
+_SEPARATOR = re.compile(
+    r"^\s*(?:-{2,}\s*(?:Original Message|Oorspronkelijk bericht|Message d'origine|Ursprüngliche Nachricht)\s*-{2,}|_{10,})\s*$",
+    re.IGNORECASE,
+)
+# "On <date>, <who> wrote:", "Op <date> schreef <who>:", ...
+_WROTE = re.compile(
+    r"^\s*(?:On|Op|Le|Am)\s.{5,200}\b(?:wrote|schreef|a écrit|schrieb)\b.{0,120}:\s*$", re.IGNORECASE
+)
+_FORWARD_MARKER = re.compile(
+    r"^\s*(?:-{2,}\s*(?:Forwarded message|Doorgestuurd bericht|Message transféré|Weitergeleitete Nachricht)\s*-{2,}"
+    r"|Begin forwarded message:)\s*$",
+    re.IGNORECASE,
+)
+_FORWARD_SUBJECT = re.compile(r"^\s*(?:FW|FWD|TR|WG|Doorst)\s*:", re.IGNORECASE)
+_SIG_DELIMITER = re.compile(r"^--\s*$")
+_DATE_FIELDS = {"sent", "date", "verzonden", "datum", "envoyé", "gesendet"}
+
+
+def compaction_enabled() -> bool:
+    return os.environ.get("GRAPH_BODY_COMPACTION", "1").lower() not in ("0", "false", "no")
+
+
+def _is_header(lines: list[str], i: int) -> bool:
+    """Line *i* starts an Outlook-style quoted header block."""
+    if not _HEADER_FROM.match(lines[i]):
+        return False
+    # At least two of Sent/To/Subject/...: "From: Brussel\nTo: Antwerpen" in a
+    # travel mail is not a quoted message.
+    return sum(1 for l in lines[i + 1:i + 1 + _HEADER_LOOKAHEAD] if _HEADER_FIELD.match(l)) >= 2
+
+
+def _quote_start(lines: list[str]) -> int | None:
+    """Index of the first line of quoted history, or None."""
+    for i, line in enumerate(lines):
+        if _SEPARATOR.match(line) or _WROTE.match(line) or _is_header(lines, i):
+            return i
+        if line.startswith(">") and all(not l.strip() or l.startswith(">") for l in lines[i:]):
+            return i
+    return None
+
+
+def _quoted_messages(quoted: list[str]) -> list[tuple[int, str | None, str | None]]:
+    """(first line, sender, date) of each message in quoted history, newest first.
+
+    The sender is the From: value of a header block or the "... wrote:" line;
+    None when the history does not say (a bare block of "> " lines).
+    """
+    messages: list[list] = []
+    for i, line in enumerate(quoted):
+        if _SEPARATOR.match(line):
+            messages.append([i, None, None])
+        elif _WROTE.match(line):
+            messages.append([i, line.strip().rstrip(":"), None])
+        elif _is_header(quoted, i):
+            who, when = _HEADER_FROM.match(line)["who"].strip(), None
+            for l in quoted[i + 1:i + 1 + _HEADER_LOOKAHEAD]:
+                m = _HEADER_FIELD.match(l)
+                if m and m["field"].lower() in _DATE_FIELDS:
+                    when = m["value"].strip()
+                    break
+            last = messages[-1] if messages else None
+            if last and last[1] is None and not any(l.strip() for l in quoted[last[0] + 1:i]):
+                last[1:] = [who, when]      # the header below its separator
+            else:
+                messages.append([i, who, when])
+    if not messages or messages[0][0] != 0:
+        messages.insert(0, [0, None, None])
+    return [tuple(m) for m in messages]
+
+
+def _sent_by(who: str, message: Email) -> bool:
+    who = who.casefold()
+    return any(
+        value and len(value) >= 3 and value.casefold() in who
+        for value in (message.sender_email, message.sender_name)
+    )
+
+
+def _thread_reference(cut: list[tuple[int, str | None, str | None]]) -> str:
+    _, who, when = cut[0]
+    latest = f", latest from {who}" + (f" ({when})" if when else "") if who else ""
+    return f"[... quoted thread history omitted: {len(cut)} earlier message(s){latest} ...]"
+
+
+def _normalized(lines: list[str]) -> str:
+    return "\n".join(" ".join(l.split()) for l in lines)
+
+
+class BodyCompactor:
+    def __init__(self, max_senders: int = _MAX_SENDERS):
+        self._max_senders = max_senders
+        # sender → closing block hash → ids of the messages it closed
+        self._closings: OrderedDict[str, OrderedDict[int, set[str]]] = OrderedDict()
+        # conversation id → message id → message (without body) returned before
+        self._threads: OrderedDict[str, OrderedDict[str, Email]] = OrderedDict()
+        self.bodies = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.history_cut = 0
+        self.signatures_cut = 0
+
+    def remember(self, conversation_id: str, message: Email) -> None:
+        """Note that *message* has been returned, so later replies may cut it from their quotes."""
+        thread = self._threads.get(conversation_id)
+        if thread is None:
+            thread = self._threads[conversation_id] = OrderedDict()
+            while len(self._threads) > _MAX_THREADS:
+                self._threads.popitem(last=False)
+        self._threads.move_to_end(conversation_id)
+        thread[message.id] = message.model_copy(update={"body": None})
+        thread.move_to_end(message.id)
+        while len(thread) > _MAX_THREAD_MESSAGES:
+            thread.popitem(last=False)
+
+    def compact(
+        self,
+        text: str,
+        sender: str | None = None,
+        subject: str | None = None,
+        message_id: str | None = None,
+        *,
+        sender_name: str | None = None,
+        conversation_id: str | None = None,
+        received: datetime | str | None = None,
+        available: Iterable[Email] = (),
+    ) -> str:
+        """The new part of a plain-text email body.
+
+        *available* are messages of the conversation the caller knows can be
+        read (e.g. from the mail mirror), on top of those returned before.
+        """
+        if not text:
+            return text
+        self.bodies += 1
+        self.chars_in += len(text)
+        lines = text.split("\n")
+        current = None
+        if received is not None:
+            current = Email(
+                id=message_id or "", subject=subject or "", sender_name=sender_name or sender or "",
+                sender_email=sender, received=received,
+            )
+
+        reference, rest = None, []
+        forward = bool(subject and _FORWARD_SUBJECT.match(subject))
+        start = None if forward else _quote_start(lines)
+        if start is not None and any(l.strip() for l in lines[:start]):
+            if not any(_FORWARD_MARKER.match(l) for l in lines[:start + 1]):
+                messages = _quoted_messages(lines[start:])
+                cut = self._readable_prefix(messages, conversation_id, current, available)
+                if cut:
+                    reference = _thread_reference(cut)
+                    end = start + messages[len(cut)][0] if len(cut) < len(messages) else len(lines)
+                    log.debug("[body_compact] cut %d quoted line(s): %s", end - start, reference)
+                    rest = lines[end:]
+                    lines = lines[:start]
+                    self.history_cut += 1
+
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if sender:
+            # Without an id the body itself identifies the message.
+            lines = self._drop_signature(sender.lower(), message_id or str(hash(text)), lines)
+        if reference:
+            lines += ["", reference]
+        if rest:
+            lines += [""] + rest
+        if conversation_id and current is not None and message_id:
+            self.remember(conversation_id, current)
+
+        out = "\n".join(lines)
+        self.chars_out += len(out)
+        return out
+
+    def _readable_prefix(
+        self,
+        messages: list[tuple[int, str | None, str | None]],
+        conversation_id: str | None,
+        current: Email | None,
+        available: Iterable[Email],
+    ) -> list[tuple[int, str | None, str | None]]:
+        """The newest quoted messages that each have their own readable source."""
+        by_id = {m.id: m for m in available}
+        if conversation_id:
+            by_id.update(self._threads.get(conversation_id, {}))
+        sources = [
+            m for m in by_id.values()
+            if current is None or (m.id != current.id and m.received < current.received)
+        ]
+        cut = []
+        for quoted in messages:
+            who = quoted[1]
+            source = next((m for m in sources if who and _sent_by(who, m)), None)
+            if source is None:
+                break
+            sources.remove(source)
+            cut.append(quoted)
+        return cut
+
+    def _drop_signature(self, sender: str, message_id: str, lines: list[str]) -> list[str]:
+        seen = self._closings.get(sender)
+        if seen is None:
+            seen = self._closings[sender] = OrderedDict()
+            while len(self._closings) > self._max_senders:
+                self._closings.popitem(last=False)
+        self._closings.move_to_end(sender)
+
+        # Closing blocks of 2..12 lines that start after a blank line or at a
+        # "--" delimiter, longest first; never the whole body.
+        blocks = []
+        for k in range(min(_MAX_SIGNATURE_LINES, len(lines) - 1), 1, -1):
+            if not (_SIG_DELIMITER.match(lines[-k]) or not lines[-k - 1].strip()):
+                continue
+            block = _normalized(lines[-k:])
+            kept = len(_normalized(lines[:-k]).strip())
+            if _MIN_SIGNATURE_CHARS <= len(block) <= min(_MAX_SIGNATURE_CHARS, _SIGNATURE_RATIO * kept):
+                blocks.append((k, hash(block)))
+
+        cut = next(
+            (k for k, h in blocks if len(seen.get(h, set()) - {message_id}) >= _SIGNATURE_SEEN), 0
+        )
+        for _, h in blocks:
+            ids = seen.setdefault(h, set())
+            # Only whether enough other messages ended on it matters.
+            if len(ids) <= _SIGNATURE_SEEN:
+                ids.add(message_id)
+            seen.move_to_end(h)
+        while len(seen) > _MAX_BLOCKS_PER_SENDER:
+            seen.popitem(last=False)
+
+        if not cut:
+            return lines
+        self.signatures_cut += 1
+        kept = lines[:-cut]
+        while kept and not kept[-1].strip():
+            kept.pop()
+        return kept + ["[signature omitted]"]
+
+    def stats(self) -> dict:
+        return {
+            "bodies": self.bodies,
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+            "history_cut": self.history_cut,
+            "signatures_cut": self.signatures_cut,
+        }
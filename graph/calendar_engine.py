@@ -0,0 +1,295 @@
+"""
+Per-user calendar engine: calendarView windows + a local event index.
+
+calendarView expands recurring series into their occurrences, which
+/me/events does not. The engine keeps one rolling window (past
+_WINDOW_PAST_DAYS … next _WINDOW_FUTURE_DAYS) in memory, kept current with
+calendarView delta queries, and indexes it by attendee address, subject token
+and start time. Searches inside the window are answered from the index; ranges
+outside it are fetched once as their own calendarView and indexed on the fly.
+"""
+import asyncio
+import bisect
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import httpx
+
+from graph.models import Attendee, CalendarEvent, EmailAddress
+
+log = logging.getLogger("graph.calendar")
+
+_WINDOW_PAST_DAYS = 180
+_WINDOW_FUTURE_DAYS = 365
+_WINDOW_SLIDE_DAYS = 7          # rebuild the window once "now" has moved this far
+_DEFAULT_MAX_AGE = 60.0         # seconds before a delta refresh is due
+_MAX_RANGE_PAGES = 20
+_PREFER = 'odata.maxpagesize=200, outlook.timezone="UTC"'
+_SELECT = "id,subject,start,end,attendees,organizer,location,webLink"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> set[str]:
+    return {t.lower() for t in _TOKEN.findall(text or "")}
+
+
+def _graph_dt(value: str | None) -> datetime | None:
+    """Parse Graph's ``2026-03-01T09:00:00.0000000`` (UTC) timestamps."""
+    if not value:
+        return None
+    head, _, frac = value.rstrip("Z").partition(".")
+    dt = datetime.fromisoformat(head + (f".{frac[:6]}" if frac else ""))
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _iso(value: datetime) -> str:
+    return _utc(value).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class _Indexed:
+    event: CalendarEvent
+    start: datetime
+    location: str
+
+
+def _event_from_json(ev: dict) -> CalendarEvent:
+    organizer = (ev.get("organizer") or {}).get("emailAddress")
+    return CalendarEvent(
+        id=ev["id"],
+        subject=ev.get("subject") or "",
+        start=(ev.get("start") or {}).get("dateTime"),
+        end=(ev.get("end") or {}).get("dateTime"),
+        organizer=EmailAddress(name=organizer.get("name"), address=organizer.get("address"))
+        if organizer else None,
+        attendees=[
+            Attendee(email=EmailAddress(
+                name=a["emailAddress"].get("name"), address=a["emailAddress"].get("address")
+            ))
+            for a in ev.get("attendees") or []
+            if a.get("emailAddress")
+        ],
+        web_link=ev.get("webLink"),
+    )
+
+
+class EventIndex:
+    """In-memory event index: attendee address, subject tokens and start time."""
+
+    def __init__(self):
+        self._events: dict[str, _Indexed] = {}
+        self._by_attendee: dict[str, set[str]] = {}
+        self._by_token: dict[str, set[str]] = {}
+        self._by_start: list[tuple[datetime, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def upsert(self, ev: dict) -> None:
+        self.remove(ev["id"])
+        event = _event_from_json(ev)
+        start = _graph_dt(event.start)
+        if start is None:
+            return
+        self._events[event.id] = _Indexed(
+            event=event,
+            start=start,
+            location=((ev.get("location") or {}).get("displayName") or "").lower(),
+        )
+        for a in event.attendees:
+            if a.email.address:
+                self._by_attendee.setdefault(a.email.address.lower(), set()).add(event.id)
+        for tok in _tokens(event.subject):
+            self._by_token.setdefault(tok, set()).add(event.id)
+        bisect.insort(self._by_start, (start, event.id))
+
+    def remove(self, event_id: str) -> None:
+        entry = self._events.pop(event_id, None)
+        if entry is None:
+            return
+        for a in entry.event.attendees:
+            ids = self._by_attendee.get((a.email.address or "").lower())
+            if ids:
+                ids.discard(event_id)
+        for tok in _tokens(entry.event.subject):
+            ids = self._by_token.get(tok)
+            if ids:
+                ids.discard(event_id)
+        i = bisect.bisect_left(self._by_start, (entry.start, event_id))
+        if i < len(self._by_start) and self._by_start[i] == (entry.start, event_id):
+            del self._by_start[i]
+
+    def _time_slice(self, after: datetime | None, before: datetime | None) -> list[str]:
+        lo = 0 if after is None else bisect.bisect_left(self._by_start, (_utc(after), ""))
+        hi = len(self._by_start)
+        if before is not None:
+            hi = bisect.bisect_right(self._by_start, (_utc(before), "\uffff"))
+        return [eid for _, eid in self._by_start[lo:hi]]
+
+    def search(
+        self,
+        text: str | None = None,
+        location: str | None = None,
+        attendees: set[str] | None = None,
+        start_after: datetime | None = None,
+        start_before: datetime | None = None,
+        top: int = 25,
+        descending: bool = False,
+    ) -> list[CalendarEvent]:
+        candidates: set[str] | None = None
+        if attendees is not None:
+            candidates = set().union(*(self._by_attendee.get(a.lower(), set()) for a in attendees))
+        for tok in _tokens(text or ""):
+            # Prefix match per token, so "stand" finds "Standup".
+            ids = set().union(*(ids for t, ids in self._by_token.items() if t.startswith(tok)))
+            candidates = ids if candidates is None else candidates & ids
+
+        ordered = self._time_slice(start_after, start_before)
+        if descending:
+            ordered.reverse()
+        loc = (location or "").lower()
+        out: list[CalendarEvent] = []
+        for eid in ordered:
+            if candidates is not None and eid not in candidates:
+                continue
+            entry = self._events[eid]
+            if loc and loc not in entry.location:
+                continue
+            out.append(entry.event)
+            if len(out) >= top:
+                break
+        return out
+
+
+class CalendarEngine:
+    def __init__(
+        self,
+        get_json: Callable[..., Awaitable[dict]],
+        max_age: float = _DEFAULT_MAX_AGE,
+    ):
+        self._get_json = get_json
+        self._max_age = max_age
+        self._index = EventIndex()
+        self._window: tuple[datetime, datetime] | None = None
+        self._delta_link: str | None = None
+        self._synced_at = 0.0
+        self._lock = asyncio.Lock()
+        self.indexed_queries = 0
+        self.range_fetches = 0
+
+    def _covers(self, dt: datetime | None) -> bool:
+        """True if *dt* (None = open bound) lies inside the indexed window."""
+        if dt is None:
+            return True
+        lo, hi = self._window
+        return lo <= _utc(dt) <= hi
+
+    async def refresh(self) -> None:
+        """Make sure the window index is fresh (one delta round trip when due)."""
+        async with self._lock:
+            now = datetime.now(timezone.utc)
+            if self._window is None or now - self._window[0] > timedelta(
+                days=_WINDOW_PAST_DAYS + _WINDOW_SLIDE_DAYS
+            ):
+                self._window = (
+                    now - timedelta(days=_WINDOW_PAST_DAYS),
+                    now + timedelta(days=_WINDOW_FUTURE_DAYS),
+                )
+                self._index = EventIndex()
+                self._delta_link = None
+            elif time.monotonic() - self._synced_at < self._max_age:
+                return
+
+            try:
+                await self._sync_window()
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 410:
+                    raise
+                log.info("[calendar] delta token expired, rebuilding window")
+                self._index = EventIndex()
+                self._delta_link = None
+                await self._sync_window()
+            self._synced_at = time.monotonic()
+
+    async def _sync_window(self) -> None:
+        lo, hi = self._window
+        url = self._delta_link or (
+            f"/me/calendarView/delta?startDateTime={_iso(lo)}&endDateTime={_iso(hi)}"
+        )
+        changed = 0
+        while url:
+            page = await self._get_json(url, headers={"Prefer": _PREFER})
+            for ev in page.get("value", []):
+                if "@removed" in ev:
+                    self._index.remove(ev["id"])
+                else:
+                    self._index.upsert(ev)
+                changed += 1
+            url = page.get("@odata.nextLink")
+            self._delta_link = page.get("@odata.deltaLink", self._delta_link)
+        log.info("[calendar] window synced: %d change(s), %d event(s) indexed", changed, len(self._index))
+
+    async def _fetch_range(self, start: datetime, end: datetime) -> EventIndex:
+        """calendarView for a range outside the window, indexed on the fly."""
+        self.range_fetches += 1
+        index = EventIndex()
+        url = (
+            f"/me/calendarView?startDateTime={_iso(start)}&endDateTime={_iso(end)}"
+            f"&$select={_SELECT}&$orderby=start/dateTime"
+        )
+        for _ in range(_MAX_RANGE_PAGES):
+            page = await self._get_json(url, headers={"Prefer": _PREFER})
+            for ev in page.get("value", []):
+                index.upsert(ev)
+            url = page.get("@odata.nextLink")
+            if not url:
+                break
+        return index
+
+    async def search(
+        self,
+        text: str | None = None,
+        location: str | None = None,
+        attendees: set[str] | None = None,
+        start_after: datetime | None = None,
+        start_before: datetime | None = None,
+        top: int = 25,
+        descending: bool = False,
+    ) -> list[CalendarEvent]:
+        await self.refresh()
+        if self._covers(start_after) and self._covers(start_before):
+            index = self._index
+            self.indexed_queries += 1
+        else:
+            # An open bound spans a window's length from the given one (and at
+            # least to the window edge), so the range is never inverted.
+            lo, hi = self._window
+            span = hi - lo
+            start = _utc(start_after) if start_after else min(lo, _utc(start_before) - span)
+            end = _utc(start_before) if start_before else max(hi, _utc(start_after) + span)
+            index = await self._fetch_range(start, end)
+        return index.search(
+            text=text,
+            location=location,
+            attendees=attendees,
+            start_after=start_after,
+            start_before=start_before,
+            top=top,
+            descending=descending,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "events": len(self._index),
+            "indexed_queries": self.indexed_queries,
+            "range_fetches": self.range_fetches,
+        }
@@ -0,0 +1,148 @@
+"""
+Per-user coalescing of identical tool calls: singleflight plus a run-scoped memo.
+
+The orchestrator runs independent plan steps in parallel, and each step's
+agent tends to start with the same lookups (``find_people("Colruyt")``, the
+same file search, ...). Calls are keyed by tool name and normalized
+arguments:
+
+- while a call is in flight, identical calls join it and share its result
+  (or its exception) instead of going to Graph again;
+- when the caller identifies its orchestrator run (``X-Orchestrator-Run``
+  header), successful results are also kept for a short TTL, so later waves
+  of the same run get them without a Graph round trip. Calls from different
+  runs, or without a run id, never share memoized results.
+
+Results that carry a continuation cursor are never shared: a cursor can only
+be resumed once, so they are not memoized, and a caller that joined the call
+producing one makes its own call instead (getting its own cursor). Configuration: GRAPH_COALESCE_TTL (seconds, default 120) and
+GRAPH_COALESCE_MAX_ENTRIES (default 256).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+log = logging.getLogger("graph.coalesce")
+
+RUN_HEADER = "X-Orchestrator-Run"
+
+_DEFAULT_TTL = 120.0
+_DEFAULT_MAX_ENTRIES = 256
+
+
+def normalize_args(args: dict) -> str:
+    """Canonical form of tool arguments: None dropped, strings trimmed, keys sorted."""
+    clean = {
+        k: v.strip() if isinstance(v, str) else v
+        for k, v in args.items()
+        if v is not None
+    }
+    return json.dumps(clean, sort_keys=True, default=str)
+
+
+def _has_cursor(result: Any) -> bool:
+    return isinstance(result, dict) and bool(result.get("next_cursor"))
+
+
+def _memoizable(result: Any) -> bool:
+    if isinstance(result, dict):
+        return "error" not in result and not _has_cursor(result)
+    return True
+
+
+class CallCoalescer:
+    def __init__(
+        self,
+        ttl: float = _DEFAULT_TTL,
+        max_entries: int = _DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._memo: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self.calls = 0
+        self.upstream = 0
+        self.joined = 0
+        self.memo_hits = 0
+
+    @classmethod
+    def from_env(cls) -> "CallCoalescer":
+        return cls(
+            ttl=float(os.environ.get("GRAPH_COALESCE_TTL", _DEFAULT_TTL)),
+            max_entries=int(os.environ.get("GRAPH_COALESCE_MAX_ENTRIES", _DEFAULT_MAX_ENTRIES)),
+        )
+
+    def _memo_get(self, key: tuple) -> tuple[bool, Any]:
+        entry = self._memo.get(key)
+        if entry is None:
+            return False, None
+        expires, result = entry
+        if expires <= self._clock():
+            del self._memo[key]
+            return False, None
+        self._memo.move_to_end(key)
+        return True, result
+
+    def _memo_put(self, key: tuple, result: Any) -> None:
+        self._memo[key] = (self._clock() + self._ttl, result)
+        self._memo.move_to_end(key)
+        while len(self._memo) > self._max_entries:
+            self._memo.popitem(last=False)
+
+    async def run(
+        self, tool: str, args: dict, call: Callable[[], Awaitable], run_id: str | None = None
+    ):
+        """Result of ``call()``, shared with identical concurrent (and, per run, recent) calls."""
+        self.calls += 1
+        args_key = normalize_args(args)
+        if run_id:
+            found, result = self._memo_get((run_id, tool, args_key))
+            if found:
+                self.memo_hits += 1
+                log.info("[coalesce] %s%s served from run memo", tool, args_key)
+                return result
+
+        key = (tool, args_key)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            log.info("[coalesce] %s%s joined in-flight call", tool, args_key)
+            # A joiner giving up must not cancel the call for everyone else.
+            result = await asyncio.shield(pending)
+            if not _has_cursor(result):
+                self.joined += 1
+                return result
+            # The cursor belongs to the first caller; this one needs its own.
+            log.info("[coalesce] %s%s result has a cursor, calling again", tool, args_key)
+            self.upstream += 1
+            return await call()
+
+        self.upstream += 1
+        task = asyncio.ensure_future(call())
+        self._inflight[key] = task
+
+        def done(t: asyncio.Future) -> None:
+            if self._inflight.get(key) is t:
+                del self._inflight[key]
+            if t.cancelled() or t.exception() is not None:
+                return
+            if run_id and _memoizable(t.result()):
+                self._memo_put((run_id, tool, args_key), t.result())
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream,
+            "joined_inflight": self.joined,
+            "memo_hits": self.memo_hits,
+            "deduplicated": self.joined + self.memo_hits,
+            "memo_entries": len(self._memo),
+        }
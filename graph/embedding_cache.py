@@ -0,0 +1,143 @@
+"""
+Two-tier cache of query embeddings for search_documents.
+
+The same policy questions come back all the time ("what is the expense
+policy?"), and each one used to cost an embeddings round trip to Azure.
+Embeddings are looked up by (embedding deployment, normalized query) in:
+
+1. an in-process LRU (GRAPHRAG_EMBEDDING_CACHE_SIZE entries, default 1024);
+2. a SQLite file that survives restarts and is shared by the workers of a
+   host (GRAPHRAG_EMBEDDING_CACHE, default graph/graphrag/cache/
+   query_embeddings.sqlite; "off" keeps the memory tier only).
+
+Normalization folds case, Unicode forms, whitespace and leading/trailing
+punctuation, so "What is the expense policy?" and "what is the  expense
+policy" share one entry. Vectors are stored as float32.
+
+The searcher looks up the memory tier on the event loop (get_memory) and
+runs the SQLite tier, reads and writes, through asyncio.to_thread, so disk
+I/O never blocks other requests; a lock serializes access across threads.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger("graph.graphrag")
+
+_DEFAULT_SIZE = 1024
+_DEFAULT_PATH = Path(__file__).parent / "graphrag" / "cache" / "query_embeddings.sqlite"
+
+_EDGE_PUNCT = re.compile(r"^[\W_]+|[\W_]+$", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    deployment TEXT NOT NULL,
+    query      TEXT NOT NULL,
+    vector     BLOB NOT NULL,
+    created    REAL NOT NULL,
+    PRIMARY KEY (deployment, query)
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return _EDGE_PUNCT.sub("", " ".join(text.split()))
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path | None = None, max_entries: int = _DEFAULT_SIZE):
+        self._max_entries = max_entries
+        self._memory: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        value = os.environ.get("GRAPHRAG_EMBEDDING_CACHE", "")
+        path = None if value.lower() in ("off", "0", "none") else Path(value) if value else _DEFAULT_PATH
+        size = int(os.environ.get("GRAPHRAG_EMBEDDING_CACHE_SIZE", _DEFAULT_SIZE))
+        try:
+            return cls(path, size)
+        except sqlite3.Error as exc:
+            log.warning("[embedding_cache] disk tier unavailable (%s), memory only", exc)
+            return cls(None, size)
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def get_memory(self, deployment: str, query: str) -> np.ndarray | None:
+        """The memory tier only (no I/O); a miss here is not counted."""
+        key = (deployment, normalize_query(query))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return vector
+
+    def get(self, deployment: str, query: str) -> np.ndarray | None:
+        key = (deployment, normalize_query(query))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE deployment = ? AND query = ?", key
+                ).fetchone()
+                if row:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, deployment: str, query: str, vector) -> np.ndarray:
+        """Store *vector* for *query*; returns it as the float32 array that is cached."""
+        key = (deployment, normalize_query(query))
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings(deployment, query, vector, created) VALUES (?, ?, ?, ?)",
+                    (*key, vector.tobytes(), time.time()),
+                )
+                self._db.commit()
+        return vector
+
+    def _remember(self, key: tuple[str, str], vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,402 @@
+"""
+Budget-aware streaming text extraction for OneDrive files.
+
+The classic path downloads the whole file, builds a python-docx / openpyxl
+object model and only then truncates the text. For docx/xlsx this module reads
+the zip central directory with one ranged request at the end of the file, then
+streams only the parts it needs (word/document.xml, xl/sharedStrings.xml, the
+sheets) through an incremental inflater and XML pull parser. Reading stops as
+soon as the character budget is spent, so memory and latency depend on the
+budget, not on the size of the file.
+
+Anything this path cannot handle (servers that ignore Range, zip64, exotic
+compression) raises StreamUnsupported and the caller falls back to a full
+download.
+"""
+import asyncio
+import codecs
+import io
+import logging
+import struct
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import httpx
+
+from graph.office_text import (
+    date_styles,
+    docx_block_lines,
+    local,
+    render_row,
+    row_cells,
+    shared_string,
+    sheet_parts,
+)
+
+log = logging.getLogger("graph.file_stream")
+
+_TAIL_BYTES = 16 * 1024             # EOCD + (usually) the whole central directory
+_MAX_CENTRAL_DIR = 8 * 1024 * 1024  # larger directories → fall back
+_CHUNK = 64 * 1024
+_INFLATE_STEP = 256 * 1024          # max inflated bytes per decompress() call
+_RANGE_SLACK = 64                   # extra bytes requested per member for header differences
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_EOCD = struct.Struct("<4s4H2LH")
+
+STREAMABLE_SUFFIXES = (".docx", ".docm", ".xlsx", ".xlsm")
+
+
+class StreamUnsupported(Exception):
+    """The file cannot be extracted with ranged reads; use a full download."""
+
+
+@dataclass
+class ExtractResult:
+    text: str
+    truncated: bool
+    bytes_read: int
+    total_bytes: int
+    skipped_parts: list[str]
+
+    def render(self) -> str:
+        if not self.truncated:
+            return self.text
+        note = (
+            f"stopped after {len(self.text):,} characters, "
+            f"read {_size(self.bytes_read)} of {_size(self.total_bytes)}"
+        )
+        if self.skipped_parts:
+            note += f"; not read: {', '.join(self.skipped_parts)}"
+        return f"{self.text}\n\n[... content truncated: {note} ...]"
+
+
+def _size(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class _Budget:
+    """Collects text parts until ``limit`` characters have been gathered."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts: list[str] = []
+        self.used = 0
+        self.full = False
+
+    def add(self, part: str) -> bool:
+        """Append *part* (cut to what is left); returns False once the budget is spent."""
+        if self.full:
+            return False
+        cost = len(part) + (1 if self.parts else 0)
+        if self.used + cost > self.limit:
+            room = self.limit - self.used - (1 if self.parts else 0)
+            if room > 0:
+                self.parts.append(part[:room])
+            self.used = self.limit
+            self.full = True
+            return False
+        self.parts.append(part)
+        self.used += cost
+        return True
+
+    def text(self) -> str:
+        return "\n".join(self.parts)
+
+
+class RangeReader:
+    """Ranged reads against a pre-authenticated download URL."""
+
+    def __init__(self, client: httpx.AsyncClient, url: str, size: int):
+        self._client = client
+        self._url = url
+        self.size = size
+        self.bytes_read = 0
+
+    async def read(self, start: int, end: int) -> bytes:
+        """Bytes ``start``..``end`` inclusive."""
+        out = bytearray()
+        async for chunk in self.stream(start, end):
+            out += chunk
+        return bytes(out)
+
+    async def stream(self, start: int, end: int) -> AsyncIterator[bytes]:
+        headers = {"Range": f"bytes={start}-{end}"}
+        async with self._client.stream("GET", self._url, headers=headers) as resp:
+            if resp.status_code != 206:
+                resp.raise_for_status()
+                raise StreamUnsupported(f"server ignored Range (HTTP {resp.status_code})")
+            async for chunk in resp.aiter_bytes(_CHUNK):
+                self.bytes_read += len(chunk)
+                yield chunk
+
+
+class _TailFile(io.RawIOBase):
+    """Seekable view of a file of which only the bytes from ``start`` are known.
+
+    Enough for zipfile to read the end-of-central-directory record and the
+    central directory; member data is streamed separately.
+    """
+
+    def __init__(self, data: bytes, start: int, size: int):
+        self._data = data
+        self._start = start
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        base = {0: 0, 1: self._pos, 2: self._size}[whence]
+        self._pos = base + offset
+        return self._pos
+
+    def read(self, n: int = -1) -> bytes:
+        if self._pos < self._start:
+            raise StreamUnsupported("zip structure lies outside the fetched tail")
+        lo = self._pos - self._start
+        hi = len(self._data) if n is None or n < 0 else lo + n
+        out = self._data[lo:hi]
+        self._pos += len(out)
+        return out
+
+
+async def _central_directory(reader: RangeReader) -> dict[str, zipfile.ZipInfo]:
+    start = max(0, reader.size - _TAIL_BYTES)
+    tail = await reader.read(start, reader.size - 1)
+    at = tail.rfind(b"PK\x05\x06")
+    if at < 0 or at + _EOCD.size > len(tail):
+        raise StreamUnsupported("no end-of-central-directory record in tail")
+    _, _, _, _, _, cd_size, cd_offset, _ = _EOCD.unpack_from(tail, at)
+    if cd_offset == 0xFFFFFFFF:
+        raise StreamUnsupported("zip64 archive")
+    if cd_offset < start:
+        if reader.size - cd_offset > _MAX_CENTRAL_DIR:
+            raise StreamUnsupported(f"central directory of {cd_size} bytes")
+        tail = await reader.read(cd_offset, start - 1) + tail
+        start = cd_offset
+    try:
+        with zipfile.ZipFile(_TailFile(tail, start, reader.size)) as zf:
+            return {info.filename: info for info in zf.infolist()}
+    except zipfile.BadZipFile as exc:
+        raise StreamUnsupported(f"bad zip: {exc}") from exc
+
+
+async def _member_chunks(reader: RangeReader, info: zipfile.ZipInfo) -> AsyncIterator[bytes]:
+    """Inflated bytes of one zip member, streamed with ranged GETs."""
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        inflater = zlib.decompressobj(-15)
+    elif info.compress_type == zipfile.ZIP_STORED:
+        inflater = None
+    else:
+        raise StreamUnsupported(f"compression method {info.compress_type}")
+
+    # The local header usually repeats the central directory's name and extra
+    # field; if it turns out longer, the missing tail is fetched with one more
+    # range request.
+    pos = info.header_offset
+    expected = _LOCAL_HEADER.size + len(info.orig_filename.encode()) + len(info.extra)
+    end = pos + expected + info.compress_size + _RANGE_SLACK
+    header = bytearray()
+    skip: int | None = None
+    remaining = info.compress_size
+    while remaining > 0:
+        start = pos
+        async for chunk in reader.stream(pos, min(reader.size, end) - 1):
+            pos += len(chunk)
+            if skip is None:
+                header += chunk
+                if len(header) < _LOCAL_HEADER.size:
+                    continue
+                fields = _LOCAL_HEADER.unpack_from(header)
+                if fields[0] != b"PK\x03\x04":
+                    raise StreamUnsupported(f"bad local header for {info.filename}")
+                skip = _LOCAL_HEADER.size + fields[9] + fields[10]
+                end = info.header_offset + skip + info.compress_size
+                chunk, header = bytes(header), None
+            if skip:
+                cut = min(skip, len(chunk))
+                chunk, skip = chunk[cut:], skip - cut
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            if inflater is None:
+                yield chunk
+            else:
+                data = inflater.decompress(chunk, _INFLATE_STEP)
+                while data:
+                    yield data
+                    data = inflater.decompress(inflater.unconsumed_tail, _INFLATE_STEP)
+            if remaining <= 0:
+                return
+        if pos == start or pos >= reader.size:
+            raise StreamUnsupported(f"{info.filename}: range read ended early")
+
+
+async def _elements(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[ET.Element, ET.Element | None]]:
+    """Yield ``(element, parent)`` as each element closes.
+
+    Callers detach handled elements from their parent so the partial tree
+    never grows beyond the element currently being parsed.
+    """
+    parser = ET.XMLPullParser(("start", "end"))
+    stack: list[ET.Element] = []
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            parser.feed(chunk)
+            for event, el in parser.read_events():
+                if event == "start":
+                    stack.append(el)
+                else:
+                    stack.pop()
+                    yield el, (stack[-1] if stack else None)
+
+
+# docx ------------------------------------------------------------------------
+
+async def _docx(reader: RangeReader, members: dict, budget: _Budget) -> list[str]:
+    info = members.get("word/document.xml")
+    if info is None:
+        raise StreamUnsupported("no word/document.xml")
+    async with aclosing(_elements(_member_chunks(reader, info))) as events:
+        async for el, parent in events:
+            if parent is None or local(parent.tag) != "body":
+                continue
+            for line in docx_block_lines(el):
+                if not budget.add(line):
+                    break
+            parent.remove(el)
+            if budget.full:
+                return ["rest of document"]
+    return []
+
+
+# xlsx ------------------------------------------------------------------------
+
+class _SharedStrings:
+    """xl/sharedStrings.xml, parsed lazily up to the highest index requested."""
+
+    def __init__(self, reader: RangeReader, info: zipfile.ZipInfo | None):
+        self._values: list[str] = []
+        self._events = _elements(_member_chunks(reader, info)) if info else None
+
+    async def get(self, index: int) -> str:
+        while len(self._values) <= index and self._events is not None:
+            try:
+                el, parent = await anext(self._events)
+            except StopAsyncIteration:
+                self._events = None
+                break
+            if local(el.tag) == "si":
+                self._values.append(shared_string(el))
+                parent.remove(el)
+        return self._values[index] if index < len(self._values) else ""
+
+    async def aclose(self) -> None:
+        if self._events is not None:
+            await self._events.aclose()
+
+
+async def _small_member(reader: RangeReader, info: zipfile.ZipInfo) -> ET.Element:
+    data = bytearray()
+    async for chunk in _member_chunks(reader, info):
+        data += chunk
+    return ET.fromstring(bytes(data))
+
+
+async def _xlsx(reader: RangeReader, members: dict, budget: _Budget) -> list[str]:
+    if "xl/workbook.xml" not in members or "xl/_rels/workbook.xml.rels" not in members:
+        raise StreamUnsupported("no workbook part")
+    workbook, rels = await asyncio.gather(
+        _small_member(reader, members["xl/workbook.xml"]),
+        _small_member(reader, members["xl/_rels/workbook.xml.rels"]),
+    )
+    styles = members.get("xl/styles.xml")
+    dates = date_styles(await _small_member(reader, styles) if styles else None)
+    sheets = [(name, members[path]) for name, path in sheet_parts(workbook, rels) if path in members]
+
+    strings = _SharedStrings(reader, members.get("xl/sharedStrings.xml"))
+    try:
+        for n, (name, info) in enumerate(sheets):
+            if not budget.add(f"=== Sheet: {name} ==="):
+                return [f"sheet '{s}'" for s, _ in sheets[n:]]
+            async with aclosing(_elements(_member_chunks(reader, info))) as events:
+                async for el, parent in events:
+                    if local(el.tag) != "row":
+                        continue
+                    line = render_row([
+                        (col, await strings.get(int(idx)) if idx is not None else text)
+                        for col, idx, text in row_cells(el, dates)
+                    ])
+                    parent.remove(el)
+                    if line.strip() and not budget.add(line):
+                        rest = [f"sheet '{s}'" for s, _ in sheets[n + 1:]]
+                        return [f"rest of sheet '{name}'"] + rest
+    finally:
+        await strings.aclose()
+    return []
+
+
+# entry points ----------------------------------------------------------------
+
+async def extract_office_text(
+    client: httpx.AsyncClient, url: str, size: int, name: str, max_chars: int
+) -> ExtractResult:
+    """Stream the text of a docx/xlsx at *url* until *max_chars* is reached."""
+    reader = RangeReader(client, url, size)
+    members = await _central_directory(reader)
+    budget = _Budget(max_chars)
+    try:
+        if name.lower().endswith((".xlsx", ".xlsm")):
+            skipped = await _xlsx(reader, members, budget)
+        else:
+            skipped = await _docx(reader, members, budget)
+    except (ET.ParseError, ValueError) as exc:
+        raise StreamUnsupported(f"xml: {exc}") from exc
+    result = ExtractResult(
+        text=budget.text(),
+        truncated=budget.full,
+        bytes_read=reader.bytes_read,
+        total_bytes=size,
+        skipped_parts=skipped,
+    )
+    log.info(
+        "[file_stream] %s: %d chars from %d of %d bytes%s",
+        name, len(result.text), reader.bytes_read, size, " (truncated)" if result.truncated else "",
+    )
+    return result
+
+
+async def extract_plain_text(
+    client: httpx.AsyncClient, url: str, size: int, max_chars: int
+) -> ExtractResult:
+    """Read just enough of a text file for *max_chars* characters (UTF-8, else latin-1)."""
+    reader = RangeReader(client, url, size)
+    # UTF-8 needs at most 4 bytes per character; one extra byte tells us whether we cut.
+    want = min(size, 4 * max_chars + 1)
+    data = await reader.read(0, want - 1) if want else b""
+    try:
+        text = codecs.getincrementaldecoder("utf-8")().decode(data, final=want == size)
+    except UnicodeDecodeError:
+        text = data.decode("latin-1")
+    truncated = len(text) > max_chars or want < size
+    return ExtractResult(
+        text=text[:max_chars],
+        truncated=truncated,
+        bytes_read=reader.bytes_read,
+        total_bytes=size,
+        skipped_parts=[],
+    )
@@ -4,9 +4,10 @@ Run with: python -m graph.graphrag_indexer
 """
 import subprocess
 import sys
+import zipfile
 from pathlib import Path
 
-from docx import Document
+from graph.office_text import docx_text
 
 GRAPHRAG_ROOT = Path(__file__).parent / "graphrag"
 DATA_DIR = GRAPHRAG_ROOT / "data_untouched"
@@ -14,28 +15,9 @@ INPUT_DIR = GRAPHRAG_ROOT / "input"
 
 
 def _docx_to_text(path: Path) -> str:
-    doc = Document(path)
-    parts: list[str] = []
-
-    # Paragraphs and tables are interleaved in doc.element.body — iterate in order
-    from docx.oxml.ns import qn
-    for child in doc.element.body:
-        tag = child.tag.split("}")[-1] if "}" in child.tag else child.tag
-        if tag == "p":
-            text = "".join(node.text or "" for node in child.iter(qn("w:t"))).strip()
-            if text:
-                parts.append(text)
-        elif tag == "tbl":
-            for row in child.iter(qn("w:tr")):
-                cells = [
-                    "".join(node.text or "" for node in cell.iter(qn("w:t"))).strip()
-                    for cell in row.iter(qn("w:tc"))
-                ]
-                row_text = " | ".join(c for c in cells if c)
-                if row_text:
-                    parts.append(row_text)
-
-    return "\n".join(parts)
+    # Paragraphs and tables in body order, streamed from word/document.xml.
+    with zipfile.ZipFile(path) as zf:
+        return docx_text(zf)
 
 
 def convert_all() -> int:
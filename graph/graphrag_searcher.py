@@ -1,16 +1,37 @@
 """
-Vector RAG using the graphrag-built LanceDB index.
-Flow: embed query → LanceDB top-5 → single LLM call.
+Hybrid RAG using the graphrag-built LanceDB index.
+Flow: embed query (cached) → answer cache → LanceDB top-k + BM25 top-k →
+reciprocal rank fusion → top-5 chunks → single LLM call.
 Avoids graphrag local_search (multiple LLM calls + retry loops).
+
+Vector search alone misses exact-term questions (policy codes, product names,
+article numbers); a BM25 inverted index over the text units, built when the
+index loads, finds those. The two rankings are fused with RRF, so a chunk
+ranked high by either one makes the context. GRAPHRAG_HYBRID=0 turns the
+keyword half off.
+
+The search runs on the event loop: one long-lived AsyncAzureOpenAI client
+(one connection pool, TLS set up once) and LanceDB's async API. The blocking
+parts, the BM25 ranking (milliseconds on a large corpus) and the SQLite tier
+of the embedding cache, run in worker threads. The answer cache is checked
+right after the embedding, so a cached answer skips all retrieval; otherwise
+the BM25 ranking runs alongside the vector search. At most
+GRAPHRAG_MAX_CONCURRENCY searches (default 8) run at a time; the others wait
+their turn instead of piling up requests against the Azure rate limits.
 """
 import asyncio
 import logging
 import os
+import threading
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
 
+from graph.answer_cache import AnswerCache
+from graph.bm25 import BM25, tokenize
+from graph.embedding_cache import EmbeddingCache
+
 log = logging.getLogger("graph.graphrag")
 
 GRAPHRAG_ROOT = Path(__file__).parent / "graphrag"
@@ -22,8 +43,34 @@ def _load_parquet(name: str) -> pd.DataFrame:
     return pd.read_parquet(path) if path.exists() else pd.DataFrame()
 
 
+def _clean_title(title) -> str:
+    return str(title).replace(".docx.txt", "").replace(".txt", "")
+
+
+def index_version(output_dir: Path = OUTPUT_DIR) -> str:
+    """Identifies the index on disk; changes whenever graphrag rewrites it."""
+    paths = [
+        output_dir / "text_units.parquet",
+        output_dir / "documents.parquet",
+        output_dir / "lancedb" / "text_unit_text.lance" / "_versions",
+    ]
+    parts = []
+    for path in paths:
+        try:
+            st = path.stat()
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except FileNotFoundError:
+            parts.append("-")
+    return "/".join(parts)
+
+
 class _GraphRAGIndex:
-    """Holds parquet data + LanceDB table. Instantiated once at first query."""
+    """Holds the text-unit lookups + LanceDB table. Instantiated once at first query.
+
+    The parquet files are turned into plain dicts at load time (id → text,
+    id → source title, id → token count), so assembling the context of a query
+    costs a few dict lookups instead of a pass over the whole corpus.
+    """
 
     def __init__(self):
         import lancedb
@@ -39,66 +86,235 @@ class _GraphRAGIndex:
         self.embedding_deployment = os.environ.get("GRAPHRAG_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
         self.api_version = "2025-01-01-preview"
 
-        self.text_units = _load_parquet("text_units")
-        self.documents = _load_parquet("documents")
+        self.version = index_version()
+        self._build_lookups(_load_parquet("text_units"), _load_parquet("documents"))
 
-        db = lancedb.connect(str(OUTPUT_DIR / "lancedb"))
-        self.vector_table = db.open_table("text_unit_text")
+        # Opened synchronously once to fail fast at startup; searches use the async API.
+        lancedb.connect(str(OUTPUT_DIR / "lancedb")).open_table("text_unit_text")
+        self._async_table = None
+        self._client = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self.embedding_cache = EmbeddingCache.from_env()
+        self.answer_cache = AnswerCache.from_env()
 
         log.info("[graphrag] Index loaded — %d text units, %d documents",
-                 len(self.text_units), len(self.documents))
+                 len(self.unit_text), self.document_count)
+
+    def _build_lookups(self, text_units: pd.DataFrame, documents: pd.DataFrame) -> None:
+        titles = (
+            dict(zip(documents["id"], map(_clean_title, documents["title"])))
+            if len(documents) else {}
+        )
+        ids = text_units["id"].tolist() if len(text_units) else []
+        texts = text_units["text"].tolist() if ids else []
+        doc_ids = text_units["document_id"].tolist() if "document_id" in text_units else [None] * len(ids)
+        tokens = (
+            text_units["n_tokens"].tolist() if "n_tokens" in text_units
+            else [_estimate_tokens(t) for t in texts]
+        )
+        self.unit_text: dict[str, str] = dict(zip(ids, texts))
+        self.unit_title: dict[str, str] = {
+            uid: titles.get(did, "unknown") for uid, did in zip(ids, doc_ids)
+        }
+        self.unit_tokens: dict[str, int] = {uid: int(n) for uid, n in zip(ids, tokens)}
+        self.document_count = len(documents)
+        self.unit_ids: list[str] = ids
+        self.bm25 = BM25([tokenize(t) for t in texts]) if _hybrid_enabled() else None
+        self.searches = 0
+        self.keyword_contributed = 0
+
+    def keyword_ranking(self, query: str, k: int) -> list[str]:
+        """Ids of the *k* text units BM25 ranks best for *query*."""
+        if self.bm25 is None:
+            return []
+        return [self.unit_ids[i] for i, _ in self.bm25.top(tokenize(query), k)]
+
+    def exact_terms(self, query: str) -> frozenset[str]:
+        """Terms an answer to *query* depends on literally.
+
+        Tokens with a digit (codes, article numbers) and words in few text
+        units (names, products, words the index does not know at all); two
+        questions differing in one of those are different questions however
+        close their embeddings are. Without a keyword index every term counts.
+        """
+        tokens = tokenize(query)
+        if self.bm25 is None:
+            return frozenset(tokens)
+        rare = max(_RARE_MIN_UNITS, int(len(self.bm25) * _RARE_SHARE))
+        return frozenset(
+            t for t in tokens
+            if any(c.isdigit() for c in t) or self.bm25.document_frequency(t) <= rare
+        )
+
+    def openai_client(self):
+        """The shared AsyncAzureOpenAI client (one per event loop)."""
+        from openai import AsyncAzureOpenAI
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = AsyncAzureOpenAI(
+                api_key=self.api_key,
+                azure_endpoint=self.api_base,
+                api_version=self.api_version,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def vector_table(self):
+        if self._async_table is None:
+            import lancedb
+
+            db = await lancedb.connect_async(str(OUTPUT_DIR / "lancedb"))
+            self._async_table = await db.open_table("text_unit_text")
+        return self._async_table
 
 
+_MAX_CONCURRENCY = int(os.environ.get("GRAPHRAG_MAX_CONCURRENCY", 8))
+_TOP_K = 5
+_CANDIDATES = 10        # per ranking, before fusion
+_RRF_K = 60
+_RARE_SHARE = 0.05      # a term in at most this share of the text units is an exact term
+_RARE_MIN_UNITS = 3
+_CONTEXT_TOKENS = int(os.environ.get("GRAPHRAG_CONTEXT_TOKENS", 6000))
+
 _index: _GraphRAGIndex | None = None
+_index_lock = threading.Lock()
+_limit = asyncio.Semaphore(_MAX_CONCURRENCY)
 
 
 def _get_index() -> _GraphRAGIndex:
     global _index
-    if _index is None:
-        log.info("[graphrag] Initialising GraphRAG index...")
-        _index = _GraphRAGIndex()
+    with _index_lock:
+        if _index is None:
+            log.info("[graphrag] Initialising GraphRAG index...")
+            _index = _GraphRAGIndex()
     return _index
 
 
-def _search_sync(query: str) -> dict[str, Any]:
-    """Synchronous: embed → LanceDB search → single LLM call."""
-    from openai import AzureOpenAI
+def _hybrid_enabled() -> bool:
+    return os.environ.get("GRAPHRAG_HYBRID", "1").lower() not in ("0", "false", "no")
 
-    idx = _get_index()
 
-    client = AzureOpenAI(
-        api_key=idx.api_key,
-        azure_endpoint=idx.api_base,
-        api_version=idx.api_version,
-    )
+def _rrf(rankings: list[list[str]], k: int = _RRF_K) -> list[str]:
+    """Reciprocal rank fusion: ids by the sum of 1 / (k + rank) over the rankings."""
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking, start=1):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=lambda cid: -fused[cid])
+
+
+def graphrag_stats() -> dict:
+    """Counters of the GraphRAG caches (empty until the index is loaded)."""
+    if _index is None:
+        return {}
+    return {
+        "retrieval": {
+            "searches": _index.searches,
+            "keyword_contributed": _index.keyword_contributed,
+        },
+        "embedding_cache": _index.embedding_cache.stats(),
+        "answer_cache": _index.answer_cache.stats() if _index.answer_cache else None,
+    }
+
+
+async def _embed_query(client, idx: _GraphRAGIndex, query: str):
+    """Query vector from the embedding cache, or from Azure on a miss."""
+    cache, deployment = idx.embedding_cache, idx.embedding_deployment
+    vector = cache.get_memory(deployment, query)
+    if vector is not None:
+        return vector
+    # The disk tier is SQLite: off the event loop.
+    if cache.persistent:
+        vector = await asyncio.to_thread(cache.get, deployment, query)
+    else:
+        vector = cache.get(deployment, query)
+    if vector is None:
+        emb = await client.embeddings.create(model=deployment, input=query)
+        vector = emb.data[0].embedding
+        if cache.persistent:
+            vector = await asyncio.to_thread(cache.put, deployment, query, vector)
+        else:
+            vector = cache.put(deployment, query, vector)
+    return vector
 
-    # 1. Embed the query
-    emb = client.embeddings.create(model=idx.embedding_deployment, input=query)
-    query_vector = emb.data[0].embedding
 
-    # 2. Vector search → top-5 most similar text chunks
-    results = idx.vector_table.search(query_vector).limit(5).to_pandas()
-    chunk_ids = results["id"].tolist()
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
 
-    # 3. Retrieve text + source document titles
-    chunks = idx.text_units[idx.text_units["id"].isin(chunk_ids)]
-    doc_id_to_title = idx.documents.set_index("id")["title"].to_dict()
 
+def _build_context(
+    idx: _GraphRAGIndex,
+    chunk_ids: list[str],
+    max_tokens: int = _CONTEXT_TOKENS,
+    max_chunks: int | None = None,
+) -> tuple[str, list[str]]:
+    """Context of the ranked chunks, best first, and their source titles.
+
+    Duplicate ids and duplicate texts are dropped; chunks are packed in rank
+    order until *max_tokens* is used (a chunk that does not fit is skipped,
+    a smaller one further down may still fit) or *max_chunks* are taken.
+    """
+    parts: list[str] = []
     sources: list[str] = []
-    context_parts: list[str] = []
-    for _, row in chunks.iterrows():
-        title = (
-            doc_id_to_title.get(row.get("document_id", ""), "unknown")
-            .replace(".docx.txt", "")
-            .replace(".txt", "")
-        )
-        sources.append(title)
-        context_parts.append(f"[{title}]\n{row['text']}")
+    seen_ids: set[str] = set()
+    seen_texts: set[str] = set()
+    used = 0
+    for cid in chunk_ids:
+        if max_chunks is not None and len(parts) >= max_chunks:
+            break
+        text = idx.unit_text.get(cid)
+        if text is None or cid in seen_ids or text in seen_texts:
+            continue
+        seen_ids.add(cid)
+        seen_texts.add(text)
+        tokens = idx.unit_tokens.get(cid) or _estimate_tokens(text)
+        if used + tokens > max_tokens:
+            continue
+        used += tokens
+        title = idx.unit_title.get(cid, "unknown")
+        parts.append(f"[{title}]\n{text}")
+        if title not in sources:
+            sources.append(title)
+    return "\n\n---\n\n".join(parts), sources
+
+
+async def _search(idx: _GraphRAGIndex, query: str) -> dict[str, Any]:
+    """Embed → hybrid retrieval → single LLM call."""
+    client = idx.openai_client()
+
+    # 1. Embed the query
+    query_vector = await _embed_query(client, idx, query)
+
+    # A near-identical question (same codes and names) answered from this
+    # index version: reuse it, before any retrieval.
+    version = index_version()
+    terms = idx.exact_terms(query)
+    if idx.answer_cache:
+        cached = idx.answer_cache.get(query_vector, version, terms)
+        if cached is not None:
+            return cached
+
+    # 2. Vector search (ids only, not the vectors) while a worker thread
+    #    computes the keyword ranking; the two are fused
+    hybrid = idx.bm25 is not None
+    keyword = asyncio.to_thread(idx.keyword_ranking, query, _CANDIDATES) if hybrid else asyncio.sleep(0, [])
+    table = await idx.vector_table()
+    limit = _CANDIDATES if hybrid else _TOP_K
+    results, keyword_ids = await asyncio.gather(
+        table.query().nearest_to(query_vector).select(["id"]).limit(limit).to_arrow(), keyword
+    )
+    vector_ids = results.column("id").to_pylist()
+    chunk_ids = _rrf([vector_ids, keyword_ids]) if keyword_ids else vector_ids
+    idx.searches += 1
+    if set(chunk_ids[:_TOP_K]) - set(vector_ids[:_TOP_K]):
+        idx.keyword_contributed += 1
 
-    context = "\n\n---\n\n".join(context_parts)
+    # 3. Context in rank order from the precomputed lookups
+    context, sources = _build_context(idx, chunk_ids, max_chunks=_TOP_K)
 
     # 4. Single LLM call
-    resp = client.chat.completions.create(
+    resp = await client.chat.completions.create(
         model=idx.chat_deployment,
         messages=[
             {
@@ -118,9 +334,18 @@ def _search_sync(query: str) -> dict[str, Any]:
         temperature=0,
     )
 
-    return {"answer": resp.choices[0].message.content, "sources": list(set(sources))}
+    result = {"answer": resp.choices[0].message.content, "sources": sources}
+    # Only answers from the index version on disk are cached; after a rebuild
+    # the loaded index is stale until the server restarts.
+    if idx.answer_cache and version == idx.version:
+        tokens = resp.usage.total_tokens if resp.usage else 0
+        idx.answer_cache.put(query_vector, result, version, tokens, terms)
+    return result
 
 
 async def search_documents(query: str) -> dict[str, Any]:
-    """Search company documents. Runs in a thread to avoid blocking the MCP event loop."""
-    return await asyncio.to_thread(_search_sync, query)
+    """Search company documents."""
+    # Loading the parquet files blocks; normally done at startup already.
+    idx = _index or await asyncio.to_thread(_get_index)
+    async with _limit:
+        return await _search(idx, query)
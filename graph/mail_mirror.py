@@ -0,0 +1,423 @@
+"""
+Optional per-user mailbox mirror: Graph messages delta sync into SQLite + FTS5.
+
+Enabled by setting GRAPH_MAIL_MIRROR_DIR (one database file per user in that
+directory). Every mail folder is synced with /messages/delta; the delta links
+are stored, so later syncs only transfer changes. Message headers and the body
+preview are indexed in an FTS5 trigram table, which serves substring searches
+on subject, sender and recipients locally.
+
+The repository only serves from the mirror while it is fresh (last completed
+sync younger than GRAPH_MAIL_MIRROR_MAX_AGE seconds); otherwise it calls Graph
+live and kicks off a background sync.
+
+SQLite work (applying delta pages, queries) runs in worker threads through
+asyncio.to_thread, one statement batch at a time under a lock, so a first
+full sync of a large mailbox never stalls the event loop; the public query
+methods are coroutines.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+from graph.models import Email, EmailAddress
+
+log = logging.getLogger("graph.mail_mirror")
+
+_DEFAULT_MAX_AGE = 300.0
+_MIN_TRIGRAM = 3
+_MAX_THREAD = 200
+_SELECT = "id,subject,from,toRecipients,ccRecipients,receivedDateTime,bodyPreview,webLink,conversationId"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid        INTEGER PRIMARY KEY,
+    id           TEXT UNIQUE NOT NULL,
+    folder_id    TEXT NOT NULL,
+    subject      TEXT NOT NULL DEFAULT '',
+    sender_name  TEXT NOT NULL DEFAULT '',
+    sender_email TEXT,
+    recipients   TEXT NOT NULL DEFAULT '',
+    received     TEXT NOT NULL,
+    preview      TEXT NOT NULL DEFAULT '',
+    web_link     TEXT,
+    conversation_id TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_received ON messages(folder_id, received);
+CREATE INDEX IF NOT EXISTS messages_received_all ON messages(received);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages(conversation_id, received);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, sender, recipients, preview, tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, subject, sender, recipients, preview)
+    VALUES (new.rowid, new.subject, new.sender_name || ' ' || coalesce(new.sender_email, ''),
+            new.recipients, new.preview);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    DELETE FROM messages_fts WHERE rowid = old.rowid;
+END;
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    folder_id  TEXT PRIMARY KEY,
+    delta_link TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def mirror_dir() -> Path | None:
+    value = os.environ.get("GRAPH_MAIL_MIRROR_DIR")
+    return Path(value) if value else None
+
+
+def _iso_utc(value: datetime | str) -> str:
+    """Normalize a datetime (or ISO string) to Graph's ``YYYY-MM-DDTHH:MM:SSZ``."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _substring_filters(terms: list[tuple[tuple[str, ...], str]]) -> tuple[list[str], list[str]]:
+    """WHERE clauses (and parameters) requiring each term in one of its columns.
+
+    Terms of three characters or more go into one FTS5 phrase query, which the
+    trigram index answers; shorter ones cannot use the index and are a scan.
+    """
+    phrases: list[str] = []
+    where: list[str] = []
+    args: list[str] = []
+    for columns, term in terms:
+        if len(term) >= _MIN_TRIGRAM:
+            quoted = term.replace('"', '""')
+            phrases.append(f'{{{" ".join(columns)}}} : "{quoted}"')
+        else:
+            where.append("(" + " OR ".join(f"instr(lower(f.{c}), lower(?)) > 0" for c in columns) + ")")
+            args += [term] * len(columns)
+    if phrases:
+        where.insert(0, "messages_fts MATCH ?")
+        args.insert(0, " AND ".join(phrases))
+    return where, args
+
+
+class MailMirror:
+    """SQLite mirror of one user's mailbox."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        get_json: Callable[..., Awaitable[dict]],
+        max_age: float | None = None,
+    ):
+        self._get_json = get_json
+        self.max_age = max_age if max_age is not None else float(
+            os.environ.get("GRAPH_MAIL_MIRROR_MAX_AGE", _DEFAULT_MAX_AGE)
+        )
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._migrate()
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        self.synced_at: float | None = float(row["value"]) if row else None
+        self._messages = self._count()
+        self._sync_task: asyncio.Task | None = None
+        self.local_queries = 0
+        self.live_fallbacks = 0
+
+    def _migrate(self) -> None:
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(messages)")}
+        if columns and "conversation_id" not in columns:
+            # A mirror from before conversation ids were stored: sync it again from scratch.
+            self._db.execute("ALTER TABLE messages ADD COLUMN conversation_id TEXT")
+            self._db.execute("DELETE FROM messages")
+            self._db.execute("DELETE FROM sync_state")
+            self._db.execute("DELETE FROM meta WHERE key = 'synced_at'")
+            self._db.commit()
+
+    @classmethod
+    def for_user(cls, user_key: str, get_json: Callable[..., Awaitable[dict]]) -> "MailMirror | None":
+        """Mirror for *user_key*, or None when GRAPH_MAIL_MIRROR_DIR is not set."""
+        directory = mirror_dir()
+        if directory is None:
+            return None
+        name = hashlib.sha256(user_key.encode()).hexdigest()[:32]
+        return cls(directory / f"{name}.sqlite", get_json)
+
+    def _run(self, fn: Callable, *args):
+        """Run *fn* on the database in a worker thread (awaitable)."""
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return asyncio.to_thread(locked)
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT count(*) AS n FROM messages").fetchone()["n"]
+
+    # ── freshness ────────────────────────────────────────────────────────────
+
+    def is_fresh(self) -> bool:
+        synced_at = self.synced_at
+        return synced_at is not None and time.time() - synced_at < self.max_age
+
+    def usable(self) -> bool:
+        """True if queries can be served locally; otherwise schedules a sync."""
+        if self.is_fresh():
+            self.local_queries += 1
+            return True
+        self.live_fallbacks += 1
+        self.schedule_sync()
+        return False
+
+    def schedule_sync(self) -> None:
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_logged())
+
+    async def _sync_logged(self) -> None:
+        try:
+            await self.sync()
+        except Exception as exc:
+            log.warning("[mail_mirror] sync failed: %s", exc)
+
+    # ── delta sync ───────────────────────────────────────────────────────────
+
+    async def _list_folders(self) -> list[dict]:
+        folders: list[dict] = []
+        pending = ["/me/mailFolders?$top=100&$select=id,displayName,childFolderCount"]
+        while pending:
+            url = pending.pop()
+            page = await self._get_json(url)
+            for f in page.get("value", []):
+                folders.append(f)
+                if f.get("childFolderCount"):
+                    pending.append(
+                        f"/me/mailFolders/{f['id']}/childFolders"
+                        "?$top=100&$select=id,displayName,childFolderCount"
+                    )
+            if page.get("@odata.nextLink"):
+                pending.append(page["@odata.nextLink"])
+        return folders
+
+    async def sync(self) -> int:
+        """Bring the mirror up to date. Returns the number of changed messages."""
+        started = time.time()
+        inbox = await self._get_json("/me/mailFolders/inbox?$select=id")
+        folder_ids = [f["id"] for f in await self._list_folders()]
+
+        changed = 0
+        for folder_id in folder_ids:
+            try:
+                changed += await self._sync_folder(folder_id)
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 410:
+                    raise
+                # Delta token expired: drop the folder and start over.
+                log.info("[mail_mirror] delta token expired for %s, resyncing", folder_id)
+                await self._run(self._drop_folder, folder_id)
+                changed += await self._sync_folder(folder_id)
+
+        self._messages = await self._run(self._finish_sync, folder_ids, inbox["id"], started)
+        self.synced_at = started
+        log.info("[mail_mirror] sync done: %d change(s) in %.1fs", changed, time.time() - started)
+        return changed
+
+    def _drop_folder(self, folder_id: str) -> None:
+        self._db.execute("DELETE FROM messages WHERE folder_id = ?", (folder_id,))
+        self._db.execute("DELETE FROM sync_state WHERE folder_id = ?", (folder_id,))
+        self._db.commit()
+
+    def _finish_sync(self, folder_ids: list[str], inbox_id: str, started: float) -> int:
+        """Drop folders that are gone, record the sync; returns the message count."""
+        if folder_ids:
+            placeholders = ",".join("?" * len(folder_ids))
+            self._db.execute(f"DELETE FROM messages WHERE folder_id NOT IN ({placeholders})", folder_ids)
+            self._db.execute(f"DELETE FROM sync_state WHERE folder_id NOT IN ({placeholders})", folder_ids)
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)",
+            [("inbox_id", inbox_id), ("synced_at", str(started))],
+        )
+        self._db.commit()
+        return self._count()
+
+    async def _sync_folder(self, folder_id: str) -> int:
+        url = await self._run(self._delta_link, folder_id) or (
+            f"/me/mailFolders/{folder_id}/messages/delta?$select={_SELECT}"
+        )
+        changed = 0
+        while url:
+            page = await self._get_json(url, headers={"Prefer": "odata.maxpagesize=200"})
+            changed += await self._run(self._apply_page, folder_id, page)
+            url = page.get("@odata.nextLink")
+        return changed
+
+    def _delta_link(self, folder_id: str) -> str | None:
+        row = self._db.execute(
+            "SELECT delta_link FROM sync_state WHERE folder_id = ?", (folder_id,)
+        ).fetchone()
+        return row and row["delta_link"]
+
+    def _apply_page(self, folder_id: str, page: dict) -> int:
+        """Store one delta page (and its delta link, on the last page); returns the changes."""
+        for m in page.get("value", []):
+            if "@removed" in m:
+                # Scoped to the folder: a move shows up as removed here and
+                # added in the target folder, which may have synced first.
+                self._db.execute(
+                    "DELETE FROM messages WHERE id = ? AND folder_id = ?", (m["id"], folder_id)
+                )
+            else:
+                self._upsert(folder_id, m)
+        if page.get("@odata.deltaLink"):
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state(folder_id, delta_link) VALUES (?, ?)",
+                (folder_id, page["@odata.deltaLink"]),
+            )
+        self._db.commit()
+        return len(page.get("value", []))
+
+    def _upsert(self, folder_id: str, m: dict) -> None:
+        sender = (m.get("from") or {}).get("emailAddress") or {}
+        recipients = " ; ".join(
+            f"{(r.get('emailAddress') or {}).get('name') or ''} <{(r.get('emailAddress') or {}).get('address') or ''}>"
+            for r in (m.get("toRecipients") or []) + (m.get("ccRecipients") or [])
+        )
+        # Delete + insert (rather than UPDATE) keeps the FTS triggers simple.
+        self._db.execute("DELETE FROM messages WHERE id = ?", (m["id"],))
+        self._db.execute(
+            """INSERT INTO messages
+               (id, folder_id, subject, sender_name, sender_email, recipients, received, preview, web_link,
+                conversation_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                m["id"],
+                folder_id,
+                m.get("subject") or "",
+                sender.get("name") or sender.get("address") or "",
+                sender.get("address"),
+                recipients,
+                _iso_utc(m["receivedDateTime"]) if m.get("receivedDateTime") else "",
+                m.get("bodyPreview") or "",
+                m.get("webLink"),
+                m.get("conversationId"),
+            ),
+        )
+
+    # ── queries ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _to_email(row: sqlite3.Row) -> Email:
+        return Email(
+            id=row["id"],
+            subject=row["subject"],
+            sender_name=row["sender_name"],
+            sender_email=row["sender_email"],
+            received=row["received"],
+            web_link=row["web_link"],
+        )
+
+    async def inbox(self, top: int = 25) -> list[Email]:
+        return await self._run(self._inbox, top)
+
+    def _inbox(self, top: int) -> list[Email]:
+        rows = self._db.execute(
+            """SELECT * FROM messages
+               WHERE folder_id = (SELECT value FROM meta WHERE key = 'inbox_id')
+               ORDER BY received DESC LIMIT ?""",
+            (top,),
+        ).fetchall()
+        return [self._to_email(r) for r in rows]
+
+    async def search(
+        self,
+        sender: str | None = None,
+        subject: str | None = None,
+        received_after: datetime | str | None = None,
+        received_before: datetime | str | None = None,
+        top: int = 25,
+    ) -> list[Email]:
+        return await self._run(self._search, sender, subject, received_after, received_before, top)
+
+    def _search(
+        self,
+        sender: str | None,
+        subject: str | None,
+        received_after: datetime | str | None,
+        received_before: datetime | str | None,
+        top: int,
+    ) -> list[Email]:
+        where, args = _substring_filters(
+            [((column,), term) for column, term in (("subject", subject), ("sender", sender)) if term]
+        )
+        if received_after:
+            where.append("m.received >= ?")
+            args.append(_iso_utc(received_after))
+        if received_before:
+            where.append("m.received <= ?")
+            args.append(_iso_utc(received_before))
+
+        sql = "SELECT m.* FROM messages m JOIN messages_fts f ON f.rowid = m.rowid"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.received DESC LIMIT ?"
+        rows = self._db.execute(sql, (*args, top)).fetchall()
+        return [self._to_email(r) for r in rows]
+
+    async def thread(self, conversation_id: str) -> list[Email]:
+        """Messages of one conversation, newest first."""
+        return await self._run(self._thread, conversation_id)
+
+    def _thread(self, conversation_id: str) -> list[Email]:
+        rows = self._db.execute(
+            "SELECT * FROM messages WHERE conversation_id = ? ORDER BY received DESC LIMIT ?",
+            (conversation_id, _MAX_THREAD),
+        ).fetchall()
+        return [self._to_email(r) for r in rows]
+
+    async def people(self, query: str, top: int = 5) -> list[EmailAddress]:
+        """Correspondents of the newest messages whose headers mention *query*."""
+        return await self._run(self._people, query, top)
+
+    def _people(self, query: str, top: int) -> list[EmailAddress]:
+        where, args = _substring_filters([(("sender", "recipients"), query)])
+        rows = self._db.execute(
+            f"""SELECT m.sender_name, m.sender_email, m.recipients
+               FROM messages m JOIN messages_fts f ON f.rowid = m.rowid
+               WHERE {" AND ".join(where)}
+               ORDER BY m.received DESC LIMIT ?""",
+            (*args, top),
+        ).fetchall()
+
+        found: dict[str, EmailAddress] = {}
+        for r in rows:
+            candidates = [(r["sender_name"], r["sender_email"])]
+            for part in r["recipients"].split(" ; "):
+                name, _, address = part.rpartition(" <")
+                candidates.append((name, address.rstrip(">")))
+            for name, address in candidates:
+                if address and address.lower() not in found:
+                    found[address.lower()] = EmailAddress(name=name or None, address=address)
+        return list(found.values())
+
+    def stats(self) -> dict:
+        return {
+            "messages": self._messages,
+            "local_queries": self.local_queries,
+            "live_fallbacks": self.live_fallbacks,
+        }
@@ -0,0 +1,133 @@
+"""
+Query planner for message searches: indexed KQL ``$search`` where possible.
+
+``contains(subject, ...)`` and ``contains(from/emailAddress/address, ...)``
+are not backed by an index: Graph evaluates them message by message, which is
+slow on large mailboxes and regularly ends in a timeout or an
+"InefficientFilter" error. The same conditions as KQL go through the mailbox
+search index instead:
+
+    subject "offerte q3"      →  subject:offerte* AND subject:q3*
+    sender  jan@contoso.com   →  from:jan@contoso.com
+    received_after 2026-03-02T14:00  →  received>=2026-03-01
+
+Graph doesn't combine ``$search`` with ``$filter`` on messages, and KQL
+matches words (and word prefixes) at day granularity rather than substrings
+at the second. So the KQL query is kept slightly wider than the request and
+the exact conditions are checked on the results (``MessageQuery.predicate``);
+the result set stays what the ``$filter`` query returned. The one difference:
+KQL finds words and word prefixes, so a fragment from the middle of a word
+("fert" for "offerte", "ntoso" for "contoso.com") is no longer found.
+
+``$filter`` is still used when there is nothing to search for (a date range
+on receivedDateTime alone is indexed and keeps the newest-first order) and
+when a condition can't be expressed in KQL (no word characters in the
+subject, an unparsable date).
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from graph.models import Email
+
+_WORD = re.compile(r"\w+")
+_KQL_SPECIAL = re.compile(r'[\s"():*]')
+
+
+def _odata_string(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def message_filter(
+    sender: str | None,
+    subject: str | None,
+    received_after: datetime | str | None,
+    received_before: datetime | str | None,
+) -> str | None:
+    """OData $filter for a message search, or None without criteria."""
+    filters: list[str] = []
+    if subject:
+        filters.append(f"contains(subject, '{_odata_string(subject)}')")
+    if sender:
+        filters.append(f"contains(from/emailAddress/address,'{_odata_string(sender)}')")
+    if received_after:
+        filters.append(f"receivedDateTime ge {received_after}")
+    if received_before:
+        filters.append(f"receivedDateTime le {received_before}")
+    return " and ".join(filters) if filters else None
+
+
+def _as_datetime(value: datetime | str | None) -> datetime | None:
+    """Aware datetime (naive values are taken as UTC); raises ValueError if unparsable."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class MessageQuery:
+    search: str | None = None                          # KQL, sent as $search
+    filter: str | None = None                          # OData $filter
+    predicate: Callable[[Email], bool] | None = None   # exact check of what KQL widens
+
+    def params(self) -> dict[str, str]:
+        if self.search:
+            return {"$search": f'"{self.search}"'}
+        if self.filter:
+            return {"$filter": self.filter}
+        return {}
+
+    def matches(self, email: Email) -> bool:
+        return self.predicate is None or self.predicate(email)
+
+
+def plan_message_query(
+    sender: str | None = None,
+    subject: str | None = None,
+    received_after: datetime | str | None = None,
+    received_before: datetime | str | None = None,
+) -> MessageQuery:
+    """Turn search_emails arguments into a KQL $search (or a $filter where needed)."""
+    legacy = MessageQuery(filter=message_filter(sender, subject, received_after, received_before))
+    if not sender and not subject:
+        return legacy
+
+    words = _WORD.findall(subject) if subject else []
+    sender_term = _KQL_SPECIAL.sub("", sender) if sender else ""
+    if (subject and not words) or (sender and not sender_term):
+        return legacy
+    try:
+        after = _as_datetime(received_after)
+        before = _as_datetime(received_before)
+    except ValueError:
+        return legacy
+
+    terms = [f"subject:{w}*" for w in words]
+    if sender_term:
+        terms.append(f"from:{sender_term}")
+    # KQL dates are whole days in the mailbox's time zone: widen by a day and
+    # let the predicate cut at the exact instant.
+    if after:
+        terms.append(f"received>={(after - timedelta(days=1)).date().isoformat()}")
+    if before:
+        terms.append(f"received<={(before + timedelta(days=1)).date().isoformat()}")
+
+    subject_lc = subject.lower() if subject else None
+    sender_lc = sender.lower() if sender else None
+
+    def predicate(e: Email) -> bool:
+        if subject_lc and subject_lc not in (e.subject or "").lower():
+            return False
+        if sender_lc and sender_lc not in (e.sender_email or "").lower():
+            return False
+        received = e.received if e.received.tzinfo else e.received.replace(tzinfo=timezone.utc)
+        if after and received < after:
+            return False
+        if before and received > before:
+            return False
+        return True
+
+    return MessageQuery(search=" AND ".join(terms), predicate=predicate)
@@ -1,12 +1,20 @@
+import asyncio
 import inspect
 import yaml
 from datetime import datetime
 
 from mcp.server.fastmcp import Context
 
-from graph.repository import GraphRepository
+from graph.coalesce import RUN_HEADER, CallCoalescer
+from graph.repository import GraphBatchError, GraphRepository
+from graph.mail_mirror import MailMirror
+from graph.parse_pool import get_parse_pool
+from graph.people_index import CorrespondentIndex, DirectorySnapshot
+from graph.prefetch import Prefetcher, prefetch_top
+from graph.repo_cache import RepositoryCache, tenant_id, user_key
+from graph.text_cache import get_text_cache
+from graph.transport import get_raw_client, get_sdk_client
 from graph.models import User
-from auth.token_credential import StaticTokenCredential
 
 _TYPE_MAP: dict[str, type] = {
     "str":       str,
@@ -15,17 +23,85 @@ _TYPE_MAP: dict[str, type] = {
     "int | None": int | None,
 }
 
-_repo_cache: dict[str, GraphRepository] = {}
+_repo_cache: RepositoryCache | None = None
 
 import logging
 log = logging.getLogger("graph")
 log.setLevel(logging.INFO)
 
 
-def _get_repo(token: str, azure_settings) -> GraphRepository:
-    if token not in _repo_cache:
-        _repo_cache[token] = GraphRepository(azure_settings, credential=StaticTokenCredential(token))
-    return _repo_cache[token]
+async def token_object_id(token: str) -> str | None:
+    """Ask Graph who a token belongs to (once per new token in the repo cache, and on /stats)."""
+    resp = await get_raw_client().get(
+        "/me", params={"$select": "id"}, headers={"Authorization": f"Bearer {token}"}
+    )
+    if resp.status_code != 200:
+        return None
+    return resp.json().get("id")
+
+
+def _new_repo(credential, azure_settings) -> GraphRepository:
+    repo = GraphRepository(
+        azure_settings,
+        credential=credential,
+        http_client=get_sdk_client(),
+        raw_client=get_raw_client(),
+    )
+    repo.mail_mirror = MailMirror.for_user(user_key(credential.token), repo._get_json)
+    repo.text_cache = get_text_cache()
+    repo.directory = DirectorySnapshot.for_tenant(tenant_id(credential.token))
+    repo.correspondents = CorrespondentIndex.create()
+    repo.coalescer = CallCoalescer.from_env()
+    repo.prefetcher = Prefetcher() if prefetch_top() > 0 else None
+    return repo
+
+
+async def _get_repo(token: str, azure_settings) -> GraphRepository:
+    global _repo_cache
+    if _repo_cache is None:
+        _repo_cache = RepositoryCache(
+            factory=lambda cred: _new_repo(cred, azure_settings),
+            verify=token_object_id,
+        )
+    return await _repo_cache.get(token)
+
+
+def _sum_repo_stats(attr: str) -> dict:
+    """Add up the stats() counters of a per-repository component."""
+    total: dict = {}
+    for repo in _repo_cache.repositories() if _repo_cache else []:
+        component = getattr(repo, attr)
+        if component is None:
+            continue
+        for k, v in component.stats().items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def graph_stats() -> dict:
+    """Counters of the graph server's caches, served on /stats."""
+    return {
+        "repo_cache": _repo_cache.stats() if _repo_cache else None,
+        "people_cache": _sum_repo_stats("people_cache"),
+        "directory": DirectorySnapshot.all_stats(),
+        "correspondents": _sum_repo_stats("correspondents"),
+        "mail_mirror": _sum_repo_stats("mail_mirror"),
+        "calendar": _sum_repo_stats("calendar"),
+        "pagination": _sum_repo_stats("cursors"),
+        "throttle": _sum_repo_stats("throttle"),
+        "coalesce": _sum_repo_stats("coalescer"),
+        "body_compaction": _sum_repo_stats("compactor"),
+        "prefetch": _sum_repo_stats("prefetcher"),
+        "text_cache": get_text_cache().stats(),
+        "parse_pool": get_parse_pool().stats(),
+        "graphrag": _graphrag_stats(),
+    }
+
+
+def _graphrag_stats() -> dict:
+    # Imported lazily like search_documents: pandas/lancedb only load with the index.
+    from graph.graphrag_searcher import graphrag_stats
+    return graphrag_stats()
 
 
 # ---------------------------------------------------------------------------
@@ -56,29 +132,95 @@ async def _read_email(repo: GraphRepository, message_id: str, **kwargs):
     return result.model_dump(mode="json")
 
 
+async def _read_emails(repo: GraphRepository, message_ids: str, **kwargs):
+    ids = [mid.strip() for mid in message_ids.split(",") if mid.strip()]
+    results = await repo.get_message_bodies(ids)
+    return [
+        {"id": mid, "error": "Email not found" if r.status == 404 else str(r)}
+        if isinstance(r, GraphBatchError) else r.model_dump(mode="json")
+        for mid, r in zip(ids, results)
+    ]
+
+
+_MAX_TOP = 100
+_FILTERED_PAGE_SIZE = 100   # larger pages when most hits are dropped client-side
+_PAGE_BUDGET = 10.0         # seconds; no further pages are fetched after this
+
+
+async def _paged(repo: GraphRepository, open_stream, cursor=None, top=25):
+    """One slice of a result stream, plus a cursor when more results remain.
+
+    With *cursor*, the stream parked by an earlier call is resumed and the
+    other search arguments are ignored.
+    """
+    if cursor:
+        stream = repo.cursors.pop(cursor)
+        if stream is None:
+            return {"error": "Unknown or expired cursor; run the search again."}
+    else:
+        stream = await open_stream()
+    results = await stream.take(max(1, min(int(top or 25), _MAX_TOP)), budget=_PAGE_BUDGET)
+    return {
+        "results": [r.model_dump(mode="json") for r in results],
+        "next_cursor": repo.cursors.put(stream),
+    }
+
+
+async def _search_emails(
+    repo: GraphRepository,
+    sender=None, subject=None, received_after=None, received_before=None,
+    top=25, cursor=None,
+    **kwargs,
+):
+    async def open_stream():
+        return await repo.stream_emails(
+            sender=sender,
+            subject=subject,
+            received_after=received_after,
+            received_before=received_before,
+            page_size=min(int(top or 25), _MAX_TOP),
+        )
+    return await _paged(repo, open_stream, cursor, top)
+
+
 async def _search_documents(repo: GraphRepository, query: str, **kwargs):
     from graph.graphrag_searcher import search_documents
     return await search_documents(query)
 
 
-async def _search_files(repo: GraphRepository, query: str, drive_id=None, folder_id="root", **kwargs):
+async def _search_files(
+    repo: GraphRepository, query: str, drive_id=None, folder_id="root", top=25, cursor=None, **kwargs
+):
     import re
-    filetype_match = re.search(r'\bfiletype:(\w+)\b', query, re.IGNORECASE)
-    if filetype_match:
-        ext = "." + filetype_match.group(1).lower()
-        base = re.sub(r'\bfiletype:\w+\b', "", query, flags=re.IGNORECASE).strip()
-        results = await repo.search_drive_items_sdk(query=base or ext, top=25, drive_id=drive_id)
-        return [f for f in results if f.name.lower().endswith(ext)]
-    return await repo.search_drive_items_sdk(query=query, top=25, drive_id=drive_id)
+
+    async def open_stream():
+        filetype_match = re.search(r'\bfiletype:(\w+)\b', query, re.IGNORECASE)
+        if filetype_match:
+            # Graph's drive search ignores filetype:, so the extension is matched
+            # here, across as many pages as it takes to fill the result.
+            ext = "." + filetype_match.group(1).lower()
+            base = re.sub(r'\bfiletype:\w+\b', "", query, flags=re.IGNORECASE).strip()
+            return repo.stream_drive_items(
+                base or ext,
+                drive_id=drive_id,
+                page_size=_FILTERED_PAGE_SIZE,
+                predicate=lambda f: f.name.lower().endswith(ext),
+            )
+        return repo.stream_drive_items(query, drive_id=drive_id, page_size=min(int(top or 25), _MAX_TOP))
+    out = await _paged(repo, open_stream, cursor, top)
+    if not cursor and "results" in out:
+        # The top hits are usually read next: start extracting them now.
+        repo.prefetch_files(out["results"], prefetch_top())
+    return out
 
 
-async def _read_file(repo: GraphRepository, file_id: str, **kwargs):
-    return await repo.get_file_text(file_id)
+async def _read_file(repo: GraphRepository, file_id: str, query: str | None = None, **kwargs):
+    return await repo.get_file_text(file_id, query=query or None)
 
 
-async def _read_multiple_files(repo: GraphRepository, file_ids: str, **kwargs):
+async def _read_multiple_files(repo: GraphRepository, file_ids: str, query: str | None = None, **kwargs):
     ids = [fid.strip() for fid in file_ids.split(",") if fid.strip()]
-    return await repo.get_files_text_batch(ids)
+    return await repo.get_files_text_batch(ids, query=query or None)
 
 
 async def _list_contacts(repo: GraphRepository, **kwargs):
@@ -86,8 +228,10 @@ async def _list_contacts(repo: GraphRepository, **kwargs):
 
 
 async def _list_calendar(repo: GraphRepository, **kwargs):
-    upcoming = await repo.get_upcoming_events()
-    past = await repo.get_past_events()
+    upcoming, past = await asyncio.gather(
+        repo.get_upcoming_events(),
+        repo.get_past_events(),
+    )
     return upcoming + past
 
 
@@ -104,15 +248,27 @@ async def _search_events(
     repo: GraphRepository,
     text=None, location=None, attendee=None,
     start_after=None, start_before=None,
+    top=25, cursor=None,
     **kwargs,
 ):
-    return await repo.search_events(
-        text=text,
-        location=location,
-        attendee_query=attendee,
-        start_after=_parse_dt(start_after),
-        start_before=_parse_dt(start_before),
-    )
+    async def open_stream():
+        return await repo.stream_events(
+            text=text,
+            location=location,
+            attendee_query=attendee,
+            start_after=_parse_dt(start_after),
+            start_before=_parse_dt(start_before),
+        )
+    return await _paged(repo, open_stream, cursor, top)
+
+
+async def _search_everything(repo: GraphRepository, query: str, types=None, top=10, **kwargs):
+    kinds = [t.strip().lower() for t in types.split(",") if t.strip()] if types else None
+    try:
+        results = await repo.search_everything(query, top=max(1, min(int(top or 10), _MAX_TOP)), types=kinds)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    return [r.model_dump(mode="json") for r in results]
 
 
 _DISPATCH = {
@@ -120,6 +276,8 @@ _DISPATCH = {
     "find_people":         _find_people,
     "list_email":          _list_email,
     "read_email":          _read_email,
+    "read_emails":         _read_emails,
+    "search_emails":       _search_emails,
     "search_documents":    _search_documents,
     "search_files":        _search_files,
     "read_file":           _read_file,
@@ -127,6 +285,7 @@ _DISPATCH = {
     "list_contacts":       _list_contacts,
     "list_calendar":       _list_calendar,
     "search_events":       _search_events,
+    "search_everything":   _search_everything,
 }
 
 
@@ -142,6 +301,12 @@ def register_graph_tools(mcp, azure_settings, extract_token) -> None:
         _register_one(mcp, azure_settings, extract_token, tool_def)
 
 
+def _run_id(ctx: Context) -> str | None:
+    """Orchestrator run a tool call belongs to (scope of the coalescer's memo)."""
+    request = ctx.request_context.request
+    return request.headers.get(RUN_HEADER) if request is not None else None
+
+
 def _register_one(mcp, azure_settings, extract_token, tool_def: dict) -> None:
     method_name = tool_def["method"]
     params = tool_def.get("params", [])
@@ -151,11 +316,15 @@ def _register_one(mcp, azure_settings, extract_token, tool_def: dict) -> None:
             # Support async extract_token (voor OBO)
             if inspect.isawaitable(token):
                 token = await token
-            repo = _get_repo(token, azure_settings)
+            repo = await _get_repo(token, azure_settings)
             fn = _DISPATCH.get(_m)
             if fn:
-                return await fn(repo, **kwargs)
-            return await getattr(repo, _m)(**kwargs)
+                call = lambda: fn(repo, **kwargs)
+            else:
+                call = lambda: getattr(repo, _m)(**kwargs)
+            if repo.coalescer is None:
+                return await call()
+            return await repo.coalescer.run(_m, kwargs, call, run_id=_run_id(ctx))
 
     sig_params = [
         inspect.Parameter("ctx", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Context),
@@ -8,7 +8,7 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse, Response, RedirectResponse
 from starlette.types import ASGIApp, Receive, Scope, Send
 
-from graph.mcp_router import register_graph_tools
+from graph.mcp_router import graph_stats, register_graph_tools, token_object_id
 from shared.mcp_utils import extract_session_token
 
 
@@ -90,11 +90,32 @@ async def token_proxy(request: Request) -> Response:
                     media_type="application/json")
 
 
+def _unauthorized() -> Response:
+    return Response(
+        status_code=401,
+        headers={
+            "WWW-Authenticate": (
+                f'Bearer realm="{_RESOURCE_URI}",'
+                f' resource_metadata="{_RESOURCE_URI}/.well-known/oauth-protected-resource"'
+            )
+        },
+    )
+
+
+async def stats_endpoint(request: Request) -> Response:
+    # Counters of every user's caches: only for a caller with a token Graph accepts.
+    auth = request.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer ") or await token_object_id(auth[7:]) is None:
+        return _unauthorized()
+    return JSONResponse(graph_stats())
+
+
 _ROUTES = {
     "/.well-known/oauth-protected-resource": protected_resource_metadata,
     "/.well-known/oauth-authorization-server": authorization_server_metadata,
     "/authorize": authorize_proxy,
     "/token": token_proxy,
+    "/stats": stats_endpoint,
 }
 
 
@@ -167,15 +188,7 @@ class RoutingMiddleware:
         if path == "/mcp":
             auth = request.headers.get("authorization", "")
             if not auth.lower().startswith("bearer "):
-                response = Response(
-                    status_code=401,
-                    headers={
-                        "WWW-Authenticate": (
-                            f'Bearer realm="{_RESOURCE_URI}",'
-                            f' resource_metadata="{_RESOURCE_URI}/.well-known/oauth-protected-resource"'
-                        )
-                    },
-                )
+                response = _unauthorized()
                 await response(scope, receive, send)
                 return
 
@@ -0,0 +1,318 @@
+"""
+Text extraction from docx/xlsx straight from the zip, with incremental XML parsing.
+
+python-docx and openpyxl build a full object model just to read text. Here
+``word/document.xml`` and the xlsx sheet parts go through an incremental pull
+parser and every handled element is detached right away, so peak memory stays
+near the size of the largest paragraph or row.
+
+Output matches the previous paths: docx paragraphs and table rows in body
+order (cells joined with " | ", as the GraphRAG indexer renders them), xlsx
+sheets as tab-separated rows with openpyxl's value formatting (numbers,
+booleans, dates), minus its trailing empty cells. Namespaces are taken from
+the document itself, so Strict OOXML files work too.
+
+The element helpers are shared with graph/file_stream.py, which feeds them from
+ranged downloads instead of a local zip.
+"""
+import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import unquote
+
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+_READ_SIZE = 16 * 1024   # small feeds keep the queue of undetached elements short
+
+# Built-in number formats that openpyxl treats as dates/times.
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+
+
+class OfficeFormatError(Exception):
+    """The archive lacks the parts this module reads."""
+
+
+def local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _ns(tag: str) -> str:
+    """``{namespace}`` prefix of a tag, so child tags can be matched in C via iter()."""
+    return tag[: tag.find("}") + 1]
+
+
+def _joined(el: ET.Element, tag: str) -> str:
+    return "".join(node.text or "" for node in el.iter(tag))
+
+
+# docx -------------------------------------------------------------------------
+
+def docx_block_lines(el: ET.Element) -> list[str]:
+    """Lines for one child of ``w:body``: a paragraph or every row of a table."""
+    ns = _ns(el.tag)
+    if el.tag == ns + "p":
+        text = _joined(el, ns + "t").strip()
+        return [text] if text else []
+    if el.tag == ns + "tbl":
+        lines = []
+        for row in el.iter(ns + "tr"):
+            cells = [_joined(cell, ns + "t").strip() for cell in row.iter(ns + "tc")]
+            row_text = " | ".join(c for c in cells if c)
+            if row_text:
+                lines.append(row_text)
+        return lines
+    return []
+
+
+def _children_of(stream, parent: str) -> Iterator[ET.Element]:
+    """Yield each complete direct child of the ``parent`` elements, then drop it.
+
+    Handled children are detached, so the partial tree stays as small as the
+    element being parsed.
+    """
+    parser = ET.XMLPullParser(("start", "end"))
+    stack: list[ET.Element] = []
+    suffix = "}" + parent
+    while chunk := stream.read(_READ_SIZE):
+        parser.feed(chunk)
+        for event, el in parser.read_events():
+            if event == "start":
+                stack.append(el)
+                continue
+            stack.pop()
+            if stack and stack[-1].tag.endswith(suffix):
+                yield el
+                stack[-1].remove(el)
+    parser.close()
+
+
+def docx_text(zf: zipfile.ZipFile, max_chars: int | None = None) -> str:
+    try:
+        stream = zf.open("word/document.xml")
+    except KeyError as exc:
+        raise OfficeFormatError("no word/document.xml") from exc
+    parts = _Collector(max_chars)
+    with stream:
+        for el in _children_of(stream, "body"):
+            if not parts.extend(docx_block_lines(el)):
+                break
+    return parts.text()
+
+
+# xlsx -------------------------------------------------------------------------
+
+def shared_string(si: ET.Element) -> str:
+    """Text of an ``<si>``: plain ``<t>`` or rich-text runs; phonetic hints skipped."""
+    ns = _ns(si.tag)
+    t = si.find(ns + "t")
+    if t is not None:
+        return t.text or ""
+    return "".join(_joined(run, ns + "t") for run in si.iterfind(ns + "r"))
+
+
+def _is_date_format(code: str) -> bool:
+    code = _FORMAT_LITERALS.sub("", code).split(";")[0].lower()
+    return any(ch in code for ch in "dmyhs")
+
+
+def date_styles(styles: ET.Element | None) -> set[int]:
+    """Indexes into ``cellXfs`` whose number format is a date or time."""
+    if styles is None:
+        return set()
+    custom = {
+        int(fmt.get("numFmtId", -1)): fmt.get("formatCode", "")
+        for fmt in styles.iter() if local(fmt.tag) == "numFmt"
+    }
+    out = set()
+    cell_xfs = next((el for el in styles.iter() if local(el.tag) == "cellXfs"), None)
+    for i, xf in enumerate([] if cell_xfs is None else [x for x in cell_xfs if local(x.tag) == "xf"]):
+        fmt_id = int(xf.get("numFmtId", 0))
+        if fmt_id in _BUILTIN_DATE_FORMATS or (fmt_id in custom and _is_date_format(custom[fmt_id])):
+            out.add(i)
+    return out
+
+
+def sheet_parts(workbook: ET.Element, rels: ET.Element) -> list[tuple[str, str]]:
+    """``(sheet name, zip path)`` in workbook order."""
+    targets = {r.get("Id"): r.get("Target", "") for r in rels.iter(_PKG_REL + "Relationship")}
+    out = []
+    for sheet in workbook.iter():
+        if local(sheet.tag) != "sheet":
+            continue
+        rid = next((v for k, v in sheet.attrib.items() if local(k) == "id"), None)
+        target = unquote(targets.get(rid, ""))
+        if target:
+            out.append((sheet.get("name", ""), target.lstrip("/") if target.startswith("/") else "xl/" + target))
+    return out
+
+
+def _column(ref: str | None) -> int | None:
+    """Zero-based column of a cell reference such as ``AB12``."""
+    if not ref:
+        return None
+    col = 0
+    for ch in ref.rstrip("0123456789"):
+        col = col * 26 + (ord(ch) & 31)   # A/a → 1 … Z/z → 26
+    return col - 1
+
+
+def _number(raw: str, is_date: bool) -> str:
+    if "." in raw or "E" in raw or "e" in raw:
+        value = float(raw)
+    else:
+        value = int(raw)
+        if not is_date:
+            return raw if raw[0] != "0" or raw == "0" else str(value)
+    if not is_date:
+        return str(value)
+    # Same conversion as openpyxl: millisecond precision, 1900 leap-year bug.
+    day, fraction = divmod(value, 1)
+    if 0 <= value < 60:
+        day += 1
+    return str(_EXCEL_EPOCH + timedelta(days=day, milliseconds=round(fraction * 86_400_000)))
+
+
+def row_cells(row: ET.Element, dates: set[int]) -> list[tuple[int | None, str | None, str]]:
+    """``(column, shared-string index or None, text)`` for each cell of a row.
+
+    Shared strings are returned as an index so callers can resolve them lazily.
+    """
+    ns = _ns(row.tag)
+    c_tag, v_tag = ns + "c", ns + "v"
+    out = []
+    for cell in row.iterfind(c_tag):
+        col = _column(cell.get("r"))
+        kind = cell.get("t")
+        if kind == "inlineStr":
+            out.append((col, None, _joined(cell, ns + "t")))
+            continue
+        raw = cell.findtext(v_tag)
+        if raw is None:
+            out.append((col, None, ""))
+        elif kind == "s":
+            out.append((col, raw, ""))
+        elif kind == "b":
+            out.append((col, None, "True" if raw == "1" else "False"))
+        elif kind in ("str", "e"):
+            out.append((col, None, raw))
+        else:
+            try:
+                is_date = bool(dates) and int(cell.get("s", 0)) in dates
+                out.append((col, None, _number(raw, is_date)))
+            except (ValueError, OverflowError):
+                out.append((col, None, raw))
+    return out
+
+
+def render_row(values: list[tuple[int | None, str]]) -> str:
+    """Tab-separated row; gaps between referenced columns become empty fields."""
+    fields: list[str] = []
+    for col, text in values:
+        if col is not None and col > len(fields):
+            fields.extend([""] * (col - len(fields)))
+        fields.append(text)
+    return "\t".join(fields)
+
+
+def _element(zf: zipfile.ZipFile, name: str) -> ET.Element | None:
+    try:
+        with zf.open(name) as f:
+            return ET.parse(f).getroot()
+    except KeyError:
+        return None
+
+
+class _SharedStrings:
+    """xl/sharedStrings.xml, parsed only up to the highest index requested so far."""
+
+    def __init__(self, zf: zipfile.ZipFile):
+        self._values: list[str] = []
+        try:
+            self._stream = zf.open("xl/sharedStrings.xml")
+        except KeyError:
+            self._stream = None
+        self._items = _children_of(self._stream, "sst") if self._stream else iter(())
+
+    def get(self, index: int) -> str:
+        while len(self._values) <= index:
+            si = next(self._items, None)
+            if si is None:
+                return ""
+            self._values.append(shared_string(si))
+        return self._values[index]
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+
+
+def xlsx_text(zf: zipfile.ZipFile, max_chars: int | None = None) -> str:
+    workbook = _element(zf, "xl/workbook.xml")
+    rels = _element(zf, "xl/_rels/workbook.xml.rels")
+    if workbook is None or rels is None:
+        raise OfficeFormatError("no workbook part")
+    dates = date_styles(_element(zf, "xl/styles.xml"))
+    names = set(zf.namelist())
+
+    strings = _SharedStrings(zf)
+    parts = _Collector(max_chars)
+    try:
+        for name, path in sheet_parts(workbook, rels):
+            if path not in names:
+                continue
+            if not parts.add(f"=== Sheet: {name} ==="):
+                break
+            with zf.open(path) as stream:
+                for row in _children_of(stream, "sheetData"):
+                    line = render_row([
+                        (col, strings.get(int(idx)) if idx is not None else text)
+                        for col, idx, text in row_cells(row, dates)
+                    ])
+                    if line.strip() and not parts.add(line):
+                        break
+            if parts.full:
+                break
+    finally:
+        strings.close()
+    return parts.text()
+
+
+# entry point ------------------------------------------------------------------
+
+class _Collector:
+    def __init__(self, max_chars: int | None):
+        self.max_chars = max_chars
+        self.parts: list[str] = []
+        self.size = 0
+        self.full = False
+
+    def add(self, line: str) -> bool:
+        self.parts.append(line)
+        self.size += len(line) + 1
+        if self.max_chars is not None and self.size > self.max_chars:
+            self.full = True
+        return not self.full
+
+    def extend(self, lines: list[str]) -> bool:
+        return all(self.add(line) for line in lines)
+
+    def text(self) -> str:
+        return "\n".join(self.parts)
+
+
+def office_text(source: bytes | str | Path, max_chars: int | None = None) -> str:
+    """Text of a docx or xlsx given as bytes or a path.
+
+    With *max_chars*, parsing stops once that many characters are collected
+    (the result may run slightly past it; callers truncate).
+    Raises OfficeFormatError / zipfile.BadZipFile for other files.
+    """
+    with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source) as zf:
+        if "xl/workbook.xml" in zf.namelist():
+            return xlsx_text(zf, max_chars)
+        return docx_text(zf, max_chars)
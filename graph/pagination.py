@@ -0,0 +1,153 @@
+"""
+Lazy pagination over Graph collections, with server-side continuation cursors.
+
+Graph list endpoints return one page plus an ``@odata.nextLink``. ``follow``
+turns that into an async generator that requests the next page only when the
+consumer asks for more, so a caller that stops after N results (or after its
+time budget) never pays for pages it does not read.
+
+A ``ResultStream`` wraps such a generator together with any filter the tool
+applies on top (e.g. ``filetype:xlsx``, which Graph cannot filter on), so a
+filter that rejects most of a page keeps reading until enough results match.
+When results remain, the stream is parked in the user's ``CursorStore``; a
+"show more" call resumes the suspended generator where it stopped, so earlier
+pages are not fetched again.
+"""
+import logging
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Awaitable, Callable
+
+log = logging.getLogger("graph.pagination")
+
+_DEFAULT_MAX_PAGES = 10
+_DEFAULT_CURSOR_TTL = 600.0     # seconds an unused cursor stays resumable
+_DEFAULT_MAX_CURSORS = 32       # per user; the least recently used is dropped
+
+
+async def follow(
+    get_json: Callable[..., Awaitable[dict]],
+    url: str,
+    params: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+    max_pages: int = _DEFAULT_MAX_PAGES,
+    on_page: Callable[[], None] | None = None,
+) -> AsyncIterator[tuple[list[dict], bool]]:
+    """Yield ``(items, more)`` per page of a Graph collection, fetching on demand."""
+    for n in range(1, max_pages + 1):
+        page = await get_json(url, headers=headers, params=params)
+        if on_page is not None:
+            on_page()
+        url = page.get("@odata.nextLink")
+        if url and n == max_pages:
+            log.info("[pagination] stopped after %d page(s), more available", max_pages)
+        yield page.get("value", []), bool(url) and n < max_pages
+        if not url:
+            return
+        params = None   # the next link already carries the query
+
+
+async def single_page(items: list) -> AsyncIterator[tuple[list, bool]]:
+    """A locally computed result list (mirror, calendar index) as a one-page source."""
+    yield items, False
+
+
+class ResultStream:
+    """Results of a paged source, filtered and handed out in slices."""
+
+    def __init__(
+        self,
+        pages: AsyncIterator[tuple[list, bool]],
+        convert: Callable[[object], object] | None = None,
+        predicate: Callable[[object], bool] | None = None,
+    ):
+        self._pages = pages
+        self._convert = convert
+        self._predicate = predicate
+        self._buffer: deque = deque()
+        self._last_page = False
+
+    @property
+    def exhausted(self) -> bool:
+        return self._last_page and not self._buffer
+
+    async def _fill(self) -> bool:
+        while not self._buffer:
+            if self._last_page:
+                return False
+            items, more = await anext(self._pages)
+            self._last_page = not more
+            if self._convert is not None:
+                items = map(self._convert, items)
+            self._buffer.extend(i for i in items if self._predicate is None or self._predicate(i))
+        return True
+
+    async def take(self, n: int, budget: float | None = None) -> list:
+        """Up to *n* results; no page is fetched after *budget* seconds.
+
+        Pages are only requested while the buffer is empty, so stopping at *n*
+        never costs an extra round trip.
+        """
+        deadline = None if budget is None else time.monotonic() + budget
+        out: list = []
+        while len(out) < n:
+            if not self._buffer and out and deadline is not None and time.monotonic() > deadline:
+                break
+            if not await self._fill():
+                break
+            out.append(self._buffer.popleft())
+        return out
+
+
+class CursorStore:
+    """Per-user parking lot for unfinished ResultStreams, keyed by an opaque cursor."""
+
+    def __init__(self, ttl: float = _DEFAULT_CURSOR_TTL, max_cursors: int = _DEFAULT_MAX_CURSORS):
+        self._ttl = ttl
+        self._max = max_cursors
+        self._streams: OrderedDict[str, tuple[ResultStream, float]] = OrderedDict()
+        self.issued = 0
+        self.resumed = 0
+        self.expired = 0
+        self.pages = 0
+
+    def count_page(self) -> None:
+        self.pages += 1
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for cursor, (_, expires) in list(self._streams.items()):
+            if expires < now:
+                del self._streams[cursor]
+                self.expired += 1
+        while len(self._streams) > self._max:
+            self._streams.popitem(last=False)
+            self.expired += 1
+
+    def put(self, stream: ResultStream) -> str | None:
+        """Park *stream* and return its cursor; None when it has no more results."""
+        if stream.exhausted:
+            return None
+        cursor = secrets.token_urlsafe(12)
+        self._streams[cursor] = (stream, time.monotonic() + self._ttl)
+        self.issued += 1
+        self._prune()
+        return cursor
+
+    def pop(self, cursor: str) -> ResultStream | None:
+        self._prune()
+        entry = self._streams.pop(cursor, None)
+        if entry is None:
+            return None
+        self.resumed += 1
+        return entry[0]
+
+    def stats(self) -> dict:
+        return {
+            "open_cursors": len(self._streams),
+            "cursors_issued": self.issued,
+            "cursors_resumed": self.resumed,
+            "cursors_expired": self.expired,
+            "pages_fetched": self.pages,
+        }
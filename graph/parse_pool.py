@@ -0,0 +1,228 @@
+"""
+Off-loop document parsing in a bounded process pool.
+
+Parsing a whole workbook on the MCP server's event loop stalls every other
+tool call, even with the iterparse extractor. Full-file parses run here
+instead, in worker processes that each carry an address-space limit (RLIMIT_AS,
+where the platform supports it). Every job has a timeout, counted from the
+moment a worker starts it (time queued or spent spawning workers does not
+count). A worker that overruns it is killed by recycling the pool it ran in;
+the other jobs that were on that pool are resubmitted to a fresh one.
+
+Configuration: GRAPH_PARSE_WORKERS (default min(4, cpu count)),
+GRAPH_PARSE_TIMEOUT seconds (default 20) and GRAPH_PARSE_MEMORY_MB per
+worker (default 1024).
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+from graph.office_text import OfficeFormatError, office_text
+
+log = logging.getLogger("graph.parse_pool")
+
+_DEFAULT_TIMEOUT = 20.0
+_DEFAULT_MEMORY_MB = 1024
+
+
+class ParseError(Exception):
+    """A parse job timed out, ran out of memory or lost its worker."""
+
+
+def _limit_memory(max_bytes: int) -> None:
+    if resource is not None and max_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+# worker side: tells the parent when a job starts
+_started = None
+
+
+def _init_worker(max_bytes: int, started, lock) -> None:
+    global _started
+    _started = (started, lock)
+    _limit_memory(max_bytes)
+
+
+def _job(job_id: int, fn: Callable, *args):
+    conn, lock = _started
+    with lock:
+        conn.send(job_id)
+    return fn(*args)
+
+
+# jobs (run in the worker processes) -----------------------------------------
+
+def parse_office(content_bytes: bytes, max_chars: int | None = None) -> str | None:
+    """Text of a docx/xlsx file; None if it is a zip that is neither."""
+    try:
+        return office_text(content_bytes, max_chars)
+    except (zipfile.BadZipFile, OfficeFormatError):
+        return None
+    except ET.ParseError as exc:
+        return f"[Could not parse Office file: {exc}]"
+
+
+# pool -----------------------------------------------------------------------
+
+class _Workers:
+    """One process pool plus the thread that hears which job a worker started."""
+
+    def __init__(self, max_workers: int, memory_limit: int, on_start: Callable[[int], None]):
+        # spawn: forking a process that runs an event loop and threads is unsafe.
+        ctx = multiprocessing.get_context("spawn")
+        self._reader, writer = ctx.Pipe(duplex=False)
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(memory_limit, writer, ctx.Lock()),
+        )
+        self.killed_for_timeout = False
+        self._stop = threading.Event()
+        self._on_start = on_start
+        threading.Thread(target=self._listen, name="parse-pool-starts", daemon=True).start()
+
+    def _listen(self) -> None:
+        try:
+            while not self._stop.is_set():
+                if self._reader.poll(0.1):
+                    self._on_start(self._reader.recv())
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._reader.close()
+
+    def kill(self) -> None:
+        """Kill all workers (a stuck job cannot be cancelled otherwise)."""
+        for proc in list((getattr(self.executor, "_processes", None) or {}).values()):
+            proc.kill()
+        # Jobs still on this pool fail with BrokenProcessPool (not cancelled),
+        # so their callers can tell and resubmit them.
+        self.executor.shutdown(wait=False)
+        self._stop.set()
+
+
+class ParsePool:
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        timeout: float = _DEFAULT_TIMEOUT,
+        memory_limit: int = _DEFAULT_MEMORY_MB * 1024 * 1024,
+    ):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._pool: _Workers | None = None
+        self._job_ids = itertools.count()
+        # job id → (loop, event set when a worker starts the job)
+        self._starting: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self.jobs = 0
+        self.timeouts = 0
+        self.memory_errors = 0
+        self.crashes = 0
+        self.resubmitted = 0
+
+    def _executor(self) -> _Workers:
+        if self._pool is None:
+            self._pool = _Workers(self.max_workers, self.memory_limit, self._job_started)
+        return self._pool
+
+    def _job_started(self, job_id: int) -> None:
+        entry = self._starting.get(job_id)
+        if entry is not None:
+            loop, event = entry
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:    # loop closed
+                pass
+
+    def _recycle(self, workers: _Workers) -> None:
+        """Kill the workers of *workers*; later jobs get a new pool."""
+        if self._pool is workers:
+            self._pool = None
+        workers.kill()
+
+    async def run(self, fn: Callable, *args):
+        """Run ``fn(*args)`` in a worker; raises ParseError on timeout, OOM or crash."""
+        self.jobs += 1
+        while True:
+            workers = self._executor()
+            try:
+                return await self._run_on(workers, fn, args)
+            except BrokenProcessPool:
+                if workers.killed_for_timeout:
+                    # Killed along with another job that overran its timeout.
+                    self.resubmitted += 1
+                    continue
+                self.crashes += 1
+                self._recycle(workers)
+                raise ParseError("parser worker crashed")
+
+    async def _run_on(self, workers: _Workers, fn: Callable, args: tuple):
+        loop = asyncio.get_running_loop()
+        job_id = next(self._job_ids)
+        started = asyncio.Event()
+        self._starting[job_id] = (loop, started)
+        future = loop.run_in_executor(workers.executor, _job, job_id, fn, *args)
+        waiting = asyncio.ensure_future(started.wait())
+        try:
+            # The timeout starts when a worker picks the job up.
+            await asyncio.wait({future, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            log.warning("[parse_pool] %s timed out after %.0fs, recycling workers", fn.__name__, self.timeout)
+            workers.killed_for_timeout = True
+            self._recycle(workers)
+            raise ParseError(f"parsing took longer than {self.timeout:.0f}s")
+        except MemoryError:
+            self.memory_errors += 1
+            raise ParseError(f"parsing needs more than {self.memory_limit // (1024 * 1024)} MB")
+        finally:
+            waiting.cancel()
+            self._starting.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.executor.shutdown(wait=True, cancel_futures=True)
+            self._pool.kill()
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "memory_errors": self.memory_errors,
+            "crashes": self.crashes,
+            "resubmitted": self.resubmitted,
+        }
+
+
+_pool: ParsePool | None = None
+
+
+def get_parse_pool() -> ParsePool:
+    global _pool
+    if _pool is None:
+        workers = os.environ.get("GRAPH_PARSE_WORKERS")
+        _pool = ParsePool(
+            max_workers=int(workers) if workers else None,
+            timeout=float(os.environ.get("GRAPH_PARSE_TIMEOUT", _DEFAULT_TIMEOUT)),
+            memory_limit=int(float(os.environ.get("GRAPH_PARSE_MEMORY_MB", _DEFAULT_MEMORY_MB)) * 1024 * 1024),
+        )
+    return _pool
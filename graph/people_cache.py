@@ -0,0 +1,97 @@
+"""
+Per-user cache of find_people resolutions.
+
+Entries are keyed by the normalized query and expire after a TTL. When an
+entry is *complete* (no source hit its ``top`` limit) it holds every match
+for that query, so a longer query starting with it ("jan" → "jan d") can be
+answered by filtering the cached people locally.
+"""
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from graph.models import EmailAddress
+
+_DEFAULT_TTL = 600.0
+_DEFAULT_MAX_ENTRIES = 512
+
+_WORD_SPLIT = re.compile(r"[\s.@_\-]+")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _matches(person: EmailAddress, query: str) -> bool:
+    """Every query token must prefix a word of the name or address."""
+    words = set()
+    for field in (person.name, person.address):
+        if field:
+            words.update(w for w in _WORD_SPLIT.split(field.lower()) if w)
+    name = (person.name or "").lower()
+    address = (person.address or "").lower()
+    if name.startswith(query) or address.startswith(query):
+        return True
+    return all(any(w.startswith(tok) for w in words) for tok in query.split())
+
+
+@dataclass
+class _Entry:
+    people: list[EmailAddress]
+    top: int
+    complete: bool
+    expires_at: float
+
+
+class PeopleCache:
+    def __init__(
+        self,
+        ttl: float = _DEFAULT_TTL,
+        max_entries: int = _DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: dict[str, _Entry] = {}
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def get(self, query: str, top: int) -> list[EmailAddress] | None:
+        key = normalize_query(query)
+        now = self._clock()
+
+        entry = self._entries.get(key)
+        if entry and entry.expires_at > now and (entry.complete or entry.top >= top):
+            self.hits += 1
+            return entry.people[:top]
+
+        # Longest cached complete prefix wins ("jan d" before "jan" before "ja").
+        for i in range(len(key) - 1, 0, -1):
+            entry = self._entries.get(key[:i])
+            if entry and entry.complete and entry.expires_at > now:
+                self.prefix_hits += 1
+                return [p for p in entry.people if _matches(p, key)][:top]
+
+        self.misses += 1
+        return None
+
+    def put(self, query: str, people: list[EmailAddress], top: int, complete: bool) -> None:
+        now = self._clock()
+        if len(self._entries) >= self._max_entries:
+            self._entries = {k: e for k, e in self._entries.items() if e.expires_at > now}
+            while len(self._entries) >= self._max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[normalize_query(query)] = _Entry(
+            people=people, top=top, complete=complete, expires_at=now + self._ttl
+        )
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+        }
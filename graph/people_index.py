@@ -0,0 +1,386 @@
+"""
+Local person lookup for find_people: tenant directory and correspondents.
+
+Two sources are held in memory in a prefix trie over the words of each
+person's name and address, so a lookup is answered locally with
+case-insensitive prefix matching, and with typo-tolerant (edit distance)
+prefix matching when the exact prefixes find too little:
+
+- ``DirectorySnapshot`` — the tenant's users, shared by every user of the
+  tenant, synced with /users/delta. The delta link is kept, so a refresh
+  only transfers the changes since the previous one.
+- ``CorrespondentIndex`` — per user, the senders and recipients of their
+  newest messages (headers only), ranked by how often they occur. Refreshes
+  read only the messages received since the last one.
+
+Like the mail mirror, a source only answers while it is fresh (synced less
+than its max age ago); otherwise the repository asks Graph live and a
+background refresh is started. GRAPH_PEOPLE_INDEX=0 turns both off;
+GRAPH_DIRECTORY_MAX_AGE (default 900 s), GRAPH_CORRESPONDENT_MAX_AGE
+(default 300 s) and GRAPH_CORRESPONDENT_MESSAGES (default 2000) tune them.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import os
+import re
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+from graph.models import EmailAddress
+from graph.people_cache import _matches, normalize_query
+
+log = logging.getLogger("graph.people_index")
+
+_DEFAULT_DIRECTORY_MAX_AGE = 900.0
+_DEFAULT_CORRESPONDENT_MAX_AGE = 300.0
+_DEFAULT_CORRESPONDENT_MESSAGES = 2000
+_PAGE_SIZE = 200
+
+_WORD_SPLIT = re.compile(r"[\s.@_\-,;:'\"()<>]+")
+
+GetJson = Callable[..., Awaitable[dict]]
+
+
+def people_index_enabled() -> bool:
+    return os.environ.get("GRAPH_PEOPLE_INDEX", "1").lower() not in ("0", "false", "no")
+
+
+def _words(text: str) -> list[str]:
+    return [w for w in _WORD_SPLIT.split(text.lower()) if w]
+
+
+def _max_typos(token: str) -> int:
+    """Edit distance tolerated for a query token: none for short ones."""
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+class _Node:
+    __slots__ = ("children", "keys")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.keys: set[str] = set()
+
+
+class PrefixIndex:
+    """People by the words of their name and address, in a character trie.
+
+    Each person is stored under a key (the lower-cased address) with a score;
+    results are ordered by score, then name.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._people: dict[str, EmailAddress] = {}
+        self._scores: dict[str, float] = {}
+        self._words: dict[str, list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._people)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._people
+
+    def add(self, key: str, person: EmailAddress, score: float = 0.0) -> None:
+        """Insert or replace *person* under *key*."""
+        self.remove(key)
+        words = set(_words(person.name or "")) | set(_words(person.address or ""))
+        # The full address too, so "jan.pe" matches "jan.peeters@…" as a prefix.
+        if person.address:
+            words.add(person.address.lower())
+        for word in words:
+            node = self._root
+            for ch in word:
+                node = node.children.setdefault(ch, _Node())
+            node.keys.add(key)
+        self._people[key] = person
+        self._scores[key] = score
+        self._words[key] = list(words)
+
+    def remove(self, key: str) -> None:
+        for word in self._words.pop(key, ()):
+            path = [self._root]
+            for ch in word:
+                path.append(path[-1].children[ch])
+            path[-1].keys.discard(key)
+            # Prune the branch back to the last node still in use.
+            for i in range(len(word), 0, -1):
+                node = path[i]
+                if node.keys or node.children:
+                    break
+                del path[i - 1].children[word[i - 1]]
+        self._people.pop(key, None)
+        self._scores.pop(key, None)
+
+    def bump(self, key: str, by: float = 1.0) -> None:
+        self._scores[key] = self._scores.get(key, 0.0) + by
+
+    def get(self, key: str) -> EmailAddress | None:
+        return self._people.get(key)
+
+    def score(self, key: str) -> float:
+        return self._scores.get(key, 0.0)
+
+    @staticmethod
+    def _collect(node: _Node, out: set[str]) -> None:
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            out |= n.keys
+            stack.extend(n.children.values())
+
+    def _prefixed(self, token: str) -> set[str]:
+        node = self._root
+        for ch in token:
+            node = node.children.get(ch)
+            if node is None:
+                return set()
+        out: set[str] = set()
+        self._collect(node, out)
+        return out
+
+    def _fuzzy(self, token: str, k: int) -> set[str]:
+        """Keys with a word that starts with *token* give or take *k* edits."""
+        out: set[str] = set()
+        first = list(range(len(token) + 1))
+        stack = [(child, ch, first) for ch, child in self._root.children.items()]
+        while stack:
+            node, ch, prev = stack.pop()
+            # One Levenshtein row per trie edge (prefix of the word vs token).
+            row = [prev[0] + 1]
+            for j in range(1, len(token) + 1):
+                row.append(min(row[j - 1] + 1, prev[j] + 1, prev[j - 1] + (token[j - 1] != ch)))
+            if row[-1] <= k:
+                self._collect(node, out)
+            elif min(row) <= k:
+                stack.extend((child, c, row) for c, child in node.children.items())
+        return out
+
+    def search(self, query: str, top: int = 5) -> list[EmailAddress]:
+        """People matching every word of *query* as a prefix; typos tolerated as fallback."""
+        key = normalize_query(query)
+        tokens = _words(key)
+        if not tokens:
+            return []
+        # The rarest token narrows the candidates; the others are checked per person.
+        candidates = min((self._prefixed(t) for t in tokens), key=len)
+        found = self._ranked(k for k in candidates if _matches(self._people[k], key))
+        if len(found) < top and any(_max_typos(t) for t in tokens):
+            fuzzy = set.intersection(*[
+                self._fuzzy(t, _max_typos(t)) if _max_typos(t) else self._prefixed(t) for t in tokens
+            ])
+            found += self._ranked(fuzzy - set(found))
+        return [self._people[k] for k in found[:top]]
+
+    def _ranked(self, keys) -> list[str]:
+        return sorted(keys, key=lambda k: (-self._scores[k], (self._people[k].name or "").lower(), k))
+
+
+class _IndexSource(ABC):
+    """Freshness and background refresh shared by the two indexes."""
+
+    def __init__(self, max_age: float, clock: Callable[[], float]):
+        self.max_age = max_age
+        self._clock = clock
+        self.index = PrefixIndex()
+        self.synced_at: float | None = None
+        self._sync_task: asyncio.Task | None = None
+        self.local_queries = 0
+        self.live_fallbacks = 0
+        self.syncs = 0
+
+    def is_fresh(self) -> bool:
+        return self.synced_at is not None and self._clock() - self.synced_at < self.max_age
+
+    def usable(self, get_json: GetJson) -> bool:
+        """True if lookups can be answered locally; otherwise schedules a refresh."""
+        if self.is_fresh():
+            self.local_queries += 1
+            return True
+        self.live_fallbacks += 1
+        self.schedule_sync(get_json)
+        return False
+
+    def schedule_sync(self, get_json: GetJson) -> None:
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_logged(get_json))
+
+    async def _sync_logged(self, get_json: GetJson) -> None:
+        try:
+            await self.sync(get_json)
+        except Exception as exc:
+            log.warning("[people_index] %s sync failed: %s", type(self).__name__, exc)
+
+    @abstractmethod
+    async def sync(self, get_json: GetJson) -> int: ...
+
+    def search(self, query: str, top: int = 5) -> list[EmailAddress]:
+        return self.index.search(query, top)
+
+    def stats(self) -> dict:
+        return {
+            "people": len(self.index),
+            "syncs": self.syncs,
+            "local_queries": self.local_queries,
+            "live_fallbacks": self.live_fallbacks,
+        }
+
+
+class DirectorySnapshot(_IndexSource):
+    """The users of one tenant, kept current with /users/delta.
+
+    One snapshot per tenant, shared by its users: it takes the *get_json* of
+    whichever user's lookup triggers a refresh, so it never holds on to a
+    credential that may expire.
+    """
+
+    _tenants: dict[str, "DirectorySnapshot"] = {}
+
+    def __init__(self, max_age: float | None = None, clock: Callable[[], float] = time.monotonic):
+        super().__init__(
+            max_age if max_age is not None
+            else float(os.environ.get("GRAPH_DIRECTORY_MAX_AGE", _DEFAULT_DIRECTORY_MAX_AGE)),
+            clock,
+        )
+        self._delta_link: str | None = None
+        self._keys: dict[str, str] = {}   # user id → index key
+
+    @classmethod
+    def for_tenant(cls, tenant_id: str | None) -> "DirectorySnapshot | None":
+        """The snapshot of *tenant_id*, or None when unknown or disabled."""
+        if not tenant_id or not people_index_enabled():
+            return None
+        snapshot = cls._tenants.get(tenant_id)
+        if snapshot is None:
+            snapshot = cls._tenants[tenant_id] = cls()
+        return snapshot
+
+    @classmethod
+    def all_stats(cls) -> dict:
+        total: dict = {"tenants": len(cls._tenants)}
+        for snapshot in cls._tenants.values():
+            for k, v in snapshot.stats().items():
+                total[k] = total.get(k, 0) + v
+        return total
+
+    async def sync(self, get_json: GetJson) -> int:
+        """Apply the directory changes since the last sync. Returns their number."""
+        started = self._clock()
+        try:
+            changed = await self._sync_delta(get_json)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 410 or self._delta_link is None:
+                raise
+            # Delta token expired: start over from a full snapshot.
+            log.info("[people_index] directory delta token expired, resyncing")
+            self.index, self._keys, self._delta_link = PrefixIndex(), {}, None
+            changed = await self._sync_delta(get_json)
+        self.synced_at = started
+        self.syncs += 1
+        log.info("[people_index] directory sync: %d change(s), %d user(s)", changed, len(self.index))
+        return changed
+
+    async def _sync_delta(self, get_json: GetJson) -> int:
+        url = self._delta_link or "/users/delta?$select=id,displayName,mail,userPrincipalName"
+        changed = 0
+        while url:
+            page = await get_json(url, headers={"Prefer": f"odata.maxpagesize={_PAGE_SIZE}"})
+            for u in page.get("value", []):
+                self._apply(u)
+                changed += 1
+            url = page.get("@odata.nextLink")
+            if page.get("@odata.deltaLink"):
+                self._delta_link = page["@odata.deltaLink"]
+        return changed
+
+    def _apply(self, u: dict) -> None:
+        old = self._keys.pop(u["id"], None)
+        if "@removed" in u:
+            if old:
+                self.index.remove(old)
+            return
+        # Delta pages for updates carry only the changed properties.
+        previous = self.index.get(old) if old else None
+        name = u.get("displayName", previous.name if previous else None)
+        address = u.get("mail") or u.get("userPrincipalName") or (previous.address if previous else None)
+        if old:
+            self.index.remove(old)
+        if address:
+            key = address.lower()
+            self.index.add(key, EmailAddress(name=name, address=address))
+            self._keys[u["id"]] = key
+
+
+class CorrespondentIndex(_IndexSource):
+    """Senders and recipients of one user's newest messages, ranked by frequency."""
+
+    def __init__(
+        self,
+        max_age: float | None = None,
+        max_messages: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(
+            max_age if max_age is not None
+            else float(os.environ.get("GRAPH_CORRESPONDENT_MAX_AGE", _DEFAULT_CORRESPONDENT_MAX_AGE)),
+            clock,
+        )
+        self.max_messages = max_messages if max_messages is not None else int(
+            os.environ.get("GRAPH_CORRESPONDENT_MESSAGES", _DEFAULT_CORRESPONDENT_MESSAGES)
+        )
+        self._newest: str | None = None      # receivedDateTime of the newest message read
+        self._seen_at_newest: set[str] = set()
+
+    @classmethod
+    def create(cls) -> "CorrespondentIndex | None":
+        return cls() if people_index_enabled() else None
+
+    async def sync(self, get_json: GetJson) -> int:
+        """Add the correspondents of messages received since the last sync."""
+        started = self._clock()
+        params = (
+            "$select=id,from,toRecipients,ccRecipients,receivedDateTime"
+            f"&$orderby=receivedDateTime desc&$top={min(_PAGE_SIZE, self.max_messages)}"
+        )
+        if self._newest:
+            params += f"&$filter=receivedDateTime ge {self._newest}"
+        url: str | None = f"/me/messages?{params}"
+        read = 0
+        newest, seen = self._newest, set(self._seen_at_newest)
+        while url and read < self.max_messages:
+            page = await get_json(url)
+            for m in page.get("value", []):
+                received = m.get("receivedDateTime") or ""
+                if received == self._newest and m["id"] in self._seen_at_newest:
+                    continue
+                if newest is None or received > newest:
+                    newest, seen = received, set()
+                if received == newest:
+                    seen.add(m["id"])
+                self._add_message(m)
+                read += 1
+            url = page.get("@odata.nextLink")
+        self._newest, self._seen_at_newest = newest, seen
+        self.synced_at = started
+        self.syncs += 1
+        log.info("[people_index] correspondents sync: %d message(s), %d people", read, len(self.index))
+        return read
+
+    def _add_message(self, m: dict) -> None:
+        people = [(m.get("from") or {}).get("emailAddress")]
+        people += [r.get("emailAddress") for r in (m.get("toRecipients") or []) + (m.get("ccRecipients") or [])]
+        for p in people:
+            address = (p or {}).get("address")
+            if not address:
+                continue
+            key = address.lower()
+            if key not in self.index:
+                self.index.add(key, EmailAddress(name=p.get("name") or None, address=address))
+            elif p.get("name") and not self.index.get(key).name:
+                self.index.add(key, EmailAddress(name=p["name"], address=address), self.index.score(key))
+            self.index.bump(key)
@@ -0,0 +1,176 @@
+"""
+Speculative text extraction for the top hits of a file search.
+
+The agent nearly always follows ``search_files`` with ``read_file`` or
+``read_multiple_files`` on the first few hits. Right after a search, the
+text of the top-k readable files is extracted in the background (one $batch
+for the item lookups, then the usual ranged download and parse), so that
+the read that follows finds it ready, or joins the extraction underway,
+instead of paying for it on the critical path.
+
+Prefetched texts are held per user until they are read once or expire
+(the file may change meanwhile). Memory is bounded twice: per user by entry
+count, and for the whole process by bytes. When a bound is hit, the oldest
+unread entries go first and extractions that are still running are
+cancelled. Configuration: GRAPH_PREFETCH_TOP (hits per search, default 3,
+0 disables), GRAPH_PREFETCH_MEMORY_MB (process-wide, default 32).
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+log = logging.getLogger("graph.prefetch")
+
+PREFETCH_SUFFIXES = (".docx", ".docm", ".xlsx", ".xlsm", ".txt", ".md", ".csv", ".json")
+
+_DEFAULT_TOP = 3
+_DEFAULT_MEMORY_MB = 32
+_MAX_ENTRIES = 12          # per user
+_TTL = 300.0               # seconds an unread prefetch is kept
+
+
+class _Budget:
+    """Bytes of prefetched text held by all users together."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+
+    def over(self) -> bool:
+        return self.used > self.limit
+
+
+_budget = _Budget(int(float(os.environ.get("GRAPH_PREFETCH_MEMORY_MB", _DEFAULT_MEMORY_MB)) * 1024 * 1024))
+
+
+def prefetch_top() -> int:
+    return int(os.environ.get("GRAPH_PREFETCH_TOP", _DEFAULT_TOP))
+
+
+@dataclass
+class _Entry:
+    task: asyncio.Task
+    created: float
+    size: int = field(default=0)
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        max_entries: int = _MAX_ENTRIES,
+        ttl: float = _TTL,
+        budget: _Budget | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._budget = budget or _budget
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.started = 0
+        self.served = 0
+        self.served_running = 0
+        self.unused = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def start(
+        self,
+        file_ids: list[str],
+        lookup: Callable[[list[str]], Awaitable[dict]],
+        extract: Callable[[str, dict], Awaitable[str]],
+    ) -> None:
+        """Begin extracting *file_ids* in the background.
+
+        *lookup* maps the ids to driveItem resources (or exceptions) in one
+        call; *extract* turns one resource into text.
+        """
+        ids = [fid for fid in file_ids if fid not in self._entries]
+        if not ids or self._budget.over():
+            return
+        items = asyncio.ensure_future(lookup(ids))
+        items.add_done_callback(lambda t: t.cancelled() or t.exception())
+        for fid in ids:
+            task = asyncio.ensure_future(self._extract_one(fid, items, extract))
+            entry = _Entry(task, self._clock())
+            task.add_done_callback(lambda t, e=entry: self._finished(e))
+            self._entries[fid] = entry
+            self.started += 1
+        log.info("[prefetch] started %d file(s)", len(ids))
+        self._evict()
+
+    @staticmethod
+    async def _extract_one(fid: str, items: asyncio.Future, extract) -> str:
+        item = (await asyncio.shield(items))[fid]
+        if isinstance(item, Exception):
+            raise item
+        return await extract(fid, item)
+
+    def _finished(self, entry: _Entry) -> None:
+        if entry.task.cancelled():
+            return
+        if entry.task.exception() is not None:
+            self.failed += 1
+            return
+        if any(e is entry for e in self._entries.values()):
+            entry.size = len(entry.task.result().encode("utf-8"))
+            self._budget.used += entry.size
+            self._evict()
+
+    def _drop(self, fid: str) -> _Entry:
+        entry = self._entries.pop(fid)
+        self._budget.used -= entry.size
+        entry.size = 0
+        if not entry.task.done():
+            entry.task.cancel()
+            self.cancelled += 1
+        return entry
+
+    def _evict(self) -> None:
+        now = self._clock()
+        for fid in [f for f, e in self._entries.items() if now - e.created > self._ttl]:
+            self._drop(fid)
+            self.unused += 1
+        while self._entries and (len(self._entries) > self._max_entries or self._budget.over()):
+            self._drop(next(iter(self._entries)))
+            self.unused += 1
+
+    async def take(self, file_id: str) -> str | None:
+        """The prefetched text of *file_id* (waiting for it if still running), or None."""
+        entry = self._entries.get(file_id)
+        if entry is None:
+            return None
+        if self._clock() - entry.created > self._ttl:
+            self._drop(file_id)
+            self.unused += 1
+            return None
+        running = not entry.task.done()
+        self._entries.pop(file_id)
+        self._budget.used -= entry.size
+        try:
+            text = await asyncio.shield(entry.task)
+        except asyncio.CancelledError:
+            if entry.task.cancelled():
+                return None
+            raise
+        except Exception:
+            return None   # the normal read path reports the error
+        self.served += 1
+        self.served_running += running
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "served": self.served,
+            "served_running": self.served_running,
+            "unused": self.unused,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "entries": len(self._entries),
+            "bytes": sum(e.size for e in self._entries.values()),
+        }
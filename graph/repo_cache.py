@@ -0,0 +1,174 @@
+"""
+Bounded cache of GraphRepository instances, keyed by user identity.
+
+Tokens are refreshed (OBO) far more often than users change, so keying on the
+raw bearer string creates a new repository per refresh. Entries here are keyed
+by the token's tenant + object id; a fresh token for a known user just swaps
+the credential of the existing repository. The cache is LRU-bounded in size and
+entries expire after a period of inactivity.
+
+Parallel orchestrator steps usually ask for the same user at the same time.
+Concurrent requests with the same token share one verification and get one
+repository (and so one coalescer, throttle and set of caches).
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from auth.token_credential import StaticTokenCredential
+from graph.repository import GraphRepository
+
+log = logging.getLogger("graph")
+
+_DEFAULT_MAX_SIZE = 256
+_DEFAULT_TTL = 1800.0  # seconds of inactivity before an entry is dropped
+
+
+def _token_claims(token: str) -> dict:
+    """Decode the JWT payload without validating it (used for cache keys only)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except Exception:
+        return {}
+
+
+def user_key(token: str) -> str:
+    """Stable per-user cache key: ``tid:oid`` if present, else a token hash."""
+    claims = _token_claims(token)
+    oid = claims.get("oid")
+    if oid:
+        return f"{claims.get('tid', '')}:{oid}"
+    return "sha256:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+def tenant_id(token: str) -> str | None:
+    """The token's tenant, for state shared per tenant; None unless the token is verifiable."""
+    claims = _token_claims(token)
+    return claims.get("tid") if claims.get("oid") else None
+
+
+@dataclass
+class _Entry:
+    repo: GraphRepository
+    credential: StaticTokenCredential
+    last_used: float
+
+
+class RepositoryCache:
+    """LRU + idle-TTL cache of per-user repositories.
+
+    ``verify`` is awaited once for every token the cache has not seen yet and
+    must return the token's object id. Per-user state (caches, the on-disk mail
+    mirror) is keyed by identity, so a forged token carrying someone else's
+    ``oid`` must never reach it; such tokens raise PermissionError.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[StaticTokenCredential], GraphRepository],
+        verify: Callable[[str], Awaitable[str | None]] | None = None,
+        max_size: int = _DEFAULT_MAX_SIZE,
+        ttl: float = _DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factory = factory
+        self._verify = verify
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # (user key, token) → verification (and creation) in progress
+        self._pending: dict[tuple[str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, token: str) -> GraphRepository:
+        key = user_key(token)
+        entry = self._current(key)
+        if entry is not None and entry.credential.token == token:
+            self.hits += 1
+            return self._use(key, entry, token)
+
+        # Unseen token: one verification per (user, token), however many
+        # callers arrive while it runs. Only the caller whose flight created
+        # the repository counts a miss; everyone else reuses it: a hit.
+        flight = self._pending.get((key, token))
+        owner = flight is None
+        if owner:
+            flight = asyncio.ensure_future(self._admit(key, token))
+            self._pending[(key, token)] = flight
+            flight.add_done_callback(lambda _: self._pending.pop((key, token), None))
+        repo, created = await asyncio.shield(flight)
+        if owner and created:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return repo
+
+    async def _admit(self, key: str, token: str) -> tuple[GraphRepository, bool]:
+        """The repository for a verified token, and whether it was created for it."""
+        await self._check_token(key, token)
+        # Re-read: the entry may have been created, expired or evicted meanwhile.
+        entry = self._current(key)
+        if entry is not None:
+            return self._use(key, entry, token), False
+
+        credential = StaticTokenCredential(token)
+        entry = _Entry(repo=self._factory(credential), credential=credential, last_used=self._clock())
+        self._entries[key] = entry
+        while len(self._entries) > self._max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            log.info("[repo_cache] evicted %s (size limit %d)", evicted, self._max_size)
+        return entry.repo, True
+
+    def _current(self, key: str) -> _Entry | None:
+        self._expire(self._clock())
+        return self._entries.get(key)
+
+    def _use(self, key: str, entry: _Entry, token: str) -> GraphRepository:
+        entry.credential.token = token
+        entry.last_used = self._clock()
+        self._entries.move_to_end(key)
+        return entry.repo
+
+    async def _check_token(self, key: str, token: str) -> None:
+        if self._verify is None or key.startswith("sha256:"):
+            return
+        oid = await self._verify(token)
+        if oid is None or not key.endswith(f":{oid}"):
+            log.warning("[repo_cache] token for %s failed verification", key)
+            raise PermissionError("Bearer token does not belong to the user it claims.")
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self._ttl:
+                break
+            del self._entries[key]
+            self.evictions += 1
+            log.info("[repo_cache] expired %s", key)
+
+    def repositories(self) -> list[GraphRepository]:
+        return [e.repo for e in self._entries.values()]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
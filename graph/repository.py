@@ -1,15 +1,21 @@
-import html as _html
-import re as _re
+import dataclasses
+import itertools
+import os
 import sys
 from dataclasses import dataclass
 from typing import Optional
 from configparser import SectionProxy
 from datetime import datetime, timezone
-from typing import List
+from typing import Awaitable, Callable, List
+from urllib.parse import quote
 import httpx
 import asyncio
 from azure.identity import DeviceCodeCredential
+from kiota_authentication_azure.azure_identity_authentication_provider import (
+    AzureIdentityAuthenticationProvider,
+)
 from msgraph import GraphServiceClient
+from msgraph.graph_request_adapter import GraphRequestAdapter
 
 from msgraph.generated.users.item.user_item_request_builder import (
     UserItemRequestBuilder,
@@ -29,47 +35,276 @@ from msgraph.generated.users.item.contacts.contacts_request_builder import (
     ContactsRequestBuilder,
 )
 
-from msgraph.generated.users.item.events.events_request_builder import (
-    EventsRequestBuilder,
-)
-
 from msgraph.generated.drives.item.items.item.search_with_q.search_with_q_request_builder import (
     SearchWithQRequestBuilder,
 )
 
 from msgraph.generated.users.users_request_builder import UsersRequestBuilder
 
-from msgraph.generated.search.query.query_post_request_body import QueryPostRequestBody
-from msgraph.generated.models.search_request import SearchRequest
-from msgraph.generated.models.search_query import SearchQuery
-
 
 from graph.interface import IGraphRepository
-from graph.models import Email, File, Contact, CalendarEvent, EmailAddress, Attendee
+from graph.models import Email, File, Contact, CalendarEvent, EmailAddress, SearchResult
+from graph.body_compact import BodyCompactor, compaction_enabled
+from graph.calendar_engine import CalendarEngine
+from graph.coalesce import CallCoalescer
+from graph.file_stream import (
+    STREAMABLE_SUFFIXES,
+    StreamUnsupported,
+    extract_office_text,
+    extract_plain_text,
+)
+from graph.html_text import html_to_text
+from graph.mail_mirror import MailMirror
+from graph.mail_query import plan_message_query
+from graph.pagination import CursorStore, ResultStream, follow, single_page
+from graph.parse_pool import ParseError, get_parse_pool, parse_office
+from graph.people_cache import PeopleCache
+from graph.people_index import CorrespondentIndex, DirectorySnapshot
+from graph.prefetch import PREFETCH_SUFFIXES, Prefetcher
+from graph.section_select import SOURCE_CHARS, select_sections
+from graph.text_cache import TextCache, text_key
+from graph.throttle import Throttle, sub_response_throttled
+from graph.transport import GRAPH_BASE_URL, with_sdk_middleware
 
 import logging
 log = logging.getLogger("graph")
 log.setLevel(logging.INFO)
 
 _MAX_EMAIL_CHARS = 8_000
-_GRAPH_TIMEOUT = 30.0  # seconds; Graph SDK calls exceeding this are cancelled
-
-
-def _strip_html(raw: str) -> str:
-    """Convert HTML email body to plain text using stdlib only."""
-    # Remove <style> and <script> blocks — often kilobytes of CSS/JS
-    text = _re.sub(r'<(style|script)[^>]*>.*?</\1>', '', raw, flags=_re.DOTALL | _re.IGNORECASE)
-    # Turn block-level elements into newlines so paragraphs survive
-    text = _re.sub(r'<(br|p|div|tr|li|h[1-6])\b[^>]*/?>', '\n', text, flags=_re.IGNORECASE)
-    # Drop all remaining tags
-    text = _re.sub(r'<[^>]+>', '', text)
-    # Decode HTML entities (&amp; &nbsp; &#8203; etc.)
-    text = _html.unescape(text)
-    # Collapse runs of blank lines and horizontal whitespace
-    text = _re.sub(r'\n[ \t]+', '\n', text)
-    text = _re.sub(r'\n{3,}', '\n\n', text)
-    text = _re.sub(r'[ \t]{2,}', ' ', text)
-    return text.strip()
+_MAX_FILE_CHARS = 12_000
+_GRAPH_TIMEOUT = 30.0  # seconds per attempt; Graph calls exceeding this are cancelled
+_BATCH_LIMIT = 20      # max sub-requests per Graph JSON $batch call
+_FILE_SELECT = "id,name,size,file,cTag,eTag,parentReference,@microsoft.graph.downloadUrl"
+_SEARCH_FILE_SELECT = "id,name,webUrl,size,createdDateTime,lastModifiedDateTime,file,folder,parentReference"
+_MAX_LOCAL_RESULTS = 500   # cap for result streams served from the mirror / calendar index
+
+
+def _clean_body(
+    raw_body: str | None, content_type: str, compact: Callable[[str], str] | None = None
+) -> str | None:
+    """Strip HTML (if the server still returned HTML), compact and truncate an email body."""
+    if not raw_body:
+        return raw_body
+    if content_type.lower() == "html" or raw_body.lstrip().startswith("<"):
+        # One past the limit, so the truncation below still notices the cut.
+        raw_body = html_to_text(raw_body, _MAX_EMAIL_CHARS + 1)
+        log.debug("Email body HTML-stripped, content_type=%s", content_type)
+    if compact is not None:
+        raw_body = compact(raw_body)
+    # Truncate to prevent token explosions
+    if len(raw_body) > _MAX_EMAIL_CHARS:
+        raw_body = raw_body[:_MAX_EMAIL_CHARS] + "\n\n[... body truncated ...]"
+        log.debug("Email body truncated to %d chars", _MAX_EMAIL_CHARS)
+    return raw_body
+
+
+def _email_from_json(
+    m: dict, compactor: BodyCompactor | None = None, available: list[Email] | None = None
+) -> Email:
+    """Map a raw Graph message resource (JSON) onto Email.
+
+    *available* are messages of its conversation found in the mail mirror.
+    """
+    sender = (m.get("from") or {}).get("emailAddress") or {}
+    body = m.get("body")
+    compact = None
+    if compactor is not None:
+        compact = lambda text: compactor.compact(
+            text, sender=sender.get("address"), subject=m.get("subject"), message_id=m.get("id"),
+            sender_name=sender.get("name"), conversation_id=m.get("conversationId"),
+            received=m.get("receivedDateTime"), available=available or (),
+        )
+    return Email(
+        id=m.get("id") or "",
+        subject=m.get("subject") or "",
+        sender_name=sender.get("name") or sender.get("address") or "",
+        sender_email=sender.get("address"),
+        received=m.get("receivedDateTime"),
+        body=_clean_body(body.get("content"), body.get("contentType") or "", compact) if body else None,
+        web_link=m.get("webLink"),
+    )
+
+
+def _file_from_json(item: dict) -> File:
+    """Map a raw Graph driveItem resource (JSON) onto File."""
+    return File(
+        id=item.get("id") or "",
+        name=item.get("name") or "",
+        is_folder="folder" in item,
+        size=item.get("size"),
+        created=item.get("createdDateTime"),
+        modified=item.get("lastModifiedDateTime"),
+        parent_id=(item.get("parentReference") or {}).get("id"),
+        web_link=item.get("webUrl"),
+    )
+
+
+def _raw_json_default() -> bool:
+    """GRAPH_RAW_JSON=1 turns on the raw-JSON path for the hot list endpoints."""
+    return os.environ.get("GRAPH_RAW_JSON", "").lower() in ("1", "true", "yes")
+
+
+# Microsoft Search (/search/query) -------------------------------------------
+
+# SearchResult type → Graph entity type. Graph doesn't accept message, event
+# and driveItem in one search request, so each gets its own sub-request of a
+# single $batch call.
+_SEARCH_ENTITY_TYPES = {"email": "message", "event": "event", "file": "driveItem"}
+
+
+def _search_people(kind: str, r: dict) -> list[EmailAddress]:
+    if kind == "email":
+        sources = [(r.get("from") or r.get("sender") or {}).get("emailAddress")]
+    elif kind == "event":
+        sources = [(r.get("organizer") or {}).get("emailAddress")]
+        sources += [a.get("emailAddress") for a in r.get("attendees") or []]
+    else:
+        sources = [(r.get(k) or {}).get("user") for k in ("createdBy", "lastModifiedBy")]
+    people: list[EmailAddress] = []
+    seen: set[str] = set()
+    for p in filter(None, sources):
+        name = p.get("name") or p.get("displayName")
+        address = p.get("address") or p.get("email")
+        key = (address or name or "").lower()
+        if key and key not in seen:
+            seen.add(key)
+            people.append(EmailAddress(name=name, address=address))
+    return people
+
+
+def _search_result_from_hit(kind: str, hit: dict) -> SearchResult:
+    """Map one /search/query hit onto SearchResult."""
+    r = hit.get("resource") or {}
+    if kind == "email":
+        title, timestamp = r.get("subject"), r.get("receivedDateTime") or r.get("sentDateTime")
+    elif kind == "event":
+        title, timestamp = r.get("subject"), (r.get("start") or {}).get("dateTime")
+    else:
+        title, timestamp = r.get("name"), r.get("lastModifiedDateTime") or r.get("createdDateTime")
+    summary = hit.get("summary")
+    return SearchResult(
+        type=kind,
+        id=r.get("id") or hit.get("hitId") or "",
+        title=title,
+        # Highlights come as <c0>…</c0> and elisions as <ddd/>.
+        snippet=html_to_text(summary.replace("<ddd/>", " … ")) if summary else None,
+        timestamp=timestamp or None,
+        people=_search_people(kind, r),
+        web_link=r.get("webLink") or r.get("webUrl"),
+    )
+
+
+def _decode(content_bytes: bytes) -> str:
+    try:
+        return content_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        return content_bytes.decode("latin-1")
+
+
+async def _bytes_to_text(file_id: str, content_bytes: bytes, max_chars: int = _MAX_FILE_CHARS) -> str:
+    """Extract plain text from a downloaded OneDrive file (docx, xlsx or text).
+
+    Office files are parsed in the process pool, off the event loop.
+    """
+    log.info("[get_file_text] file_id=%s bytes=%d magic=%r", file_id, len(content_bytes), content_bytes[:4])
+
+    # Detect ZIP-based Office formats (docx, xlsx) by magic bytes
+    if content_bytes[:4] == b'PK\x03\x04':
+        try:
+            text = await get_parse_pool().run(parse_office, content_bytes, max_chars)
+        except ParseError as exc:
+            log.warning("[get_file_text] file_id=%s parse failed: %s", file_id, exc)
+            text = f"[Could not parse file: {exc}]"
+        if text is None:
+            text = _decode(content_bytes)
+    else:
+        text = _decode(content_bytes)
+
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n\n[... content truncated ...]"
+    return text
+
+
+def _is_whole(text: str) -> bool:
+    """False if *text* ends in one of the truncation notes added on extraction."""
+    return "\n\n[... content truncated" not in text[-300:]
+
+
+# batching ------------------------------------------------------------------
+
+@dataclass
+class BatchRequest:
+    """One sub-request of a Graph JSON $batch call. ``url`` is relative to /v1.0."""
+    id: str
+    url: str
+    method: str = "GET"
+    headers: dict[str, str] | None = None
+    body: dict | None = None
+    depends_on: list[str] | None = None
+
+    def to_json(self) -> dict:
+        out: dict = {"id": self.id, "method": self.method, "url": self.url}
+        if self.headers:
+            out["headers"] = self.headers
+        if self.body is not None:
+            out["body"] = self.body
+            out.setdefault("headers", {}).setdefault("Content-Type", "application/json")
+        if self.depends_on:
+            out["dependsOn"] = self.depends_on
+        return out
+
+
+class GraphBatchError(Exception):
+    """A failed sub-request of a $batch call (including 424 Failed Dependency)."""
+
+    def __init__(self, request_id: str, status: int, code: str = "", message: str = ""):
+        super().__init__(f"{status} {code}: {message}".strip())
+        self.request_id = request_id
+        self.status = status
+        self.code = code
+
+
+def _pack_batches(requests: list[BatchRequest]) -> list[list[BatchRequest]]:
+    """Split requests into $batch payloads of at most _BATCH_LIMIT.
+
+    Graph only resolves dependsOn inside one payload, so requests linked by
+    dependencies are kept together (in their original order).
+    """
+    order = {r.id: i for i, r in enumerate(requests)}
+    group_of: dict[str, int] = {}
+    groups: list[list[BatchRequest]] = []
+
+    for req in requests:
+        deps = req.depends_on or []
+        unknown = [d for d in deps if d not in group_of]
+        if unknown:
+            raise ValueError(f"Batch request {req.id!r} depends on unknown request(s) {unknown}")
+        targets = sorted({group_of[d] for d in deps})
+        if targets:
+            target = targets[0]
+            for g in targets[1:]:
+                for moved in groups[g]:
+                    group_of[moved.id] = target
+                groups[target].extend(groups[g])
+                groups[g] = []
+            groups[target].sort(key=lambda r: order[r.id])
+        else:
+            target = len(groups)
+            groups.append([])
+        groups[target].append(req)
+        group_of[req.id] = target
+
+    batches: list[list[BatchRequest]] = []
+    for group in filter(None, groups):
+        if len(group) > _BATCH_LIMIT:
+            raise ValueError(
+                f"Dependency chain of {len(group)} requests exceeds the $batch limit of {_BATCH_LIMIT}"
+            )
+        if batches and len(batches[-1]) + len(group) <= _BATCH_LIMIT:
+            batches[-1].extend(group)
+        else:
+            batches.append(list(group))
+    return batches
 
 
 class GraphRepository(IGraphRepository):
@@ -77,7 +312,14 @@ class GraphRepository(IGraphRepository):
     device_code_credential: DeviceCodeCredential
     user_client: GraphServiceClient
 
-    def __init__(self, config: SectionProxy, credential=None):
+    def __init__(
+        self,
+        config: SectionProxy,
+        credential=None,
+        http_client: httpx.AsyncClient | None = None,
+        raw_client: httpx.AsyncClient | None = None,
+        raw_json: bool | None = None,
+    ):
         self.settings = config
 
         client_id = self.settings["clientId"]
@@ -93,17 +335,141 @@ class GraphRepository(IGraphRepository):
                 prompt_callback=self._device_code_callback,
             )
 
+        if http_client is None:
+            # Own pool; same middleware as the shared client (SDK retries off,
+            # the throttle below retries).
+            http_client = with_sdk_middleware(httpx.AsyncClient(base_url=GRAPH_BASE_URL, timeout=_GRAPH_TIMEOUT))
+        # Normally the shared, pooled transport (see graph/transport.py) instead
+        # of a fresh connection pool per repository.
+        auth_provider = AzureIdentityAuthenticationProvider(
+            self.device_code_credential, scopes=graph_scopes
+        )
         self.user_client = GraphServiceClient(
-            self.device_code_credential,
-            graph_scopes,
+            request_adapter=GraphRequestAdapter(auth_provider, client=http_client)
         )
 
-    async def _graph_call(self, coro, timeout: float = _GRAPH_TIMEOUT):
-        """Await a Graph SDK coroutine with a timeout. Raises TimeoutError on expiry."""
+        # Plain client for requests the SDK doesn't cover ($batch, downloads).
+        self.raw_client = raw_client or httpx.AsyncClient(base_url=GRAPH_BASE_URL, timeout=_GRAPH_TIMEOUT)
+        self.people_cache = PeopleCache()
+        # Optional local person indexes (tenant directory, correspondents), attached by the router.
+        self.directory: DirectorySnapshot | None = None
+        self.correspondents: CorrespondentIndex | None = None
+        # Optional local mailbox mirror, attached by the MCP router when enabled.
+        self.mail_mirror: MailMirror | None = None
+        # Optional extracted-text cache (shared across users), attached by the router.
+        self.text_cache: TextCache | None = None
+        # Quoted history and repeated signatures are cut from email bodies.
+        self.compactor = BodyCompactor() if compaction_enabled() else None
+        # Optional background extraction of search hits, attached by the router.
+        self.prefetcher: Prefetcher | None = None
+        # Optional coalescing of identical tool calls, attached by the router.
+        self.coalescer: CallCoalescer | None = None
+        self.calendar = CalendarEngine(self._get_json)
+        # List endpoints read straight from JSON instead of through Kiota models.
+        self.raw_json = _raw_json_default() if raw_json is None else raw_json
+        # Per-user pacing and Retry-After handling for every Graph call.
+        self.throttle = Throttle.from_env()
+        # Unfinished search result streams, resumable by cursor.
+        self.cursors = CursorStore()
+
+    async def _graph_call(
+        self, call: Callable[[], Awaitable], timeout: float = _GRAPH_TIMEOUT, cost: float = 1.0
+    ):
+        """Run a Graph request through the user's rate governor (graph/throttle.py).
+
+        *call* builds the request afresh on every attempt, so throttled answers
+        can be retried. Raises TimeoutError when an attempt exceeds *timeout*.
+        """
+        return await self.throttle.run(call, timeout, cost)
+
+    @staticmethod
+    async def _download(coro, timeout: float = _GRAPH_TIMEOUT):
+        """Await a read from a pre-authenticated download URL (not a Graph API call)."""
         try:
             return await asyncio.wait_for(coro, timeout=timeout)
         except asyncio.TimeoutError:
-            raise TimeoutError(f"Graph API call timed out after {timeout}s")
+            raise TimeoutError(f"Download timed out after {timeout}s")
+
+    async def _raw_request(self, method: str, url: str, cost: float = 1.0, **kwargs) -> httpx.Response:
+        """Authenticated request to a Graph URL outside the SDK."""
+        headers = {"Authorization": f"Bearer {self.get_user_token()}", **kwargs.pop("headers", {})}
+        return await self._graph_call(
+            lambda: self.raw_client.request(method, url, headers=headers, **kwargs), cost=cost
+        )
+
+    async def _get_json(
+        self, url: str, headers: dict[str, str] | None = None, params: dict[str, str] | None = None
+    ) -> dict:
+        resp = await self._raw_request("GET", url, headers=headers or {}, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _graph_batch(self, requests: list[BatchRequest]) -> dict[str, dict | GraphBatchError]:
+        """Run requests through JSON $batch (20 per call, payloads sent concurrently).
+
+        Returns {request id: response body}; failed sub-requests map to a
+        GraphBatchError instead of raising, so one bad id doesn't sink the rest.
+        """
+        if not requests:
+            return {}
+        batches = _pack_batches(requests)
+        log.info("[_graph_batch] %d request(s) in %d batch call(s)", len(requests), len(batches))
+        results: dict[str, dict | GraphBatchError] = {}
+        for part in await asyncio.gather(*[self._post_batch(b) for b in batches]):
+            results.update(part)
+        return results
+
+    async def _post_batch(self, batch: list[BatchRequest]) -> dict[str, dict | GraphBatchError]:
+        """One $batch payload; throttled sub-requests are sent again through the governor.
+
+        The payload itself answers 200 when only some sub-requests were
+        throttled (429/503/504), so the governor never sees those. Their
+        Retry-After (the longest one) is handed to it and they are retried,
+        with requests that failed only because they depend on them (424).
+        """
+        out: dict[str, dict | GraphBatchError] = {}
+        pending = batch
+        for attempt in itertools.count():
+            # Every sub-request counts against the mailbox limits.
+            resp = await self._raw_request(
+                "POST", "/$batch", cost=len(pending), json={"requests": [r.to_json() for r in pending]}
+            )
+            resp.raise_for_status()
+
+            retry: set[str] = set()
+            statuses: dict[str, int] = {}
+            retry_after: float | None = None
+            for item in resp.json().get("responses", []):
+                status = item.get("status", 500)
+                statuses[item["id"]] = status
+                body = item.get("body") or {}
+                if status >= 400:
+                    err = body.get("error", {}) if isinstance(body, dict) else {}
+                    out[item["id"]] = GraphBatchError(
+                        item["id"], status, err.get("code", ""), err.get("message", "")
+                    )
+                else:
+                    out[item["id"]] = body
+                throttled = sub_response_throttled(item)
+                if throttled:
+                    retry.add(item["id"])
+                    throttle_status = throttled[0]
+                    if throttled[1] is not None:
+                        retry_after = max(retry_after or 0.0, throttled[1])
+            if not retry:
+                break
+            for req in pending:       # in order, so dependency chains resolve
+                if statuses.get(req.id) == 424 and retry.intersection(req.depends_on or ()):
+                    retry.add(req.id)
+            if not self.throttle.backoff(throttle_status, retry_after, attempt):
+                break
+            pending = [
+                dataclasses.replace(r, depends_on=[d for d in r.depends_on or () if d in retry] or None)
+                for r in pending if r.id in retry
+            ]
+        for req in batch:
+            out.setdefault(req.id, GraphBatchError(req.id, 500, "missingResponse", "No response in batch"))
+        return out
 
     def get_user_token(self):
         scopes = self.settings["graphUserScopes"].split(" ")
@@ -129,7 +495,7 @@ class GraphRepository(IGraphRepository):
             )
         )
 
-        user = await self._graph_call(self.user_client.me.get(
+        user = await self._graph_call(lambda: self.user_client.me.get(
             request_configuration=request_config
         ))
 
@@ -139,6 +505,9 @@ class GraphRepository(IGraphRepository):
 # people ------------------------------------------------------------------
 
     async def _find_directory_users(self, query: str, top: int = 5) -> list[EmailAddress]:
+        if self.directory and self.directory.usable(self._get_json):
+            return self.directory.search(query, top)
+
         # Graph OData startswith is case-sensitive, so try both the raw query
         # and its title-cased variant (e.g. "arne" → also try "Arne").
         q = query.strip().replace("'", "''")
@@ -160,7 +529,7 @@ class GraphRepository(IGraphRepository):
             query_parameters=params
         )
 
-        users = await self._graph_call(self.user_client.users.get(request_configuration=cfg))
+        users = await self._graph_call(lambda: self.user_client.users.get(request_configuration=cfg))
 
         out = []
         if users and users.value:
@@ -173,6 +542,11 @@ class GraphRepository(IGraphRepository):
         return out
 
     async def _find_mail_people(self, query: str, top: int = 5) -> list[EmailAddress]:
+        if self.correspondents and self.correspondents.usable(self._get_json):
+            return self.correspondents.search(query, top)
+        if self.mail_mirror and self.mail_mirror.usable():
+            return await self.mail_mirror.people(query, top)
+
         params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
             search=f'"{query}"',
             select=["from","toRecipients","ccRecipients"],
@@ -183,7 +557,7 @@ class GraphRepository(IGraphRepository):
             query_parameters=params
         )
 
-        res = await self._graph_call(self.user_client.me.messages.get(request_configuration=cfg))
+        res = await self._graph_call(lambda: self.user_client.me.messages.get(request_configuration=cfg))
 
         found = {}
 
@@ -235,7 +609,7 @@ class GraphRepository(IGraphRepository):
             query_parameters=params
         )
 
-        res = await self._graph_call(self.user_client.me.contacts.get(request_configuration=cfg))
+        res = await self._graph_call(lambda: self.user_client.me.contacts.get(request_configuration=cfg))
 
         out = []
         if res and res.value:
@@ -248,9 +622,26 @@ class GraphRepository(IGraphRepository):
 
     async def find_people(self, query: str, top: int = 5) -> list[EmailAddress]:
         log.info("[find_people] query=%r", query)
-        contacts  = await self._find_contacts(query, top)
-        directory = await self._find_directory_users(query, top)
-        mail      = await self._find_mail_people(query, top)
+        cached = self.people_cache.get(query, top)
+        if cached is not None:
+            log.info("[find_people] cache hit → %d result(s)", len(cached))
+            return cached
+
+        # The three sources are independent Graph round trips — run them concurrently.
+        results = await asyncio.gather(
+            self._find_contacts(query, top),
+            self._find_directory_users(query, top),
+            self._find_mail_people(query, top),
+            return_exceptions=True,
+        )
+        failed = [r for r in results if isinstance(r, BaseException)]
+        for exc in failed:
+            log.warning("[find_people] source failed: %s", exc)
+        if len(failed) == len(results):
+            raise failed[0]
+        contacts, directory, mail = (
+            [] if isinstance(r, BaseException) else r for r in results
+        )
 
         log.info("[find_people] contacts=%d  directory=%d  mail=%d",
                  len(contacts), len(directory), len(mail))
@@ -261,6 +652,13 @@ class GraphRepository(IGraphRepository):
                 continue
             merged[src.address.lower()] = src
 
+        if not failed:
+            # Complete = no source was cut off by `top`, so the entry can answer
+            # longer queries with the same prefix (mail hits are full-text and
+            # already fuzzy; they are re-filtered on reuse).
+            complete = len(contacts) < top and len(directory) < top and len(mail) < top
+            self.people_cache.put(query, list(merged.values()), top, complete)
+
         merged_list = list(merged.values())[:top]
         log.info("[find_people] merged=%d result(s): %s",
                  len(merged_list), [(p.name, p.address) for p in merged_list])
@@ -269,6 +667,17 @@ class GraphRepository(IGraphRepository):
 # email ------------------------------------------------------------------
 
     async def get_inbox(self) -> List[Email]:
+        if self.mail_mirror and self.mail_mirror.usable():
+            return await self.mail_mirror.inbox(top=25)
+
+        if self.raw_json:
+            page = await self._get_json("/me/mailFolders/inbox/messages", params={
+                "$select": "id,from,isRead,receivedDateTime,subject,webLink",
+                "$top": "25",
+                "$orderby": "receivedDateTime DESC",
+            })
+            return [_email_from_json(m) for m in page.get("value", [])]
+
         query_params = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
             select=["id", "from", "isRead", "receivedDateTime", "subject", "webLink"],
             top=25,
@@ -278,7 +687,7 @@ class GraphRepository(IGraphRepository):
             query_parameters=query_params
         )
 
-        messages = await self._graph_call(
+        messages = await self._graph_call(lambda:
             self.user_client.me.mail_folders.by_mail_folder_id("inbox").messages.get(
                 request_configuration=request_config
             )
@@ -316,7 +725,7 @@ class GraphRepository(IGraphRepository):
 
     async def get_message_body(self, message_id: str) -> Email | None:
         query_params = MessageItemRequestBuilder.MessageItemRequestBuilderGetQueryParameters(
-            select=["id", "subject", "from", "receivedDateTime", "body", "webLink"],
+            select=["id", "subject", "from", "receivedDateTime", "body", "webLink", "conversationId"],
         )
 
         log.info(f"[read_email] for email with id: {message_id}")
@@ -332,7 +741,7 @@ class GraphRepository(IGraphRepository):
         request_config.headers.try_add("Prefer", 'outlook.body-content-type="text"')
 
 
-        m = await self._graph_call(
+        m = await self._graph_call(lambda:
             self.user_client.me.messages.by_message_id(message_id).get(
                 request_configuration=request_config
             )
@@ -353,19 +762,16 @@ class GraphRepository(IGraphRepository):
             sender_email = m.from_.email_address.address
 
         raw_body = m.body.content if m.body and m.body.content else None
-
-        if raw_body:
-            # Strip HTML if the server still returned HTML (no plain-text alternative)
-            content_type = (m.body.content_type.value if m.body.content_type else "").lower()
-            if content_type == "html" or raw_body.lstrip().startswith("<"):
-                raw_body = _strip_html(raw_body)
-                log.debug("Email body HTML-stripped, content_type=%s", content_type)
-            # Truncate to prevent token explosions
-            if len(raw_body) > _MAX_EMAIL_CHARS:
-                raw_body = raw_body[:_MAX_EMAIL_CHARS] + "\n\n[... body truncated ...]"
-                log.debug("Email body truncated to %d chars", _MAX_EMAIL_CHARS)
-
-        body = raw_body
+        content_type = m.body.content_type.value if m.body and m.body.content_type else ""
+        compact = None
+        if self.compactor is not None:
+            available = await self._mirrored_thread(m.conversation_id)
+            compact = lambda text: self.compactor.compact(
+                text, sender=sender_email, subject=m.subject, message_id=m.id,
+                sender_name=sender_name, conversation_id=m.conversation_id,
+                received=m.received_date_time, available=available,
+            )
+        body = _clean_body(raw_body, content_type, compact)
 
         log.info("[get_message_body] id=%s content_type=%s raw_body_len=%d body_len=%d body_preview=%r",
             message_id,
@@ -387,6 +793,41 @@ class GraphRepository(IGraphRepository):
         )
 
 
+    async def get_message_bodies(self, message_ids: list[str]) -> list[Email | GraphBatchError]:
+        """Read several emails in one $batch round trip (per id: Email or the error)."""
+        select = "id,subject,from,receivedDateTime,body,webLink,conversationId"
+        results = await self._graph_batch([
+            BatchRequest(
+                id=str(i),
+                url=f"/me/messages/{quote(mid, safe='')}?$select={select}",
+                headers={"Prefer": 'outlook.body-content-type="text"'},
+            )
+            for i, mid in enumerate(message_ids)
+        ])
+        found = [r for r in results.values() if not isinstance(r, GraphBatchError)]
+        threads: dict[str, list[Email]] = {}
+        if self.compactor is not None:
+            # Messages read together are all returned, so their replies may cut them.
+            for r in found:
+                if r.get("conversationId") and r.get("receivedDateTime"):
+                    self.compactor.remember(r["conversationId"], _email_from_json({**r, "body": None}))
+            for cid in {r["conversationId"] for r in found if r.get("conversationId")}:
+                threads[cid] = await self._mirrored_thread(cid)
+        out: list[Email | GraphBatchError] = []
+        for i in range(len(message_ids)):
+            r = results[str(i)]
+            out.append(
+                r if isinstance(r, GraphBatchError)
+                else _email_from_json(r, self.compactor, threads.get(r.get("conversationId")))
+            )
+        return out
+
+    async def _mirrored_thread(self, conversation_id: str | None) -> list[Email]:
+        """Messages of a conversation in the mail mirror (readable, so quotes of them may be cut)."""
+        if not conversation_id or self.mail_mirror is None:
+            return []
+        return await self.mail_mirror.thread(conversation_id)
+
     async def search_emails(
         self,
         sender: str | None = None,
@@ -395,33 +836,32 @@ class GraphRepository(IGraphRepository):
         received_before: datetime | None = None,
         top: int = 25,
     ) -> list[Email]:
-        filters: list[str] = []
-
-        if subject:
-            filters.append(f"contains(subject, '{subject}')")
-
-        if sender:
-            filters.append(f"contains(from/emailAddress/address,'{sender}')")
-
-        if received_after:
-            filters.append(f"receivedDateTime ge {received_after}")
-
-        if received_before:
-            filters.append(f"receivedDateTime le {received_before}")
+        if self.mail_mirror and self.mail_mirror.usable():
+            return await self.mail_mirror.search(
+                sender=sender,
+                subject=subject,
+                received_after=received_after,
+                received_before=received_before,
+                top=top,
+            )
 
-        f = " and ".join(filters) if filters else None
+        if self.raw_json:
+            stream = self._message_stream(sender, subject, received_after, received_before, page_size=top)
+            return await stream.take(top)
 
+        plan = plan_message_query(sender, subject, received_after, received_before)
         qp = MessagesRequestBuilder.MessagesRequestBuilderGetQueryParameters(
             select=["id", "subject", "from", "receivedDateTime", "webLink"],
             top=top,
-            filter=f,
+            filter=plan.filter,
+            search=plan.params().get("$search"),
         )
 
         cfg = MessagesRequestBuilder.MessagesRequestBuilderGetRequestConfiguration(
             query_parameters=qp
         )
 
-        res = await self._graph_call(self.user_client.me.messages.get(request_configuration=cfg))
+        res = await self._graph_call(lambda: self.user_client.me.messages.get(request_configuration=cfg))
 
         out: list[Email] = []
         for m in (res.value or []) if res else []:
@@ -442,8 +882,36 @@ class GraphRepository(IGraphRepository):
                 )
             )
 
-        return out
+        return [e for e in out if plan.matches(e)]
 
+    async def stream_emails(
+        self,
+        sender: str | None = None,
+        subject: str | None = None,
+        received_after: datetime | str | None = None,
+        received_before: datetime | str | None = None,
+        page_size: int = 25,
+    ) -> ResultStream:
+        """search_emails as a lazily paged stream of Email (see graph/pagination.py)."""
+        if self.mail_mirror and self.mail_mirror.usable():
+            return ResultStream(single_page(await self.mail_mirror.search(
+                sender=sender,
+                subject=subject,
+                received_after=received_after,
+                received_before=received_before,
+                top=_MAX_LOCAL_RESULTS,
+            )))
+        return self._message_stream(sender, subject, received_after, received_before, page_size)
+
+    def _message_stream(self, sender, subject, received_after, received_before, page_size: int) -> ResultStream:
+        plan = plan_message_query(sender, subject, received_after, received_before)
+        params = {"$select": "id,subject,from,receivedDateTime,webLink", "$top": str(page_size)}
+        params.update(plan.params())
+        return ResultStream(
+            follow(self._get_json, "/me/messages", params=params, on_page=self.cursors.count_page),
+            convert=_email_from_json,
+            predicate=plan.predicate,
+        )
 
 # files ------------------------------------------------------------------
 
@@ -468,9 +936,9 @@ class GraphRepository(IGraphRepository):
             query_parameters=query_params
         )
 
-        drive = await self._graph_call(self.user_client.me.drive.get())
+        drive = await self._graph_call(lambda: self.user_client.me.drive.get())
 
-        items = await self._graph_call(
+        items = await self._graph_call(lambda:
             self.user_client.drives.by_drive_id(
                 drive.id
             ).items.by_drive_item_id("root").children.get(
@@ -501,73 +969,133 @@ class GraphRepository(IGraphRepository):
 
 
 
-    async def get_file_text(self, file_id: str) -> str:
-        content_bytes = await self.get_file_content(file_id)
-        log.info("[get_file_text] file_id=%s bytes=%d magic=%r", file_id, len(content_bytes), content_bytes[:4])
-
-        # Detect ZIP-based Office formats (docx, xlsx) by magic bytes
-        if content_bytes[:4] == b'PK\x03\x04':
-            import io, zipfile
-            try:
-                with zipfile.ZipFile(io.BytesIO(content_bytes)) as zf:
-                    names = zf.namelist()
-                is_xlsx = any(n.startswith("xl/") for n in names)
-            except Exception:
-                is_xlsx = False
-
-            if is_xlsx:
-                try:
-                    import openpyxl
-                    wb = openpyxl.load_workbook(io.BytesIO(content_bytes), read_only=True, data_only=True)
-                    parts = []
-                    for sheet in wb.worksheets:
-                        parts.append(f"=== Sheet: {sheet.title} ===")
-                        for row in sheet.iter_rows(values_only=True):
-                            line = "\t".join("" if v is None else str(v) for v in row)
-                            if line.strip():
-                                parts.append(line)
-                    text = "\n".join(parts)
-                    log.info("[get_file_text] xlsx parsed OK, sheets=%d chars=%d", len(wb.worksheets), len(text))
-                except Exception as exc:
-                    log.warning("[get_file_text] xlsx parse failed: %s", exc)
-                    text = f"[Could not parse Excel file: {exc}]"
-            else:
-                try:
-                    from docx import Document
-                    doc = Document(io.BytesIO(content_bytes))
-                    text = "\n".join(p.text for p in doc.paragraphs if p.text)
-                except Exception:
-                    try:
-                        text = content_bytes.decode("utf-8")
-                    except UnicodeDecodeError:
-                        text = content_bytes.decode("latin-1")
-        else:
-            try:
-                text = content_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                text = content_bytes.decode("latin-1")
-
-        MAX_CHARS = 12_000
-        if len(text) > MAX_CHARS:
-            text = text[:MAX_CHARS] + "\n\n[... content truncated ...]"
-        return text
-
-    async def get_files_text_batch(self, file_ids: list[str]) -> list[str]:
-        results = await asyncio.gather(
-            *[self.get_file_text(fid) for fid in file_ids],
-            return_exceptions=True,
-        )
+    async def get_file_text(
+        self, file_id: str, max_chars: int = _MAX_FILE_CHARS, query: str | None = None
+    ) -> str:
+        if self.prefetcher and max_chars == _MAX_FILE_CHARS:
+            text = await self.prefetcher.take(file_id)
+            if text is not None and (not query or _is_whole(text)):
+                return text
+        item = await self._get_json(f"/me/drive/items/{quote(file_id, safe='')}?$select={_FILE_SELECT}")
+        return await self._read_item(file_id, item, max_chars, query)
+
+    async def get_files_text_batch(
+        self, file_ids: list[str], max_chars: int = _MAX_FILE_CHARS, query: str | None = None
+    ) -> list[str]:
+        unique = list(dict.fromkeys(file_ids))
+        ready: dict[str, str] = {}
+        if self.prefetcher and max_chars == _MAX_FILE_CHARS:
+            texts = await asyncio.gather(*[self.prefetcher.take(fid) for fid in unique])
+            ready = {
+                fid: t for fid, t in zip(unique, texts)
+                if t is not None and (not query or _is_whole(t))
+            }
+
+        # One $batch for the remaining item lookups (yields pre-authenticated
+        # download URLs), then the downloads run concurrently on the shared pool.
+        meta = await self._lookup_items([fid for fid in unique if fid not in ready])
+
+        async def read_one(fid: str) -> str:
+            if fid in ready:
+                return ready[fid]
+            item = meta[fid]
+            if isinstance(item, GraphBatchError):
+                raise item
+            return await self._read_item(fid, item, max_chars, query)
+
+        results = await asyncio.gather(*[read_one(fid) for fid in file_ids], return_exceptions=True)
         return [
             r if isinstance(r, str) else f"Error reading file {fid}: {r}"
             for fid, r in zip(file_ids, results)
         ]
 
+    async def _read_item(self, file_id: str, item: dict, max_chars: int, query: str | None) -> str:
+        """Text of a driveItem: its start, or with a *query* its most relevant sections."""
+        if not query:
+            return await self._item_text(file_id, item, max_chars)
+        text = await self._item_text(file_id, item, SOURCE_CHARS)
+        if len(text) <= max_chars:
+            return text
+        # Ranking a few hundred chunks takes milliseconds; keep it off the loop anyway.
+        return await asyncio.to_thread(select_sections, text, query, max_chars)
+
+    async def _lookup_items(self, file_ids: list[str]) -> dict[str, dict | GraphBatchError]:
+        """driveItem resources (with download URL and cTag) for several ids in one $batch."""
+        meta = await self._graph_batch([
+            BatchRequest(id=str(i), url=f"/me/drive/items/{quote(fid, safe='')}?$select={_FILE_SELECT}")
+            for i, fid in enumerate(file_ids)
+        ])
+        return {fid: meta[str(i)] for i, fid in enumerate(file_ids)}
+
+    def prefetch_files(self, results: list[dict], top: int) -> None:
+        """Start extracting the text of the first *top* readable files of a search result."""
+        if self.prefetcher is None or top <= 0:
+            return
+        ids = [
+            r["id"] for r in results
+            if not r.get("is_folder") and (r.get("name") or "").lower().endswith(PREFETCH_SUFFIXES)
+        ][:top]
+        self.prefetcher.start(
+            ids, self._lookup_items, lambda fid, item: self._item_text(fid, item, _MAX_FILE_CHARS)
+        )
+
+    async def _item_text(self, file_id: str, item: dict, max_chars: int) -> str:
+        """Text of a driveItem, served from the text cache when its cTag is unchanged."""
+        cache = self.text_cache
+        key = text_key(item, max_chars) if cache else None
+        if key:
+            cached = cache.get_memory(key)
+            if cached is not None:
+                return cached
+            # The disk tier is file I/O: off the event loop.
+            cached = await asyncio.to_thread(cache.get, key) if cache.persistent else cache.get(key)
+            if cached is not None:
+                return cached
+        text = await self._extract_item_text(file_id, item, max_chars)
+        if key:
+            if cache.persistent:
+                await asyncio.to_thread(cache.put, key, text)
+            else:
+                cache.put(key, text)
+        return text
+
+    async def _extract_item_text(self, file_id: str, item: dict, max_chars: int) -> str:
+        """Read a driveItem with ranged requests only as far as *max_chars* needs."""
+        url = item.get("@microsoft.graph.downloadUrl")
+        if not url:
+            raise ValueError(f"{item.get('name') or file_id} is not a downloadable file")
+        name, size = item.get("name") or "", item.get("size")
+        # Ranges need the size; without it (or for an empty file) read it whole.
+        if size:
+            try:
+                if name.lower().endswith(STREAMABLE_SUFFIXES):
+                    result = await self._download(
+                        extract_office_text(self.raw_client, url, size, name, max_chars)
+                    )
+                else:
+                    result = await self._download(
+                        extract_plain_text(self.raw_client, url, size, max_chars)
+                    )
+                return result.render()
+            except StreamUnsupported as exc:
+                log.info("[get_file_text] %s: streaming not possible (%s), full download", name or file_id, exc)
+        else:
+            log.info("[get_file_text] %s: size unknown, full download", name or file_id)
+        resp = await self._download(self.raw_client.get(url))
+        resp.raise_for_status()
+        return await _bytes_to_text(file_id, resp.content, max_chars)
+
     async def get_file_content(self, file_id: str, drive_id: str | None = None) -> bytes:
         if drive_id is None:
-            drive = await self._graph_call(self.user_client.me.drive.get())
-            drive_id = drive.id
+            # /me/drive/items/{id}/content resolves the default drive server-side
+            # and redirects to a pre-authenticated download URL.
+            resp = await self._raw_request(
+                "GET", f"/me/drive/items/{quote(file_id, safe='')}/content", follow_redirects=True
+            )
+            resp.raise_for_status()
+            return resp.content
 
-        content = await self._graph_call(
+        content = await self._graph_call(lambda:
             self.user_client.drives.by_drive_id(drive_id)
             .items.by_drive_item_id(file_id)
             .content.get()
@@ -575,23 +1103,22 @@ class GraphRepository(IGraphRepository):
         return content or b""
 
     async def search_drive_items_sdk(self, query: str, top: int = 25, drive_id: str | None = None) -> list[File]:
+        if self.raw_json:
+            return await self._search_drive_items_json(query, top, drive_id)
         if drive_id is None:
-            drive = await self._graph_call(self.user_client.me.drive.get())
+            drive = await self._graph_call(lambda: self.user_client.me.drive.get())
             drive_id = drive.id
         log.info("[search_drive_items_sdk] query=%r drive_id=%s top=%d", query, drive_id, top)
 
         qp = SearchWithQRequestBuilder.SearchWithQRequestBuilderGetQueryParameters(
-            select=[
-                "id","name","webUrl","size","createdDateTime","lastModifiedDateTime",
-                "file","folder","parentReference"
-            ],
+            select=_SEARCH_FILE_SELECT.split(","),
             top=top,
         )
         cfg = SearchWithQRequestBuilder.SearchWithQRequestBuilderGetRequestConfiguration(
             query_parameters=qp
         )
 
-        res = await self._graph_call(
+        res = await self._graph_call(lambda:
             self.user_client.drives.by_drive_id(drive_id)
             .items.by_drive_item_id("root")
             .search_with_q(query)
@@ -613,6 +1140,33 @@ class GraphRepository(IGraphRepository):
         log.info("[search_drive_items_sdk] query=%r → %d result(s): %s", query, len(out), [f.name for f in out])
         return out
 
+    async def _search_drive_items_json(self, query: str, top: int, drive_id: str | None) -> list[File]:
+        out = await self.stream_drive_items(query, drive_id=drive_id, page_size=top).take(top)
+        log.info("[search_drive_items_sdk] query=%r → %d result(s) (json): %s", query, len(out), [f.name for f in out])
+        return out
+
+    def stream_drive_items(
+        self,
+        query: str,
+        drive_id: str | None = None,
+        page_size: int = 25,
+        predicate: Callable[[File], bool] | None = None,
+    ) -> ResultStream:
+        """Drive search as a lazily paged stream of File; *predicate* filters client-side."""
+        # /me/drive addresses the default drive directly, saving the drive lookup.
+        drive = f"/drives/{quote(drive_id, safe='')}" if drive_id else "/me/drive"
+        q = quote(query.replace("'", "''"), safe="")
+        return ResultStream(
+            follow(
+                self._get_json,
+                f"{drive}/root/search(q='{q}')",
+                params={"$select": _SEARCH_FILE_SELECT, "$top": str(page_size)},
+                on_page=self.cursors.count_page,
+            ),
+            convert=_file_from_json,
+            predicate=predicate,
+        )
+
 
 
         
@@ -630,7 +1184,7 @@ class GraphRepository(IGraphRepository):
             query_parameters=query_params
         )
 
-        result = await self._graph_call(self.user_client.me.contacts.get(
+        result = await self._graph_call(lambda: self.user_client.me.contacts.get(
             request_configuration=request_config
         ))
 
@@ -656,90 +1210,18 @@ class GraphRepository(IGraphRepository):
 # calendar ------------------------------------------------------------------
 
     async def get_upcoming_events(self) -> list[CalendarEvent]:
-        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
-
-        query_params = EventsRequestBuilder.EventsRequestBuilderGetQueryParameters(
-            select=["id", "subject", "start", "end", "attendees", "organizer"],
-            top=10,
-            orderby=["start/dateTime"],
-            filter=f"start/dateTime ge '{now}'",
-        )
-
-        request_config = EventsRequestBuilder.EventsRequestBuilderGetRequestConfiguration(
-            query_parameters=query_params
-        )
-
-        result = await self._graph_call(self.user_client.me.events.get(
-            request_configuration=request_config
-        ))
-
-        events: list[CalendarEvent] = []
-        if not result or not result.value:
-            return events
-
-        for e in result.value:
-            events.append(self.map_event(e))
-
-        return events
+        now = datetime.now(timezone.utc)
+        return await self.calendar.search(start_after=now, top=10)
 
     async def get_past_events(self) -> list[CalendarEvent]:
-        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
-
-        query_params = EventsRequestBuilder.EventsRequestBuilderGetQueryParameters(
-            select=["id", "subject", "start", "end", "attendees", "organizer"],
-            top=10,
-            orderby=["start/dateTime desc"],
-            filter=f"start/dateTime lt '{now}'",
-        )
-
-        request_config = EventsRequestBuilder.EventsRequestBuilderGetRequestConfiguration(
-            query_parameters=query_params
-        )
-
-        result = await self._graph_call(self.user_client.me.events.get(
-            request_configuration=request_config
-        ))
-
-        events: list[CalendarEvent] = []
-        if not result or not result.value:
-            return events
-
-        for e in result.value:
-            events.append(self.map_event(e))
-
-        return events
-
-    def map_event(self, ev) -> CalendarEvent:
-        organizer = None
-        if ev.organizer and ev.organizer.email_address:
-            organizer = EmailAddress(
-                name=ev.organizer.email_address.name,
-                address=ev.organizer.email_address.address,
-            )
-
-        attendees = []
-        if ev.attendees:
-            attendees = [
-                Attendee(
-                    email=EmailAddress(
-                        name=a.email_address.name,
-                        address=a.email_address.address,
-                    )
-                )
-                for a in ev.attendees
-                if a.email_address
-            ]
-
-        return CalendarEvent(
-            id=ev.id,
-            subject=ev.subject,
-            start=ev.start.date_time if ev.start else None,
-            end=ev.end.date_time if ev.end else None,
-            organizer=organizer,
-            attendees=attendees,
-            web_link=ev.web_link,   # hier
-        )
+        now = datetime.now(timezone.utc)
+        return await self.calendar.search(start_before=now, top=10, descending=True)
 
+    async def _attendee_addresses(self, attendee_query: str) -> set[str]:
+        if "@" in attendee_query:
+            return {attendee_query.strip().lower()}
+        people = await self.find_people(attendee_query)
+        return {p.address.lower() for p in people if p.address}
 
     async def search_events(
         self,
@@ -750,58 +1232,76 @@ class GraphRepository(IGraphRepository):
         start_before: datetime | None = None,
         top: int = 25,
     ) -> list[CalendarEvent]:
+        # Attendee resolution and the index refresh are independent round trips.
+        attendees = None
+        if attendee_query:
+            attendees, _ = await asyncio.gather(
+                self._attendee_addresses(attendee_query),
+                self.calendar.refresh(),
+            )
 
-        filters: list[str] = []
-
-        if text:
-            filters.append(f"contains(subject,'{text}')")
-
-        if location:
-            filters.append(f"contains(location/displayName,'{location}')")
-
-        if start_after:
-            iso = start_after.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-            filters.append(f"start/dateTime ge '{iso}'")
-
-        if start_before:
-            iso = start_before.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-            filters.append(f"start/dateTime le '{iso}'")
-
-        f = " and ".join(filters) if filters else None
-
-        qp = EventsRequestBuilder.EventsRequestBuilderGetQueryParameters(
-            select=["id","subject","start","end","attendees","organizer","location", "webLink"],
+        # Attendee, subject and time filters are all answered by the local
+        # index, so no match is lost to a first-page cut-off.
+        return await self.calendar.search(
+            text=text,
+            location=location,
+            attendees=attendees,
+            start_after=start_after,
+            start_before=start_before,
             top=top,
-            filter=f,
-            orderby=["start/dateTime"],
         )
 
-        cfg = EventsRequestBuilder.EventsRequestBuilderGetRequestConfiguration(
-            query_parameters=qp
-        )
-
-        res = await self._graph_call(self.user_client.me.events.get(request_configuration=cfg))
-
-        events: list[CalendarEvent] = []
-        if not res or not res.value:
-            return events
-
-        mapped = [self.map_event(e) for e in res.value]
-
-        # attendee filter (client-side)
-        if attendee_query:
-            people = await self.find_people(attendee_query)
-            emails = {p.address.lower() for p in people if p.address}
-
-            def match(ev: CalendarEvent) -> bool:
-                for a in ev.attendees:
-                    if a.email and a.email.address and a.email.address.lower() in emails:
-                        return True
-                return False
-
-            mapped = [ev for ev in mapped if match(ev)]
+    async def stream_events(self, **filters) -> ResultStream:
+        """search_events as a ResultStream, so calendar results can be resumed by cursor."""
+        return ResultStream(single_page(await self.search_events(**filters, top=_MAX_LOCAL_RESULTS)))
+
+    async def search_everything(
+        self, query: str, top: int = 10, types: list[str] | None = None
+    ) -> list[SearchResult]:
+        """Microsoft Search across mail, files and events in one round trip.
+
+        One /search/query sub-request per entity type goes out in a single
+        $batch call. Each type comes back in Graph's relevance order; the lists
+        are interleaved by rank so every type is represented near the top.
+        A type whose search fails is left out (and logged); only when all of
+        them fail is the first error raised.
+        """
+        kinds = [k for k in (types or _SEARCH_ENTITY_TYPES) if k in _SEARCH_ENTITY_TYPES]
+        if not kinds:
+            raise ValueError(f"Unknown search types {types}; use {sorted(_SEARCH_ENTITY_TYPES)}")
+        requests = [
+            BatchRequest(id=kind, method="POST", url="/search/query", body={"requests": [{
+                "entityTypes": [_SEARCH_ENTITY_TYPES[kind]],
+                "query": {"queryString": query},
+                "from": 0,
+                "size": top,
+            }]})
+            for kind in kinds
+        ]
+        answers = await self._graph_batch(requests)
+
+        ranked: list[tuple[int, int, SearchResult]] = []
+        errors: list[GraphBatchError] = []
+        for order, kind in enumerate(kinds):
+            answer = answers[kind]
+            if isinstance(answer, GraphBatchError):
+                log.warning("[search_everything] %s search failed: %s", kind, answer)
+                errors.append(answer)
+                continue
+            hits = [
+                hit
+                for response in answer.get("value", [])
+                for container in response.get("hitsContainers", [])
+                for hit in container.get("hits") or []
+            ]
+            for pos, hit in enumerate(hits):
+                ranked.append((hit.get("rank") or pos + 1, order, _search_result_from_hit(kind, hit)))
+        if errors and len(errors) == len(kinds):
+            raise errors[0]
+        ranked.sort(key=lambda t: (t[0], t[1]))
+        log.info("[search_everything] query=%r → %d hit(s) over %s", query, len(ranked), kinds)
+        return [r for _, _, r in ranked[:top]]
 
-        return mapped
 
 
 
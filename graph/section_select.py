@@ -0,0 +1,105 @@
+"""
+Query-aware selection of document sections within a character budget.
+
+read_file normally returns the first 12,000 characters of a document. When
+the agent passes a ``query``, the document is read further (up to
+``SOURCE_CHARS``), split into paragraph chunks, and the chunks are ranked
+with BM25 against the query. The best ones are taken until the same budget is
+spent and returned in document order, with a marker for every gap, so the
+answer past the first pages is found at the same token cost.
+
+A chunk is a run of whole paragraphs of about ``_CHUNK_CHARS``; a chunk from
+a spreadsheet is preceded by the "=== Sheet: ... ===" line it belongs to.
+"""
+import re
+from dataclasses import dataclass
+
+from graph.bm25 import BM25, tokenize
+
+SOURCE_CHARS = 400_000      # how far a document is read when a query is given
+
+_CHUNK_CHARS = 800
+_SHEET_HEADER = re.compile(r"^=== Sheet: .* ===$")
+_GAP = "[...]"
+_NOTE_CHARS = 100           # budget kept for the closing note
+
+
+@dataclass
+class _Chunk:
+    text: str
+    heading: str | None
+
+
+def split_chunks(text: str, target: int = _CHUNK_CHARS) -> list[_Chunk]:
+    """Consecutive paragraphs packed into chunks of about *target* characters."""
+    chunks: list[_Chunk] = []
+    parts: list[str] = []
+    size = 0
+    heading = chunk_heading = None
+
+    def flush() -> None:
+        nonlocal parts, size
+        if any(p.strip() for p in parts):
+            chunks.append(_Chunk("\n".join(parts).strip("\n"), chunk_heading))
+        parts, size = [], 0
+
+    for line in text.split("\n"):
+        if _SHEET_HEADER.match(line):
+            flush()
+            heading = line
+        elif size and (size + len(line) > target or (not line.strip() and size > target // 2)):
+            flush()
+        if not parts:
+            chunk_heading = heading
+        # A single paragraph longer than two chunks is cut on its own.
+        while len(line) > 2 * target:
+            parts.append(line[:target])
+            flush()
+            line = line[target:]
+            chunk_heading = heading
+        parts.append(line)
+        size += len(line) + 1
+    flush()
+    return chunks
+
+
+def select_sections(text: str, query: str, max_chars: int) -> str:
+    """The sections of *text* most relevant to *query*, within *max_chars*."""
+    if len(text) <= max_chars:
+        return text
+    chunks = split_chunks(text)
+    q = tokenize(query)
+    if not q or not chunks:
+        return text[:max_chars] + "\n\n[... content truncated ...]"
+
+    scores = BM25([tokenize(c.text) for c in chunks]).scores(q)
+    # Best first; on a tie (e.g. no query term anywhere) the earlier section.
+    order = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    chosen: list[int] = []
+    used = _NOTE_CHARS + len(query)
+    for i in order:
+        cost = len(chunks[i].text) + len(_GAP) + 2 + len(chunks[i].heading or "")
+        if used + cost > max_chars:
+            continue
+        chosen.append(i)
+        used += cost
+
+    out: list[str] = []
+    previous = -1
+    for i in sorted(chosen):
+        chunk = chunks[i]
+        if i != previous + 1:
+            out.append(_GAP)
+        if chunk.heading and (previous < 0 or chunks[previous].heading != chunk.heading or i != previous + 1):
+            if not chunk.text.startswith(chunk.heading):
+                out.append(chunk.heading)
+        out.append(chunk.text)
+        previous = i
+    if previous != len(chunks) - 1:
+        out.append(_GAP)
+    matched = sum(1 for i in chosen if scores[i] > 0)
+    note = (
+        f"[... {len(chosen)} of {len(chunks)} sections selected for query {query!r} "
+        f"({matched} matching); {_GAP} marks omitted text ...]"
+    )
+    return "\n\n".join(out) + "\n\n" + note
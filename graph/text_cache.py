@@ -0,0 +1,189 @@
+"""
+Content-addressed cache of extracted file text: memory LRU + optional disk tier.
+
+Keys combine the driveItem id with its cTag (content tag, changes only when the
+file content changes) and the character budget, so an entry can never be stale:
+an edited file gets a new cTag and therefore a new key. The item metadata call
+that yields the cTag still goes to Graph for every read, which also keeps
+access control with Graph — the cache only saves the download and the parse.
+
+Both tiers are bounded by size in bytes and evict least recently used entries.
+The disk tier is enabled by GRAPH_TEXT_CACHE_DIR; sizes are configured with
+GRAPH_TEXT_CACHE_MEMORY_MB and GRAPH_TEXT_CACHE_DISK_MB.
+
+The repository looks up the memory tier on the event loop (get_memory) and
+runs get/put through asyncio.to_thread when the disk tier is on, so file
+reads and writes never block other requests; a lock serializes access across
+threads.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+log = logging.getLogger("graph.text_cache")
+
+_DEFAULT_MEMORY_MB = 64
+_DEFAULT_DISK_MB = 512
+
+
+def text_key(item: dict, max_chars: int) -> str | None:
+    """Cache key for a driveItem resource, or None when it carries no content tag."""
+    tag = item.get("cTag") or item.get("eTag")
+    if not item.get("id") or not tag:
+        return None
+    drive = (item.get("parentReference") or {}).get("driveId", "")
+    return f"{drive}/{item['id']}|{tag}|{max_chars}"
+
+
+class TextCache:
+    def __init__(
+        self,
+        directory: Path | None = None,
+        max_memory_bytes: int = _DEFAULT_MEMORY_MB * 1024 * 1024,
+        max_disk_bytes: int = _DEFAULT_DISK_MB * 1024 * 1024,
+    ):
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._memory_bytes = 0
+        self._max_memory = max_memory_bytes
+        self._dir = directory
+        self._max_disk = max_disk_bytes
+        self._disk: OrderedDict[str, int] = OrderedDict()   # file name → size, LRU order
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self) -> None:
+        files = sorted(
+            (p for p in self._dir.glob("*.txt") if p.is_file()),
+            key=lambda p: p.stat().st_mtime,
+        )
+        for path in files:
+            size = path.stat().st_size
+            self._disk[path.name] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    @staticmethod
+    def _file_name(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest() + ".txt"
+
+    @property
+    def persistent(self) -> bool:
+        return self._dir is not None
+
+    def get_memory(self, key: str) -> str | None:
+        """The memory tier only (no I/O); a miss here is not counted."""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return text
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return text
+
+            name = self._file_name(key)
+            if self._dir is not None and name in self._disk:
+                path = self._dir / name
+                try:
+                    text = path.read_text(encoding="utf-8")
+                    os.utime(path)   # mtime is the LRU order across restarts
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(name)
+                else:
+                    self._disk.move_to_end(name)
+                    self.disk_hits += 1
+                    self._remember(key, text)
+                    return text
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self._remember(key, text)
+            if self._dir is None:
+                return
+            name = self._file_name(key)
+            data = text.encode("utf-8")
+            if len(data) > self._max_disk:
+                return
+            tmp = self._dir / (name + ".tmp")
+            try:
+                tmp.write_bytes(data)
+                tmp.replace(self._dir / name)
+            except OSError as exc:
+                log.warning("[text_cache] could not write %s: %s", name, exc)
+                return
+            self._disk_bytes += len(data) - self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+            self._evict_disk()
+
+    def _remember(self, key: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self._max_memory:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old.encode("utf-8"))
+        self._memory[key] = text
+        self._memory_bytes += size
+        while self._memory_bytes > self._max_memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.encode("utf-8"))
+            self.evictions += 1
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self._max_disk:
+            name, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                (self._dir / name).unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+        }
+
+
+_cache: TextCache | None = None
+
+
+def get_text_cache() -> TextCache:
+    """Process-wide cache shared by all per-user repositories."""
+    global _cache
+    if _cache is None:
+        directory = os.environ.get("GRAPH_TEXT_CACHE_DIR")
+        _cache = TextCache(
+            directory=Path(directory) if directory else None,
+            max_memory_bytes=int(float(os.environ.get("GRAPH_TEXT_CACHE_MEMORY_MB", _DEFAULT_MEMORY_MB)) * 1024 * 1024),
+            max_disk_bytes=int(float(os.environ.get("GRAPH_TEXT_CACHE_DISK_MB", _DEFAULT_DISK_MB)) * 1024 * 1024),
+        )
+    return _cache
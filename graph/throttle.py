@@ -0,0 +1,209 @@
+"""
+Client-side rate governor for Graph calls, one per user (i.e. per repository).
+
+Graph throttles per app per mailbox: 10,000 requests per 10 minutes and at
+most 4 concurrent requests. Parallel orchestrator steps for the same user all
+share one repository, so they also share one governor:
+
+- a token bucket refilled at the mailbox rate paces requests (a $batch costs
+  one token per sub-request);
+- a semaphore keeps concurrent requests under the mailbox limit;
+- 429/503/504 answers are retried after ``Retry-After`` (or an exponential
+  backoff when the header is missing), with jitter so parallel waiters don't
+  return in lockstep. While a user is throttled, their other calls wait too
+  instead of running into the same 429. Throttled sub-requests of a $batch
+  (which itself answers 200) are retried the same way by the repository,
+  through ``backoff`` and ``sub_response_throttled``.
+
+Time spent waiting for a token or a slot is reported as queue wait.
+Configuration: GRAPH_THROTTLE_RATE (requests/s, default 16),
+GRAPH_THROTTLE_BURST (default 40), GRAPH_THROTTLE_CONCURRENCY (default 4) and
+GRAPH_THROTTLE_RETRIES (default 3).
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable
+
+import httpx
+
+log = logging.getLogger("graph.throttle")
+
+_DEFAULT_RATE = 10_000 / 600     # Graph mailbox limit: 10,000 requests per 10 minutes
+_DEFAULT_BURST = 40
+_DEFAULT_CONCURRENCY = 4         # Graph mailbox limit: 4 concurrent requests
+_DEFAULT_RETRIES = 3
+_BACKOFF_BASE = 1.0              # seconds, doubled per attempt without Retry-After
+_MAX_DELAY = 30.0                # longer Retry-After values are not waited out
+_RETRY_STATUSES = {429, 503, 504}
+
+
+def _retry_after(headers) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    value = None
+    if headers:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _throttled(outcome) -> tuple[int, float | None] | None:
+    """(status, Retry-After) if a result or exception is a retryable throttle answer."""
+    if isinstance(outcome, httpx.Response):
+        response = outcome
+    elif isinstance(outcome, httpx.HTTPStatusError):
+        response = outcome.response
+    else:
+        # Kiota APIError (SDK calls) carries status and headers as attributes.
+        status = getattr(outcome, "response_status_code", None)
+        if status in _RETRY_STATUSES:
+            return status, _retry_after(getattr(outcome, "response_headers", None))
+        return None
+    if response.status_code in _RETRY_STATUSES:
+        return response.status_code, _retry_after(response.headers)
+    return None
+
+
+def sub_response_throttled(item: dict) -> tuple[int, float | None] | None:
+    """(status, Retry-After) if one response of a $batch is a retryable throttle answer."""
+    status = item.get("status")
+    if status in _RETRY_STATUSES:
+        return status, _retry_after(item.get("headers"))
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()   # FIFO: waiters are served in arrival order
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def block(self, seconds: float) -> None:
+        """Hold back every caller for *seconds* (the user is being throttled)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            while True:
+                pause = self._blocked_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                self._refill()
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+
+
+class Throttle:
+    def __init__(
+        self,
+        rate: float = _DEFAULT_RATE,
+        burst: float = _DEFAULT_BURST,
+        concurrency: int = _DEFAULT_CONCURRENCY,
+        max_retries: int = _DEFAULT_RETRIES,
+    ):
+        self._bucket = TokenBucket(rate, burst)
+        self._slots = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.calls = 0
+        self.queued = 0
+        self.queue_wait_ms = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self.gave_up = 0
+
+    @classmethod
+    def from_env(cls) -> "Throttle":
+        return cls(
+            rate=float(os.environ.get("GRAPH_THROTTLE_RATE", _DEFAULT_RATE)),
+            burst=float(os.environ.get("GRAPH_THROTTLE_BURST", _DEFAULT_BURST)),
+            concurrency=int(os.environ.get("GRAPH_THROTTLE_CONCURRENCY", _DEFAULT_CONCURRENCY)),
+            max_retries=int(os.environ.get("GRAPH_THROTTLE_RETRIES", _DEFAULT_RETRIES)),
+        )
+
+    def _delay(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            # Never earlier than asked; the jitter spreads the waiters out.
+            return retry_after + random.uniform(0, max(0.25, retry_after * 0.2))
+        backoff = _BACKOFF_BASE * 2 ** attempt
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    async def run(self, call: Callable[[], Awaitable], timeout: float, cost: float = 1.0):
+        """Run ``call()`` when the user's budget allows, retrying throttle answers.
+
+        *timeout* applies to each attempt, not to the time spent queued. A
+        final throttled ``httpx.Response`` is returned as is; a throttled
+        exception is re-raised once retries are exhausted.
+        """
+        self.calls += 1
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            await self._bucket.acquire(cost)
+            async with self._slots:
+                waited = time.monotonic() - start
+                if waited > 0.001:
+                    self.queued += 1
+                    self.queue_wait_ms += waited * 1000
+                try:
+                    outcome = await asyncio.wait_for(call(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Graph API call timed out after {timeout}s")
+                except Exception as exc:
+                    outcome = exc
+
+            throttled = _throttled(outcome)
+            if throttled is None or not self.backoff(*throttled, attempt):
+                break
+
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def backoff(self, status: int, retry_after: float | None, attempt: int) -> bool:
+        """Record throttle answer number *attempt* (from 0); True if it is to be retried.
+
+        A retry holds back all of the user's calls until its delay has passed,
+        so the next call made through ``run`` waits it out.
+        """
+        self.throttled += 1
+        delay = self._delay(attempt, retry_after)
+        if attempt >= self.max_retries or delay > _MAX_DELAY:
+            self.gave_up += 1
+            log.warning("[throttle] HTTP %d, giving up after %d attempt(s)", status, attempt + 1)
+            return False
+        self.retries += 1
+        self._bucket.block(delay)
+        log.info("[throttle] HTTP %d, retry %d in %.1fs", status, attempt + 1, delay)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "queued": self.queued,
+            "queue_wait_ms": round(self.queue_wait_ms, 1),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "gave_up": self.gave_up,
+        }
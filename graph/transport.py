@@ -0,0 +1,70 @@
+"""
+Process-wide HTTP transport shared by every GraphRepository.
+
+All users talk to the same host (graph.microsoft.com), so one keep-alive
+HTTP/2 connection pool serves everyone. The msgraph SDK gets a client with its
+default middleware (redirect, telemetry, ...) loaded on top of that pool;
+raw requests ($batch, downloads) use a plain client on the same pool.
+
+The SDK's RetryHandler is configured with zero retries: every Graph call runs
+through the per-user governor (graph/throttle.py), which retries 429/503/504
+itself. Retrying inside the middleware as well would hold a governor slot
+during the SDK's backoff and hide the throttling from the governor, so the
+user's other calls would not be held back.
+"""
+import httpx
+from kiota_http.middleware.options import RetryHandlerOption
+from msgraph_core import GraphClientFactory
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+
+_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=120.0,
+)
+_TIMEOUT = httpx.Timeout(100.0, connect=30.0)
+
+_transport: httpx.AsyncHTTPTransport | None = None
+_sdk_client: httpx.AsyncClient | None = None
+_raw_client: httpx.AsyncClient | None = None
+
+
+def _shared_transport() -> httpx.AsyncHTTPTransport:
+    global _transport
+    if _transport is None:
+        _transport = httpx.AsyncHTTPTransport(http2=True, limits=_LIMITS)
+    return _transport
+
+
+def with_sdk_middleware(client: httpx.AsyncClient) -> httpx.AsyncClient:
+    """*client* with the SDK middleware pipeline loaded, retries left to the governor."""
+    return GraphClientFactory.create_with_default_middleware(
+        client=client,
+        options={RetryHandlerOption.get_key(): RetryHandlerOption(max_retries=0)},
+    )
+
+
+def get_sdk_client() -> httpx.AsyncClient:
+    """httpx client for GraphRequestAdapter, with the SDK middleware pipeline."""
+    global _sdk_client
+    if _sdk_client is None:
+        client = httpx.AsyncClient(
+            transport=_shared_transport(),
+            base_url=GRAPH_BASE_URL,
+            timeout=_TIMEOUT,
+        )
+        _sdk_client = with_sdk_middleware(client)
+    return _sdk_client
+
+
+def get_raw_client() -> httpx.AsyncClient:
+    """Plain httpx client on the shared pool, for requests outside the SDK."""
+    global _raw_client
+    if _raw_client is None:
+        _raw_client = httpx.AsyncClient(
+            transport=_shared_transport(),
+            base_url=GRAPH_BASE_URL,
+            timeout=_TIMEOUT,
+        )
+    return _raw_client
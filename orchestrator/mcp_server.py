@@ -17,6 +17,7 @@ the graph-mcp server so Copilot's OAuth flow works unchanged.
 import configparser
 import logging
 import os
+import uuid
 from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
 
 import httpx
@@ -159,8 +160,15 @@ async def _init_salesforce() -> None:
 # ── Per-request Graph agent ───────────────────────────────────────────────────
 
 def _build_graph_agent(graph_token: str) -> Agent:
-    """Create a GraphAgent with a fresh OBO-derived token for this request."""
-    graph_http = httpx.AsyncClient(headers={"Authorization": f"Bearer {graph_token}"})
+    """Create a GraphAgent with a fresh OBO-derived token for this request.
+
+    Every call of this agent carries the same run id, so graph-mcp can share
+    identical tool results between the plan steps of this request.
+    """
+    graph_http = httpx.AsyncClient(headers={
+        "Authorization": f"Bearer {graph_token}",
+        "X-Orchestrator-Run": uuid.uuid4().hex,
+    })
     graph_mcp = MCPStreamableHTTPTool(name="graph", url=_GRAPH_MCP_URL, http_client=graph_http)
     return create_graph_agent(graph_mcp)
 
@@ -0,0 +1,133 @@
+"""tests/bench_graph_json.py — benchmark: deserialisatie per item, Kiota vs raw JSON.
+
+Meet voor berichten en driveItems de kost per item van de twee paden in
+GraphRepository:
+
+  sdk   response bytes → Kiota parse node → Kiota model → pydantic model
+  json  response bytes → json.loads → pydantic model
+
+Geen netwerk: beide paden krijgen dezelfde gegenereerde response body.
+
+Run vanuit de project root:
+    python tests/bench_graph_json.py [--items 25] [--runs 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kiota_serialization_json.json_parse_node_factory import JsonParseNodeFactory
+from msgraph.generated.models.drive_item_collection_response import DriveItemCollectionResponse
+from msgraph.generated.models.message_collection_response import MessageCollectionResponse
+
+from graph.models import Email, File
+from graph.repository import _email_from_json, _file_from_json
+
+
+def make_messages(n: int) -> bytes:
+    return json.dumps({"value": [
+        {
+            "@odata.etag": f'W/"CQAAABYAAAB{i}"',
+            "id": f"AAMkAGI2TG93AAA{i:06d}=",
+            "subject": f"Offerte levering kwartaal {i}",
+            "from": {"emailAddress": {"name": f"Klant {i}", "address": f"klant{i}@contoso.com"}},
+            "isRead": i % 2 == 0,
+            "receivedDateTime": f"2026-03-{1 + i % 28:02d}T08:{i % 60:02d}:00Z",
+            "webLink": f"https://outlook.office365.com/owa/?ItemID=AAMk{i}&exvsurl=1&viewmodel=ReadMessageItem",
+        }
+        for i in range(n)
+    ]}).encode()
+
+
+def make_drive_items(n: int) -> bytes:
+    return json.dumps({"value": [
+        {
+            "@odata.type": "#microsoft.graph.driveItem",
+            "id": f"01BYE5RZ{i:08d}",
+            "name": f"Rapport {i}.docx",
+            "webUrl": f"https://contoso-my.sharepoint.com/personal/u/Documents/Rapport%20{i}.docx",
+            "size": 10_000 + i,
+            "createdDateTime": "2026-01-05T10:00:00Z",
+            "lastModifiedDateTime": "2026-02-01T10:00:00Z",
+            "file": {"mimeType": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                     "hashes": {"quickXorHash": "abc="}},
+            "parentReference": {"driveId": "b!abc", "driveType": "business", "id": "01BYE5RZROOT", "path": "/drive/root:"},
+        }
+        for i in range(n)
+    ]}).encode()
+
+
+# the two paths, as in graph/repository.py ----------------------------------
+
+_FACTORY = JsonParseNodeFactory()
+
+
+def messages_sdk(body: bytes) -> list[Email]:
+    res = _FACTORY.get_root_parse_node("application/json", body).get_object_value(MessageCollectionResponse)
+    out = []
+    for m in res.value or []:
+        name, addr = "", None
+        if m.from_ and m.from_.email_address:
+            name = m.from_.email_address.name or m.from_.email_address.address or ""
+            addr = m.from_.email_address.address
+        out.append(Email(
+            id=m.id or "", subject=m.subject or "", sender_name=name, sender_email=addr,
+            received=m.received_date_time, web_link=m.web_link,
+        ))
+    return out
+
+
+def messages_json(body: bytes) -> list[Email]:
+    return [_email_from_json(m) for m in json.loads(body).get("value", [])]
+
+
+def files_sdk(body: bytes) -> list[File]:
+    res = _FACTORY.get_root_parse_node("application/json", body).get_object_value(DriveItemCollectionResponse)
+    return [
+        File(
+            id=item.id or "", name=item.name or "", is_folder=item.folder is not None,
+            size=item.size, created=item.created_date_time, modified=item.last_modified_date_time,
+            parent_id=item.parent_reference.id if item.parent_reference else None, web_link=item.web_url,
+        )
+        for item in res.value or []
+    ]
+
+
+def files_json(body: bytes) -> list[File]:
+    return [_file_from_json(item) for item in json.loads(body).get("value", [])]
+
+
+def per_item_us(fn, body: bytes, items: int, runs: int) -> float:
+    fn(body)   # warm-up (imports, pydantic validators)
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - t0)
+    return best / items * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=25)
+    ap.add_argument("--runs", type=int, default=200)
+    args = ap.parse_args()
+
+    cases = [
+        ("messages", make_messages(args.items), messages_sdk, messages_json),
+        ("driveItems", make_drive_items(args.items), files_sdk, files_json),
+    ]
+    print(f"{args.items} items per page, best of {args.runs} runs\n")
+    print(f"{'endpoint':<12}{'sdk µs/item':>14}{'json µs/item':>14}{'speedup':>10}")
+    for name, body, sdk, raw in cases:
+        assert sdk(body) == raw(body), f"{name}: paths disagree"
+        a = per_item_us(sdk, body, args.items, args.runs)
+        b = per_item_us(raw, body, args.items, args.runs)
+        print(f"{name:<12}{a:>14.1f}{b:>14.1f}{a / b:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
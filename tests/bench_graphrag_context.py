@@ -0,0 +1,94 @@
+"""tests/bench_graphrag_context.py — benchmark: context opbouwen voor search_documents.
+
+Vergelijkt per query de oude aanpak (text_units filteren met isin, de
+titel-dict opnieuw bouwen met set_index().to_dict() en de rijen aflopen met
+iterrows) met de lookups die _GraphRAGIndex bij het laden voorberekent, op een
+synthetisch corpus (standaard 100.000 chunks over 5.000 documenten), en meet
+de BM25-ranking van de hybride retrieval op hetzelfde corpus. Geen
+LanceDB of Azure nodig: de "top-k" ids zijn een willekeurige steekproef.
+
+Run vanuit de project root:
+    python tests/bench_graphrag_context.py [--chunks 100000] [--queries 50] [--top 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.graphrag_searcher import _GraphRAGIndex, _build_context
+
+
+def _corpus(chunks: int, docs: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rnd = random.Random(7)
+    words = [f"woord{i}" for i in range(2000)]
+    documents = pd.DataFrame({
+        "id": [f"d{i}" for i in range(docs)],
+        "title": [f"Beleid {i}.docx.txt" for i in range(docs)],
+    })
+    text_units = pd.DataFrame({
+        "id": [f"t{i}" for i in range(chunks)],
+        "text": [" ".join(rnd.choices(words, k=120)) for _ in range(chunks)],
+        "document_id": [f"d{rnd.randrange(docs)}" for _ in range(chunks)],
+        "n_tokens": [rnd.randint(100, 1200) for _ in range(chunks)],
+    })
+    return text_units, documents
+
+
+def _legacy(text_units: pd.DataFrame, documents: pd.DataFrame, chunk_ids: list[str]) -> tuple[str, list[str]]:
+    chunks = text_units[text_units["id"].isin(chunk_ids)]
+    doc_id_to_title = documents.set_index("id")["title"].to_dict()
+    sources, parts = [], []
+    for _, row in chunks.iterrows():
+        title = doc_id_to_title.get(row.get("document_id", ""), "unknown").replace(".docx.txt", "").replace(".txt", "")
+        sources.append(title)
+        parts.append(f"[{title}]\n{row['text']}")
+    return "\n\n---\n\n".join(parts), list(set(sources))
+
+
+def _time(fn, queries: list) -> float:
+    times = []
+    for ids in queries:
+        t0 = time.perf_counter()
+        fn(ids)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=100_000)
+    ap.add_argument("--docs", type=int, default=5_000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--top", type=int, default=5)
+    args = ap.parse_args()
+
+    text_units, documents = _corpus(args.chunks, args.docs)
+    idx = _GraphRAGIndex.__new__(_GraphRAGIndex)
+    t0 = time.perf_counter()
+    idx._build_lookups(text_units, documents)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    rnd = random.Random(11)
+    all_ids = text_units["id"].tolist()
+    queries = [rnd.sample(all_ids, args.top) for _ in range(args.queries)]
+
+    legacy = _time(lambda ids: _legacy(text_units, documents, ids), queries)
+    lookup = _time(lambda ids: _build_context(idx, ids), queries)
+    keyword_queries = [" ".join(idx.unit_text[ids[0]].split()[:3]) for ids in queries]
+    keyword = _time(lambda q: idx.keyword_ranking(q, 10), keyword_queries)
+    print(f"synthetic corpus: {args.chunks} chunks, {args.docs} documents, top {args.top}, "
+          f"median of {args.queries} queries\n")
+    print(f"{'isin + set_index + iterrows':<32}{legacy:>10.2f} ms/query")
+    print(f"{'precomputed lookups':<32}{lookup:>10.3f} ms/query  (built once with the BM25 index in {build_ms:.0f} ms)")
+    print(f"{'speed-up':<32}{legacy / lookup:>10.0f}x")
+    print(f"{'BM25 top-10 (3-word query)':<32}{keyword:>10.2f} ms/query  (worker thread; overlaps the vector search)")
+
+
+if __name__ == "__main__":
+    main()
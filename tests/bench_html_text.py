@@ -0,0 +1,168 @@
+"""tests/bench_html_text.py — benchmark: regex _strip_html vs single-pass html_to_text met budget.
+
+De corpus komt uit eval/testdata/test_mails.py (EMAILS): elke body wordt
+gerenderd zoals Outlook hem als HTML aflevert, en samen vormen ze een
+antwoordketen. Aangevuld met synthetische mails voor de gevallen die daar
+niet in zitten:
+
+  testdata-N       EMAILS[N] als Outlook-HTML
+  testdata-thread  antwoordketen van alle EMAILS (Van:/Verzonden:-blokken)
+  marketing        nieuwsbrief met honderden KB inline CSS en geneste tabellen
+  thread           Outlook-antwoordketen met mso conditional comments
+  short            korte zakelijke mail
+
+Per mail wordt de tijd gemeten tot de body klaar is voor read_email
+(conversie + afkappen op 8.000 tekens), beste van N runs.
+
+Run vanuit de project root:
+    python tests/bench_html_text.py [--runs 20]
+"""
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eval.testdata.test_mails import EMAILS
+from graph.html_text import html_to_text
+
+_MAX_EMAIL_CHARS = 8_000
+_WORDS = "offerte levering kwartaal klant prijs korting bestelling factuur project planning".split()
+
+
+def legacy_strip_html(raw: str) -> str:
+    """The regex converter that graph/repository.py used before html_text."""
+    text = re.sub(r'<(style|script)[^>]*>.*?</\1>', '', raw, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r'<(br|p|div|tr|li|h[1-6])\b[^>]*/?>', '\n', text, flags=re.IGNORECASE)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html.unescape(text)
+    text = re.sub(r'\n[ \t]+', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    return text.strip()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def marketing_mail(rng: random.Random, css_kb: int = 300, blocks: int = 400) -> str:
+    css = "".join(
+        f".c{i} {{ font-family: Arial, sans-serif; color: #{rng.randrange(16**6):06x}; "
+        f"padding: {i % 20}px; margin: 0 auto; }}\n"
+        for i in range(css_kb * 1024 // 90)
+    )
+    rows = "".join(
+        f'<tr><td class="c{i}" style="padding:10px;font-size:14px;line-height:20px">'
+        f'<table width="100%"><tr><td><a href="https://example.com/p/{i}">{_sentence(rng, 8)}</a>'
+        f'&nbsp;&ndash;&nbsp;{_sentence(rng, 20)}</td></tr></table></td></tr>\n'
+        for i in range(blocks)
+    )
+    return (
+        f"<html><head><meta charset='utf-8'><style type='text/css'>{css}</style></head>"
+        f"<body><table width='600' align='center'>{rows}</table></body></html>"
+    )
+
+
+def thread_mail(rng: random.Random, replies: int = 30) -> str:
+    parts = ["<html><head><style>p.MsoNormal{margin:0cm;font-size:11pt}</style></head><body>"]
+    for i in range(replies):
+        parts.append(
+            f"<div class=WordSection1><p class=MsoNormal>{_sentence(rng, 25)}<o:p></o:p></p>"
+            f"<!--[if gte mso 9]><xml><o:shapedefaults v:ext='edit' spidmax='1026' /></xml><![endif]-->"
+            f"<p class=MsoNormal>Met vriendelijke groeten,<br>Medewerker {i}</p>"
+            f"<div style='border:none;border-top:solid #E1E1E1 1.0pt;padding:3.0pt 0cm 0cm 0cm'>"
+            f"<p class=MsoNormal><b>Van:</b> Klant {i} &lt;klant{i}@contoso.com&gt;<br>"
+            f"<b>Onderwerp:</b> RE: Offerte {i}</p></div></div>"
+        )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+_OUTLOOK_HEAD = (
+    "<html xmlns:o='urn:schemas-microsoft-com:office:office'><head><meta charset='utf-8'>"
+    "<style>p.MsoNormal{margin:0cm;font-size:11.0pt;font-family:Calibri,sans-serif}</style>"
+    "<!--[if gte mso 9]><xml><o:shapedefaults v:ext='edit' spidmax='1026' /></xml><![endif]-->"
+    "</head><body lang=NL-BE><div class=WordSection1>"
+)
+
+
+def _outlook_paragraphs(body: str) -> str:
+    """A plain-text body as Outlook renders it: one MsoNormal paragraph per line."""
+    return "".join(
+        f"<p class=MsoNormal>{html.escape(line) or '&nbsp;'}<o:p></o:p></p>" for line in body.split("\n")
+    )
+
+
+def outlook_mail(body: str) -> str:
+    return f"{_OUTLOOK_HEAD}{_outlook_paragraphs(body)}</div></body></html>"
+
+
+def outlook_thread(emails: list[dict], depth: int = 12) -> str:
+    """A reply chain of *depth* messages cycling through *emails*, newest first."""
+    parts = [_OUTLOOK_HEAD]
+    for i in range(depth):
+        mail = emails[i % len(emails)]
+        if i:
+            parts.append(
+                "<div style='border:none;border-top:solid #E1E1E1 1.0pt;padding:3.0pt 0cm 0cm 0cm'>"
+                f"<p class=MsoNormal><b>Van:</b> {html.escape(mail['from_name'])} "
+                f"&lt;{mail['from_addr']}&gt;<br><b>Verzonden:</b> maandag {i} maart 2026 10:00<br>"
+                f"<b>Onderwerp:</b> RE: {html.escape(mail['subject'])}</p></div>"
+            )
+        parts.append(_outlook_paragraphs(mail["body"]))
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def short_mail(rng: random.Random) -> str:
+    return f"<html><body><p>Beste Jan,</p><p>{_sentence(rng, 40)}</p><p>Groeten,<br>Els</p></body></html>"
+
+
+def legacy(raw: str) -> str:
+    text = legacy_strip_html(raw)
+    return text[:_MAX_EMAIL_CHARS] if len(text) > _MAX_EMAIL_CHARS else text
+
+
+def budgeted(raw: str) -> str:
+    text = html_to_text(raw, _MAX_EMAIL_CHARS + 1)
+    return text[:_MAX_EMAIL_CHARS] if len(text) > _MAX_EMAIL_CHARS else text
+
+
+def best_ms(fn, raw: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(raw)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    corpus = [(f"testdata-{i}", outlook_mail(m["body"])) for i, m in enumerate(EMAILS)]
+    corpus += [
+        ("testdata-thread", outlook_thread(EMAILS)),
+        ("marketing", marketing_mail(rng)),
+        ("marketing-xl", marketing_mail(rng, css_kb=900, blocks=1500)),
+        ("thread", thread_mail(rng)),
+        ("short", short_mail(rng)),
+    ]
+    print(f"best of {args.runs} runs, body budget {_MAX_EMAIL_CHARS} chars\n")
+    print(f"{'mail':<16}{'size KB':>9}{'regex ms':>10}{'1-pass ms':>11}{'speedup':>9}{'chars':>8}")
+    for name, raw in corpus:
+        a = best_ms(legacy, raw, args.runs)
+        b = best_ms(budgeted, raw, args.runs)
+        print(f"{name:<16}{len(raw) / 1024:>9.1f}{a:>10.2f}{b:>11.2f}{a / b:>8.1f}x{len(budgeted(raw)):>8}")
+
+
+if __name__ == "__main__":
+    main()
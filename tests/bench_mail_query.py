@@ -0,0 +1,116 @@
+"""tests/bench_mail_query.py — benchmark: search_emails met $filter (contains) vs KQL $search.
+
+Twee modi:
+
+  offline  (standaard) FakeMailbox uit tests/mail_fixtures.py. Meet per query
+           de tijd tot de eerste 25 resultaten en hoeveel berichten de server
+           daarvoor bekijkt: contains() overloopt de hele mailbox, $search
+           enkel de postings van de gezochte woorden.
+  --live   tegen de echte Graph API met het token in GRAPH_TOKEN (scope
+           Mail.Read). Meet de latency van dezelfde queries op de eigen
+           mailbox, mediaan van N runs.
+
+Run vanuit de project root:
+    python tests/bench_mail_query.py [--messages 20000] [--runs 5]
+    GRAPH_TOKEN=... python tests/bench_mail_query.py --live --sender jan@contoso.com --subject offerte
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from auth.token_credential import StaticTokenCredential
+from graph.mail_query import MessageQuery, message_filter, plan_message_query
+from graph.pagination import ResultStream, follow
+from graph.repository import GraphRepository, _email_from_json
+from graph.transport import GRAPH_BASE_URL
+from mail_fixtures import FakeMailbox, make_messages
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+_TOP = 25
+
+_OFFLINE_QUERIES = [
+    {"subject": "Offerte colruyt"},
+    {"sender": "jan.peeters@colruyt.be"},
+    {"sender": "els.maes@lidl.be", "subject": "Factuur"},
+    {"subject": "Planning", "received_after": "2025-03-01T00:00:00Z"},
+]
+
+
+async def _run(repo: GraphRepository, plan: MessageQuery) -> int:
+    params = {"$select": "id,subject,from,receivedDateTime,webLink", "$top": str(_TOP), **plan.params()}
+    stream = ResultStream(follow(repo._get_json, "/me/messages", params=params),
+                          convert=_email_from_json, predicate=plan.predicate)
+    return len(await stream.take(_TOP))
+
+
+async def _time(repo: GraphRepository, plan: MessageQuery, runs: int) -> tuple[float, int]:
+    times, n = [], 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        n = await _run(repo, plan)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000, n
+
+
+def _plans(q: dict) -> tuple[MessageQuery, MessageQuery]:
+    args = (q.get("sender"), q.get("subject"), q.get("received_after"), q.get("received_before"))
+    return MessageQuery(filter=message_filter(*args)), plan_message_query(*args)
+
+
+async def offline(args) -> None:
+    mailbox = FakeMailbox(make_messages(args.messages))
+    raw = httpx.AsyncClient(base_url=GRAPH_BASE_URL, transport=httpx.MockTransport(mailbox))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+    print(f"fake mailbox, {args.messages} messages, first {_TOP} results, median of {args.runs} runs\n")
+    print(f"{'query':<66}{'filter ms':>10}{'rows':>8}{'kql ms':>9}{'rows':>8}")
+    for q in _OFFLINE_QUERIES:
+        legacy, kql = _plans(q)
+        mailbox.rows_examined = 0
+        a, _ = await _time(repo, legacy, args.runs)
+        rows_a = mailbox.rows_examined // args.runs
+        mailbox.rows_examined = 0
+        b, _ = await _time(repo, kql, args.runs)
+        rows_b = mailbox.rows_examined // args.runs
+        print(f"{str(q):<66}{a:>10.1f}{rows_a:>8}{b:>9.1f}{rows_b:>8}")
+
+
+async def live(args) -> None:
+    token = os.environ.get("GRAPH_TOKEN")
+    if not token:
+        sys.exit("--live needs a Graph access token in GRAPH_TOKEN")
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential(token))
+    q = {k: v for k, v in vars(args).items()
+         if k in ("sender", "subject", "received_after", "received_before") and v}
+    legacy, kql = _plans(q)
+    print(f"live Graph, query {q}, median of {args.runs} runs\n")
+    for name, plan in (("filter", legacy), ("kql", kql)):
+        try:
+            ms, n = await _time(repo, plan, args.runs)
+            print(f"{name:<8}{ms:>10.0f} ms  {n} result(s)  {plan.params()}")
+        except httpx.HTTPStatusError as exc:
+            print(f"{name:<8}  HTTP {exc.response.status_code}: {exc.response.text[:200]}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=20_000)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--live", action="store_true")
+    ap.add_argument("--sender")
+    ap.add_argument("--subject")
+    ap.add_argument("--received-after", dest="received_after")
+    ap.add_argument("--received-before", dest="received_before")
+    args = ap.parse_args()
+    asyncio.run(live(args) if args.live else offline(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""tests/bench_office_text.py — benchmark: iterparse extractie vs python-docx / openpyxl.
+
+Genereert een grote docx en xlsx in het geheugen en meet per pad de tijd
+(beste van N runs) en de groei van het piekgeheugen (max RSS in een apart
+proces; tracemalloc ziet de native allocaties van lxml niet).
+
+Run vanuit de project root:
+    python tests/bench_office_text.py [--paragraphs 20000] [--rows 50000] [--runs 3]
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.office_text import docx_text, xlsx_text
+from office_fixtures import excel_xlsx
+
+_BUDGET = 12_000   # what read_file returns
+_WORDS = "budget planning omzet kwartaal winkel levering prijs klant marge voorraad".split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) + str(rng.randint(0, 9999)) for _ in range(n))
+
+
+def make_docx(paragraphs: int) -> bytes:
+    from docx import Document
+    rng = random.Random(1)
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(_sentence(rng, 15))
+        if i % 500 == 0:
+            table = doc.add_table(rows=5, cols=4)
+            for cell in table._cells:
+                cell.text = _sentence(rng, 2)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def make_xlsx(rows: int) -> bytes:
+    rng = random.Random(2)
+    data = [
+        [_sentence(rng, 2), rng.randint(0, 10**6), rng.random(), i % 2 == 0, rng.choice(_WORDS)]
+        for i in range(rows)
+    ]
+    return excel_xlsx({"Data": data})
+
+
+def old_docx(data: bytes) -> str:
+    from docx import Document
+    from docx.oxml.ns import qn
+    doc = Document(io.BytesIO(data))
+    parts = []
+    for child in doc.element.body:
+        tag = child.tag.split("}")[-1]
+        if tag == "p":
+            text = "".join(node.text or "" for node in child.iter(qn("w:t"))).strip()
+            if text:
+                parts.append(text)
+        elif tag == "tbl":
+            for row in child.iter(qn("w:tr")):
+                cells = ["".join(n.text or "" for n in c.iter(qn("w:t"))).strip() for c in row.iter(qn("w:tc"))]
+                row_text = " | ".join(c for c in cells if c)
+                if row_text:
+                    parts.append(row_text)
+    return "\n".join(parts)
+
+
+def old_xlsx(data: bytes) -> str:
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    parts = []
+    for sheet in wb.worksheets:
+        parts.append(f"=== Sheet: {sheet.title} ===")
+        for row in sheet.iter_rows(values_only=True):
+            line = "\t".join("" if v is None else str(v) for v in row)
+            if line.strip():
+                parts.append(line)
+    return "\n".join(parts)
+
+
+def new_docx(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return docx_text(zf)
+
+
+def new_xlsx(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return xlsx_text(zf)
+
+
+def budget_docx(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return docx_text(zf, max_chars=_BUDGET)
+
+
+def budget_xlsx(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return xlsx_text(zf, max_chars=_BUDGET)
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM starts fresh in a new process; ru_maxrss survives exec() and would
+    # report the (large) peak of the parent that generated the test files.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _peak_growth(fn, data: bytes, queue) -> None:
+    import docx, openpyxl  # noqa: F401 — imports are not part of the measurement
+    before = _peak_rss_mb()
+    fn(data)
+    queue.put(_peak_rss_mb() - before)
+
+
+def measure(fn, data: bytes, runs: int) -> tuple[float, float, str]:
+    best, text = float("inf"), ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = fn(data)
+        best = min(best, time.perf_counter() - started)
+    # A fresh interpreter per measurement, so earlier runs don't pre-grow the heap.
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_peak_growth, args=(fn, data, queue))
+    proc.start()
+    peak = queue.get()
+    proc.join()
+    return best, peak, text
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--paragraphs", type=int, default=20_000)
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    cases = [
+        ("docx", make_docx(args.paragraphs), old_docx, new_docx, budget_docx),
+        ("xlsx", make_xlsx(args.rows), old_xlsx, new_xlsx, budget_xlsx),
+    ]
+    print(f"{'file':<6}{'size':>9}  {'path':<18}{'time':>8}{'peak mem':>11}  vs python-docx/openpyxl")
+    for name, data, old, new, budget in cases:
+        old_t, old_m, old_text = measure(old, data, args.runs)
+        size = f"{len(data) / 2**20:.1f} MB"
+        print(f"{name:<6}{size:>9}  {'before':<18}{old_t:>7.2f}s{old_m:>8.1f} MB")
+        for label, fn in (("iterparse", new), (f"iterparse {_BUDGET // 1000}k", budget)):
+            t, m, text = measure(fn, data, args.runs)
+            print(f"{'':<17}{label:<18}{t:>7.2f}s{m:>8.1f} MB  "
+                  f"time x{old_t / t:.1f}, memory /{old_m / max(m, 0.1):.1f}")
+            if fn is new:
+                same = [l.rstrip("\t") for l in old_text.splitlines()] == text.splitlines()
+                print(f"{'':<17}same text as before: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""tests/mail_fixtures.py — nagebootste /me/messages met $filter en KQL $search, voor tests en benchmarks.
+
+FakeMailbox beantwoordt enkel de vormen die GraphRepository genereert:
+
+  $filter   contains(subject, '..'), contains(from/emailAddress/address,'..'),
+            receivedDateTime ge/le ..  (met " and ")
+  $search   subject:woord*, from:adres, received>=/<=datum  (met " AND ")
+
+en volgt daarbij het gedrag van Exchange: $filter op contains() overloopt elk
+bericht (rows_examined telt ze), $search zoekt in een woordindex en matcht
+woorden en woordprefixen, datums per dag. Resultaten staan nieuwste eerst en
+worden gepagineerd met @odata.nextLink.
+"""
+import random
+from bisect import bisect_left, bisect_right
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+import httpx
+
+_TOKEN = re.compile(r"\w+")
+_FILTER_CLAUSE = re.compile(
+    r"contains\(subject, '(?P<subject>(?:[^']|'')*)'\)"
+    r"|contains\(from/emailAddress/address,'(?P<sender>(?:[^']|'')*)'\)"
+    r"|receivedDateTime (?P<op>ge|le) (?P<when>\S+)"
+)
+
+_KLANTEN = ["colruyt", "delhaize", "aldi", "carrefour", "spar", "lidl"]
+_ONDERWERPEN = [
+    "Offerte {k} Q{q}", "RE: Offerte {k} Q{q}", "Levering {k} week {w}", "Factuur {k} {w:04d}",
+    "Planning {k} overleg", "FW: Prijslijst {k}", "Klacht levering {k}", "Kwartaalrapport Q{q}",
+]
+
+
+def _received(m: dict) -> datetime:
+    return datetime.fromisoformat(m["receivedDateTime"].replace("Z", "+00:00"))
+
+
+def _aware(text: str) -> datetime:
+    dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def make_messages(n: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(n):
+        k = rng.choice(_KLANTEN)
+        subject = rng.choice(_ONDERWERPEN).format(k=k.capitalize(), q=rng.randint(1, 4), w=rng.randint(1, 52))
+        person = rng.choice(["jan.peeters", "els.maes", "tom.claes", "an.wouters"])
+        received = start + timedelta(minutes=rng.randrange(0, 500 * 24 * 60))
+        out.append({
+            "id": f"m{i:05d}",
+            "subject": subject,
+            "from": {"emailAddress": {"name": person.replace(".", " ").title(), "address": f"{person}@{k}.be"}},
+            "receivedDateTime": received.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "webLink": f"https://outlook/m{i}",
+        })
+    return out
+
+
+class FakeMailbox:
+    def __init__(self, messages: list[dict]):
+        self.messages = sorted(messages, key=_received, reverse=True)
+        self.requests: list[httpx.Request] = []
+        self.rows_examined = 0
+        # Word index, as the mailbox search index keeps it: token → message positions.
+        self._index: dict[tuple[str, str], set[int]] = defaultdict(set)
+        self._addresses: dict[str, set[int]] = defaultdict(set)
+        self._days = [-_received(m).date().toordinal() for m in self.messages]   # ascending
+        for pos, m in enumerate(self.messages):
+            self._addresses[self._text(m, "address").lower()].add(pos)
+            for field in ("subject", "from"):
+                for tok in _TOKEN.findall(self._text(m, field).lower()):
+                    self._index[(field, tok)].add(pos)
+
+    @staticmethod
+    def _text(m: dict, field: str) -> str:
+        if field == "subject":
+            return m.get("subject") or ""
+        sender = (m.get("from") or {}).get("emailAddress") or {}
+        if field == "address":
+            return sender.get("address") or ""
+        return f"{sender.get('address', '')} {sender.get('name', '')}"
+
+    # -- $filter ---------------------------------------------------------------
+
+    def filter_positions(self, expr: str) -> list[int]:
+        clauses = expr.split(" and ")
+        out = []
+        for pos, m in enumerate(self.messages):
+            self.rows_examined += 1
+            if all(self._clause(m, c) for c in clauses):
+                out.append(pos)
+        return out
+
+    def _clause(self, m: dict, clause: str) -> bool:
+        match = _FILTER_CLAUSE.fullmatch(clause.strip())
+        assert match, f"unsupported $filter clause {clause!r}"
+        if match["subject"] is not None:
+            return match["subject"].replace("''", "'").lower() in (m.get("subject") or "").lower()
+        if match["sender"] is not None:
+            address = ((m.get("from") or {}).get("emailAddress") or {}).get("address") or ""
+            return match["sender"].replace("''", "'").lower() in address.lower()
+        when = _aware(match["when"])
+        return _received(m) >= when if match["op"] == "ge" else _received(m) <= when
+
+    # -- $search ---------------------------------------------------------------
+
+    def search_positions(self, kql: str) -> list[int]:
+        hits: set[int] | None = None
+        for term in kql.split(" AND "):
+            found = self._term(term)
+            hits = found if hits is None else hits & found
+        return sorted(hits or ())
+
+    def _term(self, term: str) -> set[int]:
+        if term.startswith("received"):
+            op, day = re.fullmatch(r"received(>=|<=)(\d{4}-\d{2}-\d{2})", term).groups()
+            bound = -date.fromisoformat(day).toordinal()
+            # newest first, so a date bound is a contiguous range of positions
+            if op == ">=":
+                found = set(range(bisect_right(self._days, bound)))
+            else:
+                found = set(range(bisect_left(self._days, bound), len(self.messages)))
+            self.rows_examined += len(found)
+            return found
+        field, value = term.split(":", 1)
+        value = value.lower()
+        found = set()
+        if field == "from" and not value.endswith("*"):
+            # A full address is one indexed value; a bare word matches like a prefix.
+            found |= self._addresses.get(value, set())
+            self.rows_examined += len(found)
+            value += "*"
+        prefix = value.rstrip("*")
+        for (f, tok), positions in self._index.items():
+            if f == field and (tok.startswith(prefix) if value.endswith("*") else tok == prefix):
+                self.rows_examined += len(positions)
+                found |= positions
+        return found
+
+    # -- transport -------------------------------------------------------------
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        assert request.url.path.endswith("/me/messages")
+        params = request.url.params
+        if "$search" in params:
+            assert "$filter" not in params, "Graph rejects $search combined with $filter on messages"
+            positions = self.search_positions(params["$search"].strip('"'))
+        elif "$filter" in params:
+            positions = self.filter_positions(params["$filter"])
+        else:
+            positions = list(range(len(self.messages)))
+
+        top = int(params.get("$top", 10))
+        skip = int(params.get("$skip", 0))
+        page = [self.messages[p] for p in positions[skip:skip + top]]
+        body: dict = {"value": page}
+        if skip + top < len(positions):
+            query = dict(params.items())
+            query["$skip"] = str(skip + top)
+            body["@odata.nextLink"] = f"https://graph.microsoft.com/v1.0/me/messages?{urlencode(query)}"
+        return httpx.Response(200, json=body)
+
+
+def expected_ids(mailbox: FakeMailbox, filter_expr: str | None) -> list[str]:
+    """Ids the legacy $filter query returns, newest first."""
+    if filter_expr is None:
+        return [m["id"] for m in mailbox.messages]
+    return [mailbox.messages[p]["id"] for p in mailbox.filter_positions(filter_expr)]
+
@@ -0,0 +1,110 @@
+"""tests/test_answer_cache.py — unit tests voor de semantische antwoordcache van search_documents.
+
+Run:
+    python -m pytest tests/test_answer_cache.py -v
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.answer_cache import AnswerCache
+from graph.graphrag_searcher import index_version
+
+_ANSWER = {"answer": "Maaltijden tot 25 euro per dag.", "sources": ["Onkostenbeleid"]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _near(vector, angle):
+    """A vector at *angle* radians from *vector* (in the plane of its first two axes)."""
+    v = np.zeros_like(vector)
+    v[0], v[1] = np.cos(angle), np.sin(angle)
+    return v
+
+
+def test_close_question_gets_the_cached_answer():
+    cache = AnswerCache(max_distance=0.05)
+    base = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    cache.put(base * 3, _ANSWER, "v1", tokens=900)
+
+    hit = cache.get(_near(base, 0.2), "v1")            # cosine distance ≈ 0.02
+    assert hit == _ANSWER
+    hit["sources"].append("x")
+    assert cache.get(base, "v1")["sources"] == ["Onkostenbeleid"]
+
+    assert cache.get(_near(base, 0.5), "v1") is None   # ≈ 0.12: a different question
+    assert cache.stats() == {
+        "entries": 1, "hits": 2, "misses": 1, "expired": 0, "invalidated": 0, "term_mismatches": 0,
+        "llm_calls_saved": 2, "llm_tokens_saved": 1800,
+    }
+
+
+def test_nearest_entry_wins():
+    cache = AnswerCache(max_distance=0.1)
+    cache.put([1, 0, 0], {"answer": "a", "sources": []}, "v1")
+    cache.put([0.9, 0.3, 0], {"answer": "b", "sources": []}, "v1")
+    assert cache.get([0.95, 0.32, 0], "v1")["answer"] == "b"
+
+
+def test_same_question_about_another_code_is_a_miss():
+    cache = AnswerCache(max_distance=0.05)
+    cache.put([1, 0, 0], _ANSWER, "v1", terms=frozenset({"onk", "17"}))
+    cache.put([0.99, 0.1, 0], {"answer": "18", "sources": []}, "v1", terms=frozenset({"onk", "18"}))
+
+    assert cache.get([1, 0, 0], "v1", frozenset({"onk", "18"}))["answer"] == "18"
+    assert cache.get([1, 0, 0], "v1", frozenset({"onk", "19"})) is None
+    assert cache.get([1, 0, 0], "v1") is None
+    assert cache.stats()["term_mismatches"] == 2
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = AnswerCache(ttl=60, clock=clock)
+    cache.put([1, 0], _ANSWER, "v1")
+    clock.now = 61
+    assert cache.get([1, 0], "v1") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_new_index_version_drops_all_answers():
+    cache = AnswerCache()
+    cache.put([1, 0], _ANSWER, "v1")
+    cache.put([0, 1], _ANSWER, "v1")
+    assert cache.get([1, 0], "v2") is None
+    assert cache.stats()["invalidated"] == 2
+    cache.put([1, 0], _ANSWER, "v2")
+    assert cache.get([1, 0], "v2") == _ANSWER
+
+
+def test_size_is_bounded_oldest_first():
+    cache = AnswerCache(max_entries=2)
+    for i, v in enumerate(([1, 0, 0], [0, 1, 0], [0, 0, 1])):
+        cache.put(v, {"answer": str(i), "sources": []}, "v1")
+    assert cache.get([1, 0, 0], "v1") is None
+    assert cache.get([0, 0, 1], "v1")["answer"] == "2"
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("GRAPHRAG_ANSWER_CACHE", "off")
+    assert AnswerCache.from_env() is None
+    monkeypatch.setenv("GRAPHRAG_ANSWER_CACHE", "on")
+    monkeypatch.setenv("GRAPHRAG_ANSWER_CACHE_DISTANCE", "0.1")
+    assert AnswerCache.from_env().max_distance == 0.1
+
+
+def test_index_version_follows_the_files_on_disk(tmp_path):
+    empty = index_version(tmp_path)
+    (tmp_path / "text_units.parquet").write_bytes(b"1")
+    first = index_version(tmp_path)
+    assert first != empty
+    os.utime(tmp_path / "text_units.parquet", ns=(1, 1))
+    assert index_version(tmp_path) != first
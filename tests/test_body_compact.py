@@ -0,0 +1,242 @@
+"""tests/test_body_compact.py — unit tests voor het inkorten van e-mailbodies (antwoordketens, handtekeningen).
+
+Run:
+    python -m pytest tests/test_body_compact.py -v
+"""
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph.body_compact import BodyCompactor
+from graph.models import Email
+from graph.repository import GraphRepository, _email_from_json
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+
+_SIGNATURE = """Met vriendelijke groeten,
+
+Jan Peeters
+Account Manager | Contoso NV
++32 470 12 34 56 | www.contoso.be"""
+
+
+def _outlook_reply(new: str, depth: int) -> str:
+    parts = [new, "", _SIGNATURE]
+    for i in range(depth):
+        parts += [
+            "",
+            "________________________________",
+            f"Van: Klant {i} <klant{i}@colruyt.be>",
+            f"Verzonden: maandag {i + 1} maart 2026 10:00",
+            "Aan: Jan Peeters <jan@contoso.be>",
+            "Onderwerp: RE: Offerte Q3",
+            "",
+            f"Bericht {i} met de vraag over de levering en de prijzen. " * 5,
+            "",
+            f"Groeten,\nKlant {i}",
+        ]
+    return "\n".join(parts)
+
+
+def _klant_mails(count: int) -> list[Email]:
+    return [
+        Email(id=f"k{i}", subject="RE: Offerte Q3", sender_name=f"Klant {i}",
+              sender_email=f"klant{i}@colruyt.be", received=f"2026-03-0{i + 1}T10:00:00Z")
+        for i in range(count)
+    ]
+
+
+def test_outlook_reply_history_becomes_a_thread_reference():
+    compactor = BodyCompactor()
+    body = _outlook_reply("Prima, we leveren donderdag.", depth=4)
+    out = compactor.compact(
+        body, sender="jan@contoso.be", subject="RE: Offerte Q3", message_id="m1",
+        received="2026-03-09T10:00:00Z", available=_klant_mails(4),
+    )
+
+    assert out.startswith("Prima, we leveren donderdag.")
+    assert "Bericht 0" not in out
+    assert out.endswith(
+        "[... quoted thread history omitted: 4 earlier message(s), "
+        "latest from Klant 0 <klant0@colruyt.be> (maandag 1 maart 2026 10:00) ...]"
+    )
+    assert len(out) < len(body) / 4
+
+
+def test_quoted_messages_without_a_readable_source_are_kept():
+    compactor = BodyCompactor()
+    body = _outlook_reply("Prima, we leveren donderdag.", depth=4)
+    # Joined the thread late: nothing of it in the mailbox.
+    assert compactor.compact(body, sender="jan@contoso.be", received="2026-03-09T10:00:00Z") == body
+
+    # Only the two newest quoted messages can be read; the older two stay.
+    out = compactor.compact(
+        body, sender="jan@contoso.be", received="2026-03-09T10:00:00Z", available=_klant_mails(2)
+    )
+    assert "Bericht 0" not in out and "Bericht 1" not in out
+    assert "Bericht 2" in out and "Bericht 3" in out
+    assert "[... quoted thread history omitted: 2 earlier message(s), latest from Klant 0" in out
+
+    # A later message from the quoted sender is not its source.
+    later = [Email(**{**m.model_dump(), "received": "2026-03-10T10:00:00Z"}) for m in _klant_mails(4)]
+    assert compactor.compact(body, received="2026-03-09T10:00:00Z", available=later) == body
+
+
+def test_gmail_style_quote_is_cut_and_unattributed_quote_is_kept():
+    compactor = BodyCompactor()
+    els = Email(id="e1", subject="Prijzen", sender_name="Els Maes", sender_email="els@lidl.be",
+                received="2026-03-02T10:00:00Z")
+    gmail = "Akkoord.\n\nOp ma 2 mrt 2026 om 10:00 schreef Els Maes <els@lidl.be>:\n> Kan het sneller?\n> Els"
+    assert compactor.compact(gmail, available=[els]).startswith(
+        "Akkoord.\n\n[... quoted thread history omitted: 1 earlier"
+    )
+
+    quoted = "Zie hieronder.\n\n> vorige vraag\n>\n> tweede regel"
+    assert compactor.compact(quoted, available=[els]) == quoted
+
+
+def test_forwards_and_fully_quoted_bodies_are_kept():
+    compactor = BodyCompactor()
+    fwd = _outlook_reply("Ter info.", depth=1)
+    assert compactor.compact(fwd, subject="FW: Offerte Q3") == fwd
+
+    marker = "Ter info.\n\n---------- Forwarded message ---------\nFrom: Els <els@lidl.be>\nDate: 2 mrt 2026\nSubject: Prijzen\n\nDe prijzen."
+    assert compactor.compact(marker) == marker
+
+    travel = "Planning:\nVan: Brussel\nNaar: Antwerpen\nVertrek 9u."
+    assert compactor.compact(travel) == travel
+
+    only_quote = "Van: Els <els@lidl.be>\nVerzonden: 2 mrt 2026\nOnderwerp: Prijzen\n\nDe prijzen."
+    assert compactor.compact(only_quote) == only_quote
+
+
+def test_signature_is_dropped_once_seen_in_two_other_messages():
+    compactor = BodyCompactor()
+    for i, text in enumerate(["Eerste bericht over de offerte.", "Tweede bericht: prijzen volgen."]):
+        out = compactor.compact(f"{text}\n\n{_SIGNATURE}", sender="jan@contoso.be", message_id=f"m{i}")
+        assert "Account Manager" in out
+
+    third = compactor.compact(
+        f"Derde bericht: planning volgt.\n\n{_SIGNATURE}", sender="JAN@contoso.be", message_id="m2"
+    )
+    assert third == "Derde bericht: planning volgt.\n[signature omitted]"
+
+    other = compactor.compact(f"Ander bericht.\n\n{_SIGNATURE}", sender="els@lidl.be", message_id="m3")
+    assert "Account Manager" in other
+    assert compactor.stats()["signatures_cut"] == 1
+
+
+def test_rereading_a_message_keeps_its_full_text():
+    compactor = BodyCompactor()
+    text = "\n".join([
+        "Hi team,",
+        "",
+        "De levering van week 12 is bevestigd voor donderdag.",
+        "De facturen volgen per afdeling, zoals afgesproken in het contract.",
+        "Graag de bestelbonnen voor vrijdag terugsturen.",
+        "Bij vragen kan je mij altijd bereiken.",
+        "Groeten,",
+        "Marc",
+    ])
+    for _ in range(3):
+        assert compactor.compact(text, sender="marc@supplier1.be", message_id="m1") == text
+    # Without an id the body itself identifies the message.
+    for _ in range(3):
+        assert compactor.compact(text, sender="marc@supplier1.be") == text
+
+
+def test_long_closing_block_is_content_not_a_signature():
+    compactor = BodyCompactor()
+    details = "\n".join(f"Regel {i} met de afspraken over levering en prijs." for i in range(6))
+    for i in range(3):
+        out = compactor.compact(f"Hoi,\n\n{details}", sender="piet@lidl.be", message_id=f"m{i}")
+        assert out.endswith(details)
+    assert compactor.stats()["signatures_cut"] == 0
+
+
+_PEOPLE = [("Jan Peeters", "jan@contoso.be"), ("Klant 0", "klant0@colruyt.be")]
+
+
+def _thread(count: int) -> list[dict]:
+    """A conversation of *count* replies, each quoting all earlier ones (newest first)."""
+    messages = []
+    for i in range(count):
+        name, address = _PEOPLE[i % 2]
+        signature = _SIGNATURE if i % 2 == 0 else "Met vriendelijke groeten,\n\nKlant 0\nAankoop | Colruyt Group"
+        parts = [f"Antwoord {i}: akkoord met punt {i}. " * 3, "", signature]
+        for j in range(i - 1, -1, -1):
+            quoted_name, quoted_address = _PEOPLE[j % 2]
+            parts += [
+                "", "________________________________",
+                f"Van: {quoted_name} <{quoted_address}>",
+                f"Verzonden: maandag {j + 1} maart 2026 10:00",
+                "Onderwerp: RE: Offerte Q3", "",
+                f"Antwoord {j}: akkoord met punt {j}. " * 3,
+            ]
+        messages.append({
+            "id": f"m{i}", "subject": "RE: Offerte Q3", "conversationId": "c1",
+            "receivedDateTime": f"2026-03-0{i + 1}T10:00:00Z",
+            "from": {"emailAddress": {"name": name, "address": address}},
+            "body": {"contentType": "text", "content": "\n".join(parts)},
+        })
+    return messages
+
+
+def _repo(messages: list[dict]) -> GraphRepository:
+    by_id = {m["id"]: m for m in messages}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests = json.loads(request.content)["requests"]
+        return httpx.Response(200, json={"responses": [
+            {"id": r["id"], "status": 200, "body": by_id[r["url"].split("/")[3].split("?")[0]]}
+            for r in requests
+        ]})
+
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler))
+    return GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+
+
+@pytest.mark.asyncio
+async def test_read_emails_sends_only_new_content(monkeypatch):
+    monkeypatch.delenv("GRAPH_BODY_COMPACTION", raising=False)
+    messages = _thread(6)
+    repo = _repo(messages)
+    # Newest first, as the agent reads a thread: the batch returns them all.
+    emails = await repo.get_message_bodies([f"m{i}" for i in range(5, -1, -1)])
+
+    sent = sum(len(e.body) for e in emails)
+    assert sent < sum(len(m["body"]["content"]) for m in messages) / 2
+    assert all(e.body.startswith(f"Antwoord {5 - i}") for i, e in enumerate(emails))
+    assert all("Antwoord 0" not in e.body for e in emails[:-1])
+    stats = repo.compactor.stats()
+    assert stats["bodies"] == 6 and stats["history_cut"] == 5
+
+
+@pytest.mark.asyncio
+async def test_read_email_keeps_history_that_cannot_be_read(monkeypatch):
+    monkeypatch.delenv("GRAPH_BODY_COMPACTION", raising=False)
+    messages = _thread(4)
+    repo = _repo(messages)
+    (latest,) = await repo.get_message_bodies(["m3"])
+    assert latest.body == messages[3]["body"]["content"]
+
+    class Mirror:
+        async def thread(self, conversation_id):
+            return [_email_from_json(m) for m in messages[:3]] if conversation_id == "c1" else []
+
+    repo.mail_mirror = Mirror()
+    (latest,) = await repo.get_message_bodies(["m3"])
+    assert "Antwoord 0" not in latest.body
+    assert "quoted thread history omitted: 3 earlier message(s)" in latest.body
+
+
+def test_compaction_can_be_switched_off(monkeypatch):
+    monkeypatch.setenv("GRAPH_BODY_COMPACTION", "0")
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"))
+    assert repo.compactor is None
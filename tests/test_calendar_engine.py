@@ -0,0 +1,109 @@
+"""tests/test_calendar_engine.py — unit tests voor CalendarEngine / EventIndex.
+
+Geen Graph calls: get_json is een fake die calendarView (delta) pagina's teruggeeft.
+
+Run:
+    python -m pytest tests/test_calendar_engine.py -v
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.calendar_engine import CalendarEngine
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _ev(eid, subject, days, attendees=(), location=""):
+    start = (NOW + timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S.0000000")
+    return {
+        "id": eid,
+        "subject": subject,
+        "start": {"dateTime": start, "timeZone": "UTC"},
+        "end": {"dateTime": start, "timeZone": "UTC"},
+        "attendees": [{"emailAddress": {"name": a, "address": a}} for a in attendees],
+        "location": {"displayName": location},
+    }
+
+
+class FakeGraph:
+    def __init__(self, first_page, second_page):
+        self.pages = [
+            {"value": first_page, "@odata.nextLink": "/me/calendarView/delta?page=2"},
+            {"value": second_page, "@odata.deltaLink": "delta-1"},
+        ]
+        self.delta_changes: list[dict] = []
+        self.urls: list[str] = []
+
+    async def get_json(self, url, headers=None):
+        self.urls.append(url)
+        if url == "delta-1":
+            return {"value": self.delta_changes, "@odata.deltaLink": "delta-1"}
+        if url.startswith("/me/calendarView?"):
+            return {"value": [_ev("old", "Budget review", -400), _ev("far", "Kickoff 2028", 900)]}
+        return self.pages.pop(0)
+
+
+@pytest.fixture
+def graph():
+    # 30 standups on page one would hide the review on page two with a top-25 list call.
+    standups = [_ev(f"s{i}", "Daily Standup", i, attendees=["team@x.com"]) for i in range(1, 31)]
+    review = _ev("r1", "Budget review", 40, attendees=["jan@colruyt.be"], location="Gent HQ")
+    return FakeGraph(standups, [review, _ev("p1", "Retro", -3)])
+
+
+@pytest.mark.asyncio
+async def test_attendee_match_beyond_first_page(graph):
+    engine = CalendarEngine(graph.get_json)
+    hits = await engine.search(attendees={"jan@colruyt.be"})
+    assert [e.id for e in hits] == ["r1"]
+
+
+@pytest.mark.asyncio
+async def test_text_location_and_time_filters(graph):
+    engine = CalendarEngine(graph.get_json)
+    assert [e.id for e in await engine.search(text="stand", top=3)] == ["s1", "s2", "s3"]
+    assert [e.id for e in await engine.search(location="gent")] == ["r1"]
+    past = await engine.search(start_before=NOW, descending=True)
+    assert [e.id for e in past] == ["p1"]
+
+
+@pytest.mark.asyncio
+async def test_delta_refresh_and_out_of_window_range(graph):
+    engine = CalendarEngine(graph.get_json, max_age=0)
+    await engine.search(text="retro")
+    graph.delta_changes = [{"id": "p1", "@removed": {"reason": "deleted"}}]
+    assert await engine.search(text="retro") == []
+
+    old = await engine.search(start_after=NOW - timedelta(days=500), start_before=NOW - timedelta(days=300))
+    assert [e.id for e in old] == ["old"]
+    assert engine.stats()["range_fetches"] == 1
+
+
+def _range(url: str) -> tuple[datetime, datetime]:
+    params = dict(p.split("=", 1) for p in url.split("?", 1)[1].split("&"))
+    return tuple(datetime.fromisoformat(params[k].replace("Z", "+00:00")) for k in ("startDateTime", "endDateTime"))
+
+
+@pytest.mark.asyncio
+async def test_open_ended_range_before_the_window(graph):
+    engine = CalendarEngine(graph.get_json)
+    before = NOW - timedelta(days=300)
+    hits = await engine.search(start_before=before)
+    assert [e.id for e in hits] == ["old"]
+    start, end = _range(graph.urls[-1])
+    assert start < end == before
+
+
+@pytest.mark.asyncio
+async def test_open_ended_range_after_the_window(graph):
+    engine = CalendarEngine(graph.get_json)
+    after = NOW + timedelta(days=800)
+    hits = await engine.search(start_after=after)
+    assert [e.id for e in hits] == ["far"]
+    start, end = _range(graph.urls[-1])
+    assert after == start < end
@@ -0,0 +1,166 @@
+"""tests/test_coalesce.py — unit tests voor singleflight + run-memo van tool calls.
+
+Run:
+    python -m pytest tests/test_coalesce.py -v
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.coalesce import CallCoalescer, normalize_args
+
+
+class Upstream:
+    """Counts calls; each call takes *delay* seconds."""
+
+    def __init__(self, result=None, delay: float = 0.01, error: Exception | None = None):
+        self.result = result if result is not None else ["jan@contoso.com"]
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_normalize_args_ignores_none_whitespace_and_order():
+    a = normalize_args({"name": " Colruyt ", "top": 5, "cursor": None})
+    b = normalize_args({"top": 5, "name": "Colruyt"})
+    assert a == b
+    assert normalize_args({"name": "colruyt"}) != a
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_upstream_call():
+    co = CallCoalescer()
+    up = Upstream()
+    results = await asyncio.gather(*[
+        co.run("find_people", {"name": "Colruyt"}, up) for _ in range(5)
+    ])
+    assert up.calls == 1
+    assert all(r == ["jan@contoso.com"] for r in results)
+    assert co.stats()["joined_inflight"] == 4 and co.stats()["upstream_calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_different_args_are_not_coalesced():
+    co = CallCoalescer()
+    up = Upstream()
+    await asyncio.gather(
+        co.run("find_people", {"name": "Colruyt"}, up),
+        co.run("find_people", {"name": "Delhaize"}, up),
+        co.run("search_files", {"query": "Colruyt"}, up),
+    )
+    assert up.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_results_are_memoized_per_run_only():
+    co = CallCoalescer()
+    up = Upstream()
+    await co.run("find_people", {"name": "Colruyt"}, up, run_id="run-1")
+    await co.run("find_people", {"name": "Colruyt"}, up, run_id="run-1")
+    assert up.calls == 1 and co.memo_hits == 1
+
+    await co.run("find_people", {"name": "Colruyt"}, up, run_id="run-2")
+    await co.run("find_people", {"name": "Colruyt"}, up)
+    await co.run("find_people", {"name": "Colruyt"}, up)
+    assert up.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_memo_expires_after_ttl():
+    now = [0.0]
+    co = CallCoalescer(ttl=60, clock=lambda: now[0])
+    up = Upstream()
+    await co.run("whoami", {}, up, run_id="r")
+    now[0] = 30
+    await co.run("whoami", {}, up, run_id="r")
+    now[0] = 61
+    await co.run("whoami", {}, up, run_id="r")
+    assert up.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_but_not_memoized():
+    co = CallCoalescer()
+    up = Upstream(error=TimeoutError("Graph API call timed out"))
+    results = await asyncio.gather(
+        *[co.run("search_files", {"query": "x"}, up, run_id="r") for _ in range(3)],
+        return_exceptions=True,
+    )
+    assert up.calls == 1
+    assert all(isinstance(r, TimeoutError) for r in results)
+
+    up.error = None
+    assert await co.run("search_files", {"query": "x"}, up, run_id="r") == ["jan@contoso.com"]
+    assert up.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cursor_and_error_results_are_not_memoized():
+    co = CallCoalescer()
+    paged = Upstream(result={"results": [1], "next_cursor": "abc"})
+    await co.run("search_files", {"query": "x"}, paged, run_id="r")
+    await co.run("search_files", {"query": "x"}, paged, run_id="r")
+    assert paged.calls == 2
+
+    failed = Upstream(result={"error": "Email not found"})
+    await co.run("read_email", {"message_id": "m1"}, failed, run_id="r")
+    await co.run("read_email", {"message_id": "m1"}, failed, run_id="r")
+    assert failed.calls == 2
+
+    last_page = Upstream(result={"results": [1], "next_cursor": None})
+    await co.run("search_files", {"query": "y"}, last_page, run_id="r")
+    await co.run("search_files", {"query": "y"}, last_page, run_id="r")
+    assert last_page.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_joiner_does_not_cancel_the_shared_call():
+    co = CallCoalescer()
+    up = Upstream(delay=0.05)
+    leader = asyncio.ensure_future(co.run("whoami", {}, up))
+    await asyncio.sleep(0)
+    joiner = asyncio.ensure_future(co.run("whoami", {}, up))
+    await asyncio.sleep(0.01)
+    joiner.cancel()
+    assert await leader == ["jan@contoso.com"]
+    assert up.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_memo_is_bounded():
+    co = CallCoalescer(max_entries=2)
+    up = Upstream(delay=0)
+    for name in ("a", "b", "c"):
+        await co.run("find_people", {"name": name}, up, run_id="r")
+    await co.run("find_people", {"name": "a"}, up, run_id="r")
+    assert up.calls == 4
+    assert co.stats()["memo_entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_joiners_of_a_call_with_a_cursor_get_their_own():
+    co = CallCoalescer()
+    cursors = iter(["c1", "c2", "c3"])
+
+    async def paged():
+        await asyncio.sleep(0.01)
+        return {"results": [1], "next_cursor": next(cursors)}
+
+    results = await asyncio.gather(*[co.run("search_emails", {"subject": "x"}, paged) for _ in range(3)])
+    assert sorted(r["next_cursor"] for r in results) == ["c1", "c2", "c3"]
+    assert co.stats()["upstream_calls"] == 3 and co.stats()["joined_inflight"] == 0
+
+    last_page = Upstream(result={"results": [1], "next_cursor": None})
+    await asyncio.gather(*[co.run("search_emails", {"subject": "y"}, last_page) for _ in range(3)])
+    assert last_page.calls == 1
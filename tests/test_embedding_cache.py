@@ -0,0 +1,81 @@
+"""tests/test_embedding_cache.py — unit tests voor de query-embedding cache van search_documents.
+
+Geen Azure calls: de embeddings-client is een fake die zijn oproepen telt.
+
+Run:
+    python -m pytest tests/test_embedding_cache.py -v
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.embedding_cache import EmbeddingCache, normalize_query
+from graph.graphrag_searcher import _embed_query
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls: list[str] = []
+
+    async def create(self, model, input):
+        self.calls.append(input)
+        vector = [float(len(input)), 1.0, 0.5]
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector)])
+
+
+def test_normalization_folds_case_space_and_edge_punctuation():
+    assert normalize_query("  What is the   Expense policy? ") == "what is the expense policy"
+    assert normalize_query("¿Qué es la política?") == "qué es la política"
+    assert normalize_query("HR-12") == "hr-12"
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = EmbeddingCache(None, max_entries=2)
+    cache.put("emb", "a", [1, 2])
+    cache.put("emb", "b", [3, 4])
+    assert cache.get("emb", "A") is not None          # a is now most recent
+    cache.put("emb", "c", [5, 6])
+    assert cache.get("emb", "b") is None
+    assert cache.get("emb", "a").dtype == np.float32
+    assert cache.stats() == {
+        "memory_entries": 2, "memory_hits": 2, "disk_hits": 0, "misses": 1, "hit_rate": 0.667,
+    }
+
+
+def test_disk_tier_survives_a_restart_and_separates_deployments(tmp_path):
+    path = tmp_path / "emb.sqlite"
+    EmbeddingCache(path).put("small", "expense policy", [0.25, 0.5, 0.75])
+
+    cache = EmbeddingCache(path)
+    assert cache.get("large", "expense policy") is None
+    assert cache.get("small", "Expense policy?").tolist() == [0.25, 0.5, 0.75]
+    assert cache.get("small", "expense policy") is not None
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["memory_hits"] == 1
+
+
+def test_from_env_can_keep_memory_only(monkeypatch, tmp_path):
+    monkeypatch.setenv("GRAPHRAG_EMBEDDING_CACHE", "off")
+    assert EmbeddingCache.from_env()._db is None
+    monkeypatch.setenv("GRAPHRAG_EMBEDDING_CACHE", str(tmp_path / "sub" / "e.sqlite"))
+    monkeypatch.setenv("GRAPHRAG_EMBEDDING_CACHE_SIZE", "7")
+    cache = EmbeddingCache.from_env()
+    assert cache._db is not None and cache._max_entries == 7
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_skips_the_embedding_call():
+    embeddings = FakeEmbeddings()
+    client = SimpleNamespace(embeddings=embeddings)
+    idx = SimpleNamespace(embedding_deployment="emb", embedding_cache=EmbeddingCache(None))
+
+    first = await _embed_query(client, idx, "What is the expense policy?")
+    second = await _embed_query(client, idx, "what is the expense policy")
+    assert embeddings.calls == ["What is the expense policy?"]
+    assert np.array_equal(first, second)
+    await _embed_query(client, idx, "who approves travel?")
+    assert len(embeddings.calls) == 2
@@ -0,0 +1,115 @@
+"""tests/test_file_stream.py — unit tests voor de budget-aware streaming extractie.
+
+Geen Graph calls: de download-URL wordt bediend door een MockTransport die
+Range-requests ondersteunt (of bewust negeert).
+
+Run:
+    python -m pytest tests/test_file_stream.py -v
+"""
+import io
+import os
+import random
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from office_fixtures import excel_xlsx
+from graph.file_stream import StreamUnsupported, extract_office_text, extract_plain_text
+
+_URL = "https://download.example/file"
+_WORDS = "budget planning omzet kwartaal winkel levering prijs klant marge voorraad".split()
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) + str(rng.randint(0, 9999)) for _ in range(n))
+
+
+def _client(data: bytes, ranges: bool = True) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        header = request.headers.get("Range")
+        if not ranges or not header:
+            return httpx.Response(200, content=data)
+        start, end = header.removeprefix("bytes=").split("-")
+        return httpx.Response(206, content=data[int(start): int(end) + 1])
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _docx_bytes(paragraphs: int) -> bytes:
+    from docx import Document
+    rng = random.Random(1)
+    doc = Document()
+    doc.add_paragraph("Intro paragraaf")
+    table = doc.add_table(rows=1, cols=2)
+    table.rows[0].cells[0].text = "Regio"
+    table.rows[0].cells[1].text = "Gent"
+    for _ in range(paragraphs):
+        doc.add_paragraph(_sentence(rng))
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _xlsx_bytes(rows: int) -> bytes:
+    rng = random.Random(2)
+    omzet = [["Winkel", None, "Bedrag"]] + [[_sentence(rng, 3), None, i] for i in range(rows)]
+    return excel_xlsx({"Omzet": omzet, "Kosten": [["Huur", 1200]]})
+
+
+@pytest.mark.asyncio
+async def test_docx_keeps_order_and_stops_at_budget():
+    data = _docx_bytes(4_000)
+    result = await extract_office_text(_client(data), _URL, len(data), "big.docx", max_chars=2_000)
+
+    lines = result.text.splitlines()
+    assert lines[:2] == ["Intro paragraaf", "Regio | Gent"]
+    assert len(result.text) <= 2_000
+    assert result.truncated and result.bytes_read < len(data) / 2
+    assert "content truncated" in result.render()
+
+
+@pytest.mark.asyncio
+async def test_small_docx_is_complete():
+    data = _docx_bytes(3)
+    result = await extract_office_text(_client(data), _URL, len(data), "small.docx", max_chars=12_000)
+    assert not result.truncated
+    assert len(result.text.splitlines()) == 5
+    assert result.render() == result.text
+
+
+@pytest.mark.asyncio
+async def test_xlsx_rows_shared_strings_and_skipped_sheets():
+    data = _xlsx_bytes(15_000)
+    result = await extract_office_text(_client(data), _URL, len(data), "big.xlsx", max_chars=3_000)
+
+    lines = result.text.splitlines()
+    assert lines[0] == "=== Sheet: Omzet ==="
+    assert lines[1] == "Winkel\t\tBedrag"
+    assert lines[2].endswith("\t\t0")
+    assert result.truncated and result.bytes_read < len(data) / 2
+    assert result.skipped_parts == ["rest of sheet 'Omzet'", "sheet 'Kosten'"]
+
+
+@pytest.mark.asyncio
+async def test_xlsx_all_sheets_when_budget_allows():
+    data = _xlsx_bytes(2)
+    result = await extract_office_text(_client(data), _URL, len(data), "small.xlsx", max_chars=12_000)
+    assert "=== Sheet: Kosten ===\nHuur\t1200" in result.text
+    assert not result.truncated
+
+
+@pytest.mark.asyncio
+async def test_server_without_range_support_is_reported():
+    data = _docx_bytes(3)
+    with pytest.raises(StreamUnsupported):
+        await extract_office_text(_client(data, ranges=False), _URL, len(data), "a.docx", 1_000)
+
+
+@pytest.mark.asyncio
+async def test_plain_text_reads_only_a_prefix():
+    data = ("héllo wörld " * 100_000).encode()
+    result = await extract_plain_text(_client(data), _URL, len(data), max_chars=1_000)
+    assert result.text == ("héllo wörld " * 100)[:1_000]
+    assert result.truncated and result.bytes_read <= 4_001
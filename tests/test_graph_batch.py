@@ -0,0 +1,83 @@
+"""tests/test_graph_batch.py — unit tests voor de JSON $batch laag in GraphRepository.
+
+Geen echte Graph calls: de raw httpx client draait op een MockTransport.
+
+Run:
+    python -m pytest tests/test_graph_batch.py -v
+"""
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph.repository import (
+    BatchRequest,
+    GraphBatchError,
+    GraphRepository,
+    _pack_batches,
+)
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+
+
+def _make_repo(handler) -> GraphRepository:
+    raw = httpx.AsyncClient(
+        base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler)
+    )
+    return GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+
+
+def test_pack_batches_respects_limit():
+    reqs = [BatchRequest(id=str(i), url=f"/me/messages/{i}") for i in range(45)]
+    batches = _pack_batches(reqs)
+    assert [len(b) for b in batches] == [20, 20, 5]
+
+
+def test_pack_batches_keeps_dependency_chains_together():
+    reqs = [BatchRequest(id=str(i), url="/x") for i in range(19)]
+    reqs += [BatchRequest(id="a", url="/a"), BatchRequest(id="b", url="/b", depends_on=["a"])]
+    batches = _pack_batches(reqs)
+
+    ids = [[r.id for r in b] for b in batches]
+    assert any(batch[-2:] == ["a", "b"] for batch in ids)
+    assert all(len(b) <= 20 for b in batches)
+
+
+def test_pack_batches_rejects_unknown_dependency():
+    with pytest.raises(ValueError):
+        _pack_batches([BatchRequest(id="b", url="/b", depends_on=["missing"])])
+
+
+@pytest.mark.asyncio
+async def test_read_messages_in_one_round_trip_with_per_item_errors():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        calls.append(payload)
+        responses = []
+        for sub in payload["requests"]:
+            if sub["url"].startswith("/me/messages/missing"):
+                responses.append({"id": sub["id"], "status": 404,
+                                  "body": {"error": {"code": "ErrorItemNotFound", "message": "gone"}}})
+            else:
+                responses.append({"id": sub["id"], "status": 200, "body": {
+                    "id": "m1", "subject": "Hi", "receivedDateTime": "2026-01-01T10:00:00Z",
+                    "from": {"emailAddress": {"name": "Jan", "address": "jan@contoso.com"}},
+                    "body": {"contentType": "html", "content": "<p>Hello</p>"},
+                }})
+        return httpx.Response(200, json={"responses": responses})
+
+    repo = _make_repo(handler)
+    results = await repo.get_message_bodies(["m1", "missing"])
+
+    assert len(calls) == 1
+    assert calls[0]["requests"][0]["headers"]["Prefer"] == 'outlook.body-content-type="text"'
+    assert results[0].body == "Hello"
+    assert results[0].sender_email == "jan@contoso.com"
+    assert isinstance(results[1], GraphBatchError) and results[1].status == 404
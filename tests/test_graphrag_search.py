@@ -0,0 +1,228 @@
+"""tests/test_graphrag_search.py — unit tests voor het async zoekpad van search_documents.
+
+Een kleine LanceDB-index en parquet-bestanden worden in tmp_path opgebouwd;
+de Azure OpenAI-client is een fake (geen netwerk) die gelijktijdige oproepen telt.
+
+Run:
+    python -m pytest tests/test_graphrag_search.py -v
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import lancedb
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph import graphrag_searcher
+from graph.answer_cache import AnswerCache
+from graph.bm25 import BM25, tokenize
+from graph.graphrag_searcher import _build_context, _GraphRAGIndex, _rrf
+
+_UNITS = [
+    ("t1", "Maaltijden worden terugbetaald tot 25 euro per dag.", "d1", [1, 0, 0, 0]),
+    ("t2", "Verlof wordt aangevraagd via het HR-portaal.", "d2", [0, 1, 0, 0]),
+    ("t3", "Thuiswerk kan twee dagen per week.", "d2", [0, 0, 1, 0]),
+    ("t5", "Artikel ONK-17: fietsvergoeding van 0,27 euro per km.", "d1", [0, 0, 0.6, 0.8]),
+]
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.embedding_calls = 0
+        self.chat_calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.contexts: list[str] = []
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    async def _embed(self, model, input):
+        self.embedding_calls += 1
+        vector = [0.0, 0.0, 0.0, 0.0]
+        vector[0 if "maaltijd" in input else 1 if "verlof" in input else 2] = 1.0
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector)])
+
+    async def _chat(self, model, messages, temperature):
+        self.chat_calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.02)
+        self.running -= 1
+        self.contexts.append(messages[1]["content"])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="antwoord"))],
+            usage=SimpleNamespace(total_tokens=100),
+        )
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    pd.DataFrame(
+        [{"id": i, "text": t, "document_id": d, "n_tokens": 400} for i, t, d, _ in _UNITS]
+        + [{"id": "t4", "text": _UNITS[1][1], "document_id": "d2", "n_tokens": 400}]
+    ).to_parquet(tmp_path / "text_units.parquet")
+    pd.DataFrame([
+        {"id": "d1", "title": "Onkostenbeleid.docx.txt"},
+        {"id": "d2", "title": "HR-handboek.txt"},
+    ]).to_parquet(tmp_path / "documents.parquet")
+    db = lancedb.connect(str(tmp_path / "lancedb"))
+    db.create_table("text_unit_text", data=[
+        {"id": i, "vector": np.asarray(v, dtype=np.float32)} for i, _, _, v in _UNITS
+    ])
+
+    monkeypatch.setattr(graphrag_searcher, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setenv("GRAPHRAG_API_KEY", "key")
+    monkeypatch.setenv("GRAPHRAG_API_BASE", "https://example.openai.azure.com")
+    monkeypatch.setenv("GRAPHRAG_EMBEDDING_CACHE", "off")
+    monkeypatch.setenv("GRAPHRAG_ANSWER_CACHE", "off")
+    idx = _GraphRAGIndex()
+    monkeypatch.setattr(graphrag_searcher, "_index", idx)
+    return idx
+
+
+def _use_fake(idx) -> FakeOpenAI:
+    fake = FakeOpenAI()
+    idx._client, idx._client_loop = fake, asyncio.get_running_loop()
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_search_uses_async_vector_query_and_one_llm_call(index):
+    fake = _use_fake(index)
+    out = await graphrag_searcher.search_documents("hoeveel maaltijd per dag?")
+
+    assert out["answer"] == "antwoord"
+    assert "Onkostenbeleid" in out["sources"]
+    assert fake.contexts[0].startswith("Context:\n[Onkostenbeleid]\nMaaltijden worden terugbetaald")
+    assert fake.embedding_calls == 1 and fake.chat_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_are_bounded(index, monkeypatch):
+    monkeypatch.setattr(graphrag_searcher, "_limit", asyncio.Semaphore(2))
+    fake = _use_fake(index)
+    questions = [f"verlof vraag {'?' * i}" for i in range(6)]
+    results = await asyncio.gather(*[graphrag_searcher.search_documents(q) for q in questions])
+
+    assert len(results) == 6
+    assert fake.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_client_is_created_once_per_loop(index):
+    client = index.openai_client()
+    assert index.openai_client() is client
+    assert (await index.vector_table()) is (await index.vector_table())
+
+
+def test_context_keeps_rank_order_dedupes_and_fits_the_budget(index):
+    context, sources = _build_context(index, ["t3", "t1", "t3", "t4", "t2", "missing"], max_tokens=2000)
+    assert [p.split("\n")[1] for p in context.split("\n\n---\n\n")] == [
+        "Thuiswerk kan twee dagen per week.",
+        "Maaltijden worden terugbetaald tot 25 euro per dag.",
+        "Verlof wordt aangevraagd via het HR-portaal.",        # t4; t2 has the same text
+    ]
+    assert sources == ["HR-handboek", "Onkostenbeleid"]
+
+    context, sources = _build_context(index, ["t1", "t2", "t3"], max_tokens=900)
+    assert context.count("---") == 1 and "Thuiswerk" not in context
+    assert index.unit_title["t1"] == "Onkostenbeleid" and index.unit_tokens["t1"] == 400
+
+
+def test_bm25_top_and_rank_fusion():
+    bm25 = BM25([tokenize(t) for _, t, _, _ in _UNITS])
+    assert bm25.top(tokenize("ONK-17"), 3) == [(3, bm25.scores(tokenize("onk 17"))[3])]
+    assert bm25.top(tokenize("onbekend"), 3) == []
+    # a chunk in both rankings beats the number one of a single ranking
+    assert _rrf([["a", "b", "c"], ["b", "d"]]) == ["b", "a", "d", "c"]
+
+
+@pytest.mark.asyncio
+async def test_exact_code_found_by_keyword_half(index, monkeypatch):
+    monkeypatch.setattr(graphrag_searcher, "_TOP_K", 1)
+    monkeypatch.setattr(graphrag_searcher, "_CANDIDATES", 3)
+    fake = _use_fake(index)
+
+    # The embedding of this question lands on the "thuiswerk" chunk; BM25 knows the code.
+    await graphrag_searcher.search_documents("wat zegt artikel ONK-17?")
+    assert "fietsvergoeding" in fake.contexts[-1] and "Thuiswerk" not in fake.contexts[-1]
+    assert (index.searches, index.keyword_contributed) == (1, 1)
+
+    index.bm25 = None
+    await graphrag_searcher.search_documents("wat zegt artikel ONK-17?")
+    assert "Thuiswerk" in fake.contexts[-1] and "fietsvergoeding" not in fake.contexts[-1]
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_keys_on_exact_terms(index, monkeypatch):
+    monkeypatch.setattr(graphrag_searcher, "_RARE_MIN_UNITS", 2)
+    index.answer_cache = AnswerCache()
+    fake = _use_fake(index)
+
+    assert index.exact_terms("Wat zegt artikel ONK-17 over de fiets?") >= {"onk", "17", "fiets"}
+    assert index.exact_terms("euro per dag") == {"euro", "dag"}     # "per" is in 3 of 5 text units
+
+    await graphrag_searcher.search_documents("wat zegt artikel ONK-17?")
+    await graphrag_searcher.search_documents("Wat zegt artikel ONK-17")     # same question
+    await graphrag_searcher.search_documents("wat zegt artikel ONK-18?")    # same embedding, other code
+    assert fake.chat_calls == 2
+    assert index.answer_cache.stats()["hits"] == 1
+    assert index.answer_cache.stats()["term_mismatches"] == 1
+
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_hit_skips_retrieval(index, monkeypatch):
+    index.answer_cache = AnswerCache()
+    fake = _use_fake(index)
+    retrievals = []
+
+    def count(name, method):
+        def wrapper(*args):
+            retrievals.append(name)
+            return method(*args)
+        return wrapper
+
+    monkeypatch.setattr(index, "keyword_ranking", count("bm25", index.keyword_ranking))
+    monkeypatch.setattr(index, "vector_table", count("vector", index.vector_table))
+
+    await graphrag_searcher.search_documents("hoeveel maaltijd per dag?")
+    assert sorted(retrievals) == ["bm25", "vector"]
+
+    retrievals.clear()
+    out = await graphrag_searcher.search_documents("Hoeveel maaltijd per dag")
+    assert out["answer"] == "antwoord" and retrievals == []
+    assert fake.chat_calls == 1 and index.answer_cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_keyword_ranking_and_disk_cache_run_off_the_loop(index, tmp_path, monkeypatch):
+    import threading
+
+    from graph.embedding_cache import EmbeddingCache
+
+    index.embedding_cache = EmbeddingCache(tmp_path / "embeddings.sqlite")
+    fake = _use_fake(index)
+    threads = []
+
+    def record(method):
+        def wrapper(*args):
+            threads.append(threading.current_thread())
+            return method(*args)
+        return wrapper
+
+    for obj, name in [(index, "keyword_ranking"), (index.embedding_cache, "get"),
+                      (index.embedding_cache, "put")]:
+        monkeypatch.setattr(obj, name, record(getattr(obj, name)))
+
+    await graphrag_searcher.search_documents("hoeveel maaltijd per dag?")
+    assert len(threads) == 3 and threading.main_thread() not in threads
+
+    threads.clear()
+    await graphrag_searcher.search_documents("Hoeveel maaltijd per dag")    # memory tier
+    assert threads and threading.main_thread() not in threads
+    assert fake.embedding_calls == 1 and index.embedding_cache.stats()["memory_hits"] == 1
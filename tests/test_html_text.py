@@ -0,0 +1,55 @@
+"""tests/test_html_text.py — unit tests voor de HTML→tekst conversie van e-mailbodies.
+
+Run:
+    python -m pytest tests/test_html_text.py -v
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.html_text import html_to_text
+from graph.repository import _MAX_EMAIL_CHARS, _clean_body
+
+
+def test_blocks_become_lines_and_whitespace_collapses():
+    raw = "<html><body><p>Beste   Jan,</p><p>De offerte\t staat klaar.<br>Groeten,<br/>Els</p></body></html>"
+    assert html_to_text(raw) == "Beste Jan,\nDe offerte staat klaar.\nGroeten,\nEls"
+
+
+def test_style_script_and_comments_are_skipped():
+    raw = (
+        "<head><style>p { color: red; } /* <b>not text</b> */</style>"
+        "<script>var x = '<p>nope</p>';</script></head>"
+        "<!--[if mso]><table><tr><td>mso only</td></tr></table><![endif]-->"
+        "<div>Zichtbaar</div>"
+    )
+    assert html_to_text(raw) == "Zichtbaar"
+
+
+def test_entities_are_decoded():
+    assert html_to_text("<p>Tom &amp; Jerry &lt;3 &#8364;5</p>") == "Tom & Jerry <3 €5"
+
+
+def test_blank_lines_are_capped_at_one():
+    raw = "<p>a</p><br><br><br><div></div><p>b</p>"
+    assert html_to_text(raw) == "a\n\nb"
+
+
+def test_budget_stops_parsing_early():
+    raw = "<p>" + " ".join(f"woord{i}" for i in range(100_000)) + "</p><p>EINDE</p>"
+    text = html_to_text(raw, max_chars=100)
+    assert 100 <= len(text) < 40_000
+    assert "EINDE" not in text
+
+
+def test_clean_body_truncates_html_with_note():
+    raw = "<style>" + "x{}" * 100_000 + "</style><p>" + "a " * 10_000 + "</p>"
+    body = _clean_body(raw, "html")
+    assert body.endswith("[... body truncated ...]")
+    assert body.startswith("a a a")
+    assert len(body) <= _MAX_EMAIL_CHARS + 30
+
+
+def test_clean_body_leaves_short_plain_text_alone():
+    assert _clean_body("Hallo\n\nTot morgen", "text") == "Hallo\n\nTot morgen"
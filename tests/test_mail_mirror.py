@@ -0,0 +1,160 @@
+"""tests/test_mail_mirror.py — unit tests voor MailMirror (delta sync + lokale zoekopdrachten).
+
+Geen Graph calls: get_json is een fake die vaste delta-pagina's teruggeeft.
+
+Run:
+    python -m pytest tests/test_mail_mirror.py -v
+"""
+import os
+import sqlite3
+import threading
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.mail_mirror import MailMirror, _substring_filters
+
+
+def _msg(mid, subject, sender, received, to=()):
+    return {
+        "conversationId": "c-" + subject.removeprefix("RE: "),
+        "id": mid,
+        "subject": subject,
+        "from": {"emailAddress": {"name": sender.split("@")[0], "address": sender}},
+        "toRecipients": [{"emailAddress": {"name": t.split("@")[0], "address": t}} for t in to],
+        "receivedDateTime": received,
+        "bodyPreview": f"preview of {subject}",
+    }
+
+
+class FakeGraph:
+    def __init__(self):
+        self.pages = {
+            "inbox": [_msg("m1", "Offerte Colruyt", "jan@colruyt.be", "2026-03-01T09:00:00Z", to=["me@x.com"]),
+                      _msg("m2", "Lunch", "piet@x.com", "2026-03-02T09:00:00Z")],
+            "sent": [_msg("m3", "RE: Offerte Colruyt", "me@x.com", "2026-03-03T09:00:00Z", to=["jan@colruyt.be"])],
+        }
+        self.next_delta: dict[str, list] = {}
+
+    async def get_json(self, url, headers=None):
+        if url.startswith("/me/mailFolders/inbox?"):
+            return {"id": "inbox"}
+        if url.startswith("/me/mailFolders?"):
+            return {"value": [{"id": "inbox"}, {"id": "sent"}]}
+        folder = url.split("/")[3] if url.startswith("/me/mailFolders/") else url.split(":")[1]
+        if url.startswith("delta:"):
+            return {"value": self.next_delta.pop(folder, []), "@odata.deltaLink": f"delta:{folder}"}
+        return {"value": self.pages[folder], "@odata.deltaLink": f"delta:{folder}"}
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    graph = FakeGraph()
+    m = MailMirror(tmp_path / "mail.sqlite", graph.get_json, max_age=60)
+    m.graph = graph
+    return m
+
+
+@pytest.mark.asyncio
+async def test_sync_makes_mirror_fresh_and_searchable(mirror):
+    assert not mirror.is_fresh()
+    assert await mirror.sync() == 3
+    assert mirror.is_fresh()
+
+    assert [e.id for e in await mirror.search(subject="offerte")] == ["m3", "m1"]
+    assert [e.id for e in await mirror.search(sender="colruyt")] == ["m1"]
+    assert [e.id for e in await mirror.search(received_after="2026-03-02T00:00:00")] == ["m3", "m2"]
+    assert [e.id for e in await mirror.inbox()] == ["m2", "m1"]
+
+
+@pytest.mark.asyncio
+async def test_delta_applies_updates_and_removals(mirror):
+    await mirror.sync()
+    mirror.graph.next_delta["inbox"] = [
+        {"id": "m2", "@removed": {"reason": "deleted"}},
+        _msg("m4", "Factuur", "jan@colruyt.be", "2026-03-04T09:00:00Z"),
+    ]
+    assert await mirror.sync() == 2
+    assert [e.id for e in await mirror.inbox()] == ["m4", "m1"]
+    assert [e.id for e in await mirror.search(subject="lunch")] == []
+
+
+@pytest.mark.asyncio
+async def test_people_lookup_uses_headers(mirror):
+    await mirror.sync()
+    addresses = {p.address for p in await mirror.people("colruyt")}
+    assert "jan@colruyt.be" in addresses
+
+
+@pytest.mark.asyncio
+async def test_substring_search_uses_the_trigram_index(mirror):
+    mirror.graph.pages["inbox"].append(
+        _msg("m5", 'Korting 10% op "actie_2026"', "els@lidl.be", "2026-03-05T09:00:00Z")
+    )
+    await mirror.sync()
+
+    assert [e.id for e in await mirror.search(subject="offerte", sender="COLRUYT")] == ["m1"]
+    assert [e.id for e in await mirror.search(subject="10%")] == ["m5"]
+    assert [e.id for e in await mirror.search(subject='"actie_2026"')] == ["m5"]
+    assert await mirror.search(subject="actie%2026") == []
+    assert [e.id for e in await mirror.search(subject="re")] == ["m3"]      # too short for a trigram: scan
+
+    where, args = _substring_filters([(("subject",), "offerte"), (("sender",), "colruyt")])
+    plan = mirror._db.execute(
+        "EXPLAIN QUERY PLAN SELECT m.id FROM messages m JOIN messages_fts f ON f.rowid = m.rowid WHERE "
+        + " AND ".join(where),
+        args,
+    ).fetchall()
+    assert any("VIRTUAL TABLE INDEX 0:M" in row[-1] for row in plan), plan
+
+
+@pytest.mark.asyncio
+async def test_thread_lists_a_conversation(mirror):
+    await mirror.sync()
+    assert [e.id for e in await mirror.thread("c-Offerte Colruyt")] == ["m3", "m1"]
+    assert await mirror.thread("c-onbekend") == []
+
+
+def test_mirror_without_conversation_ids_is_synced_again(tmp_path):
+    db = sqlite3.connect(tmp_path / "mail.sqlite")
+    db.executescript("""
+        CREATE TABLE messages (rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, folder_id TEXT NOT NULL,
+            subject TEXT NOT NULL DEFAULT '', sender_name TEXT NOT NULL DEFAULT '', sender_email TEXT,
+            recipients TEXT NOT NULL DEFAULT '', received TEXT NOT NULL, preview TEXT NOT NULL DEFAULT '',
+            web_link TEXT);
+        CREATE TABLE sync_state (folder_id TEXT PRIMARY KEY, delta_link TEXT);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        INSERT INTO messages (id, folder_id, received) VALUES ('old', 'inbox', '2026-01-01T00:00:00Z');
+        INSERT INTO sync_state VALUES ('inbox', 'delta:inbox');
+        INSERT INTO meta VALUES ('synced_at', '9999999999');
+    """)
+    db.close()
+
+    mirror = MailMirror(tmp_path / "mail.sqlite", FakeGraph().get_json, max_age=60)
+    assert not mirror.is_fresh() and mirror.stats()["messages"] == 0
+
+
+@pytest.mark.asyncio
+async def test_sqlite_work_runs_off_the_event_loop(mirror, monkeypatch):
+    threads = set()
+
+    class Recording:
+        def __init__(self, db):
+            self._db = db
+
+        def __getattr__(self, name):
+            return getattr(self._db, name)
+
+        def execute(self, *args):
+            threads.add(threading.current_thread())
+            return self._db.execute(*args)
+
+    monkeypatch.setattr(mirror, "_db", Recording(mirror._db))
+
+    await mirror.sync()
+    await mirror.search(subject="offerte")
+    await mirror.people("colruyt")
+    assert threads and threading.main_thread() not in threads
+    assert mirror.stats()["messages"] == 3
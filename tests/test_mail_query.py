@@ -0,0 +1,123 @@
+"""tests/test_mail_query.py — unit tests voor de KQL query planner van search_emails.
+
+Geen echte Graph calls: FakeMailbox (tests/mail_fixtures.py) speelt
+/me/messages na, met $filter als volledige scan en $search op een woordindex.
+Voor elke query moet het KQL-plan dezelfde berichten opleveren als de oude
+$filter-query.
+
+Run:
+    python -m pytest tests/test_mail_query.py -v
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from auth.token_credential import StaticTokenCredential
+from graph.mail_query import message_filter, plan_message_query
+from graph.models import Email
+from graph.repository import GraphRepository
+from mail_fixtures import FakeMailbox, expected_ids, make_messages
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+
+_QUERIES = [
+    {"subject": "Offerte"},
+    {"subject": "offerte colruyt"},
+    {"subject": "RE: Offerte"},
+    {"subject": "Levering Aldi week 1"},
+    {"sender": "jan.peeters@colruyt.be"},
+    {"sender": "els.maes@lidl.be", "subject": "Factuur"},
+    {"sender": "tom.claes@spar.be", "received_after": "2025-06-01T13:30:00"},
+    {"subject": "Planning", "received_after": "2025-03-01T00:00:00Z", "received_before": "2025-09-15T17:45:00Z"},
+    {"subject": "Kwartaalrapport", "received_before": "2025-02-10T08:00:00"},
+]
+
+
+def _make_repo(mailbox: FakeMailbox) -> GraphRepository:
+    raw = httpx.AsyncClient(
+        base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(mailbox)
+    )
+    return GraphRepository(
+        _SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw, raw_json=True
+    )
+
+
+def test_plan_turns_subject_sender_and_dates_into_kql():
+    plan = plan_message_query(
+        sender="jan@contoso.com", subject="Offerte Q3", received_after="2026-03-02T14:00:00"
+    )
+    assert plan.filter is None
+    assert plan.search == "subject:Offerte* AND subject:Q3* AND from:jan@contoso.com AND received>=2026-03-01"
+    assert plan.params() == {"$search": f'"{plan.search}"'}
+
+
+def test_plan_keeps_filter_where_kql_does_not_fit():
+    # date range only: receivedDateTime is indexed and keeps the newest-first order
+    plan = plan_message_query(received_after="2026-01-01T00:00:00")
+    assert plan.search is None and plan.filter == "receivedDateTime ge 2026-01-01T00:00:00"
+    # nothing to search for in the subject, or a date KQL can't take
+    assert plan_message_query(subject="??").filter == "contains(subject, '??')"
+    assert plan_message_query(subject="x", received_after="last week").search is None
+    assert plan_message_query().params() == {}
+
+
+def test_filter_escapes_quotes():
+    assert message_filter(None, "Jan's offerte", None, None) == "contains(subject, 'Jan''s offerte')"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query", _QUERIES)
+async def test_kql_plan_returns_the_same_messages_as_filter(query):
+    mailbox = FakeMailbox(make_messages(600))
+    want = expected_ids(mailbox, message_filter(
+        query.get("sender"), query.get("subject"), query.get("received_after"), query.get("received_before")
+    ))
+    assert want, "query should match something"
+
+    repo = _make_repo(mailbox)
+    stream = await repo.stream_emails(page_size=50, **query)
+    got = [e.id for e in await stream.take(len(want) + 10)]
+
+    assert got == want
+    assert all("$search" in r.url.params and "$filter" not in r.url.params for r in mailbox.requests)
+
+
+@pytest.mark.asyncio
+async def test_search_emails_applies_exact_date_bound():
+    mailbox = FakeMailbox(make_messages(600))
+    repo = _make_repo(mailbox)
+    after = "2025-06-01T13:30:00"
+    emails = await repo.search_emails(sender="tom.claes@spar.be", received_after=after, top=500)
+
+    assert emails
+    assert all(e.received.isoformat() >= "2025-06-01T13:30:00" for e in emails)
+    assert [e.id for e in emails] == expected_ids(mailbox, message_filter("tom.claes@spar.be", None, after, None))
+
+
+@pytest.mark.asyncio
+async def test_kql_examines_far_fewer_rows_than_filter():
+    mailbox = FakeMailbox(make_messages(3000))
+    expected_ids(mailbox, message_filter("els.maes@lidl.be", "Factuur", None, None))
+    scan = mailbox.rows_examined
+
+    mailbox.rows_examined = 0
+    repo = _make_repo(mailbox)
+    await repo.search_emails(sender="els.maes@lidl.be", subject="Factuur", top=25)
+    assert mailbox.rows_examined < scan / 2
+
+
+def test_subject_words_must_be_contiguous():
+    plan = plan_message_query(subject="offerte q3")
+
+    def email(subject: str) -> Email:
+        return Email(id="m", subject=subject, sender_name="", sender_email=None, received="2026-03-02T10:00:00Z")
+
+    assert plan.matches(email("RE: Offerte Q3 Colruyt"))
+    # KQL finds both words here, in another order or apart; the predicate drops it.
+    assert not plan.matches(email("Offerte Colruyt Q3"))
+    assert not plan.matches(email("Q3 offerte"))
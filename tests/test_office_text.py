@@ -0,0 +1,102 @@
+"""tests/test_office_text.py — unit tests voor de iterparse docx/xlsx extractie.
+
+Vergelijkt met wat python-docx en openpyxl teruggeven.
+
+Run:
+    python -m pytest tests/test_office_text.py -v
+"""
+import datetime
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.office_text import office_text
+from office_fixtures import excel_xlsx
+
+
+def _docx() -> bytes:
+    from docx import Document
+    doc = Document()
+    doc.add_paragraph("Intro")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Regio"
+    table.cell(0, 1).text = "Gent"
+    table.cell(1, 1).text = "Brugge"
+    doc.add_paragraph("")
+    doc.add_paragraph("Slot")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _xlsx() -> bytes:
+    import openpyxl
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Omzet"
+    ws.append(["Winkel", 1200, 2.5, True, None, datetime.datetime(2024, 3, 5, 14, 30)])
+    ws.append([None, None, "gat"])
+    ws["B5"] = datetime.date(2023, 1, 1)
+    ws["B5"].number_format = "dd/mm/yyyy"
+    wb.create_sheet("Leeg")
+    wb.create_sheet("Kosten").append(["Huur", 1e-7])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _openpyxl_text(data: bytes) -> str:
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    parts = []
+    for sheet in wb.worksheets:
+        parts.append(f"=== Sheet: {sheet.title} ===")
+        for row in sheet.iter_rows(values_only=True):
+            line = "\t".join("" if v is None else str(v) for v in row).rstrip("\t")
+            if line.strip():
+                parts.append(line)
+    return "\n".join(parts)
+
+
+def test_docx_keeps_paragraph_and_table_order():
+    assert office_text(_docx()) == "Intro\nRegio | Gent\nBrugge\nSlot"
+
+
+def test_xlsx_matches_openpyxl_values():
+    data = _xlsx()
+    assert office_text(data) == _openpyxl_text(data)
+
+
+def test_xlsx_shared_strings_match_openpyxl():
+    data = excel_xlsx({
+        "Klanten": [["Naam", "Stad", "Omzet"], ["Jan & Co", "Gent", 1200], ["Piet", None, 0.5]],
+        "Leeg": [],
+        "Notities": [["Gent"], [True, False]],
+    })
+    assert office_text(data) == _openpyxl_text(data)
+
+
+def test_max_chars_stops_early():
+    text = office_text(_xlsx(), max_chars=10)
+    assert text.startswith("=== Sheet: Omzet ===")
+    assert "Kosten" not in text
+
+
+def test_non_office_zip_is_rejected():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("readme.txt", "hi")
+    with pytest.raises(Exception):
+        office_text(buf.getvalue())
+
+
+def test_indexer_uses_shared_extractor(tmp_path):
+    from graph.graphrag_indexer import _docx_to_text
+    path = tmp_path / "doc.docx"
+    path.write_bytes(_docx())
+    assert _docx_to_text(path) == "Intro\nRegio | Gent\nBrugge\nSlot"
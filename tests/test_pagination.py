@@ -0,0 +1,171 @@
+"""tests/test_pagination.py — unit tests voor lazy paginering en continuation cursors.
+
+Geen echte Graph calls: de raw httpx client draait op een MockTransport die
+een drive search over meerdere pagina's nabootst.
+
+Run:
+    python -m pytest tests/test_pagination.py -v
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph import mcp_router
+from graph.pagination import CursorStore, ResultStream, follow, single_page
+from graph.repository import GraphRepository
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Files.Read"}
+
+
+class PagedDrive:
+    """Drive search with *pages* pages of *per_page* items; every 10th is an xlsx."""
+
+    def __init__(self, pages: int = 5, per_page: int = 10):
+        self.pages = pages
+        self.per_page = per_page
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        n = int(request.url.params.get("page", 0))
+        items = []
+        for i in range(n * self.per_page, (n + 1) * self.per_page):
+            ext = "xlsx" if i % 10 == 9 else "docx"
+            items.append({"id": f"f{i}", "name": f"Rapport {i}.{ext}", "file": {}})
+        body = {"value": items}
+        if n + 1 < self.pages:
+            body["@odata.nextLink"] = f"https://graph.microsoft.com/v1.0/me/drive/root/search(q='r')?page={n + 1}"
+        return httpx.Response(200, json=body)
+
+
+def _make_repo(handler) -> GraphRepository:
+    raw = httpx.AsyncClient(
+        base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler)
+    )
+    return GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw, raw_json=True)
+
+
+@pytest.mark.asyncio
+async def test_follow_fetches_pages_only_on_demand():
+    drive = PagedDrive(pages=5, per_page=10)
+    repo = _make_repo(drive)
+
+    stream = repo.stream_drive_items("r", page_size=10)
+    first = await stream.take(10)
+
+    assert [f.id for f in first] == [f"f{i}" for i in range(10)]
+    assert len(drive.requests) == 1           # no look-ahead page
+    assert not stream.exhausted
+
+    rest = await stream.take(100)
+    assert len(rest) == 40 and stream.exhausted
+    assert len(drive.requests) == 5
+    assert repo.cursors.stats()["pages_fetched"] == 5
+
+
+@pytest.mark.asyncio
+async def test_follow_stops_at_max_pages():
+    calls = []
+
+    async def get_json(url, headers=None, params=None):
+        calls.append(url)
+        return {"value": [{"n": len(calls)}], "@odata.nextLink": f"/next/{len(calls)}"}
+
+    stream = ResultStream(follow(get_json, "/start", max_pages=3))
+    items = await stream.take(10)
+
+    assert [i["n"] for i in items] == [1, 2, 3]
+    assert calls == ["/start", "/next/1", "/next/2"]
+    assert stream.exhausted
+
+
+@pytest.mark.asyncio
+async def test_budget_stops_before_next_page():
+    calls = []
+
+    async def get_json(url, headers=None, params=None):
+        calls.append(url)
+        return {"value": [1, 2], "@odata.nextLink": "/more"}
+
+    stream = ResultStream(follow(get_json, "/start"))
+    assert await stream.take(10, budget=0.0) == [1, 2]
+    assert len(calls) == 1 and not stream.exhausted
+
+
+@pytest.mark.asyncio
+async def test_filetype_filter_reads_past_the_first_page():
+    drive = PagedDrive(pages=5, per_page=10)   # one xlsx per page
+    repo = _make_repo(drive)
+
+    out = await mcp_router._search_files(repo, query="rapport filetype:xlsx", top=3)
+
+    assert [r["name"] for r in out["results"]] == ["Rapport 9.xlsx", "Rapport 19.xlsx", "Rapport 29.xlsx"]
+    assert len(drive.requests) == 3
+    assert drive.requests[0].url.params["$top"] == "100"
+    assert out["next_cursor"]
+
+
+@pytest.mark.asyncio
+async def test_cursor_resumes_without_refetching_earlier_pages():
+    drive = PagedDrive(pages=3, per_page=10)
+    repo = _make_repo(drive)
+
+    first = await mcp_router._search_files(repo, query="rapport", top=15)
+    assert len(first["results"]) == 15 and len(drive.requests) == 2
+
+    second = await mcp_router._search_files(repo, query="rapport", cursor=first["next_cursor"], top=15)
+    assert [r["id"] for r in second["results"]] == [f"f{i}" for i in range(15, 30)]
+    assert second["next_cursor"] is None
+    assert len(drive.requests) == 3
+
+    again = await mcp_router._search_files(repo, query="rapport", cursor=first["next_cursor"])
+    assert "error" in again
+
+
+@pytest.mark.asyncio
+async def test_search_emails_tool_pages_and_passes_query():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={
+            "value": [{"id": "m1", "subject": "Offerte", "receivedDateTime": "2026-03-02T08:15:00Z"}],
+            "@odata.nextLink": "https://graph.microsoft.com/v1.0/me/messages?$skip=1",
+        })
+
+    repo = _make_repo(handler)
+    out = await mcp_router._search_emails(repo, subject="Offerte", top=1)
+
+    assert [r["id"] for r in out["results"]] == ["m1"]
+    assert out["next_cursor"] and len(seen) == 1
+    assert seen[0].url.params["$search"] == '"subject:Offerte*"'
+
+
+@pytest.mark.asyncio
+async def test_cursor_store_expires_and_bounds_cursors():
+    store = CursorStore(ttl=-1)
+    stream = ResultStream(follow(_never_called, "/x"))
+    cursor = store.put(stream)
+    assert store.pop(cursor) is None
+    assert store.stats()["cursors_expired"] == 1
+
+    store = CursorStore(max_cursors=2)
+    cursors = [store.put(ResultStream(follow(_never_called, "/x"))) for _ in range(3)]
+    assert store.pop(cursors[0]) is None
+    assert store.pop(cursors[2]) is not None
+
+
+@pytest.mark.asyncio
+async def test_exhausted_stream_gets_no_cursor():
+    stream = ResultStream(single_page([1, 2]))
+    assert await stream.take(5) == [1, 2]
+    assert CursorStore().put(stream) is None
+
+
+async def _never_called(url, headers=None, params=None):
+    raise AssertionError("unexpected fetch")
@@ -0,0 +1,97 @@
+"""tests/test_parse_pool.py — unit tests voor de ParsePool (process pool voor parsing).
+
+Run:
+    python -m pytest tests/test_parse_pool.py -v
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.parse_pool import ParseError, ParsePool, parse_office
+
+
+@pytest.fixture
+def pool():
+    p = ParsePool(max_workers=2, timeout=5, memory_limit=512 * 1024 * 1024)
+    yield p
+    p.shutdown()
+
+
+def _xlsx_bytes() -> bytes:
+    import openpyxl
+    wb = openpyxl.Workbook()
+    wb.active.title = "Omzet"
+    wb.active.append(["Gent", 1200])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_office_parse_runs_in_worker(pool):
+    text = await pool.run(parse_office, _xlsx_bytes())
+    assert text == "=== Sheet: Omzet ===\nGent\t1200"
+    assert pool.stats()["jobs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_parallel(pool):
+    await pool.run(time.sleep, 0)            # start the workers
+    started = time.perf_counter()
+    await asyncio.gather(pool.run(time.sleep, 0.5), pool.run(time.sleep, 0.5))
+    assert time.perf_counter() - started < 0.9
+
+
+@pytest.mark.asyncio
+async def test_timeout_recycles_workers(pool):
+    pool.timeout = 0.5
+    with pytest.raises(ParseError):
+        await pool.run(time.sleep, 10)
+    assert pool.stats()["timeouts"] == 1
+
+    pool.timeout = 5
+    assert await pool.run(parse_office, b"not a zip") is None
+
+
+@pytest.mark.asyncio
+async def test_timeout_counts_from_job_start_and_spares_other_jobs(pool):
+    pool.timeout = 1.0
+    # Cold pool: spawning the workers does not count against the first jobs.
+    stuck = asyncio.ensure_future(pool.run(time.sleep, 5))
+    healthy = asyncio.ensure_future(pool.run(time.sleep, 0.8))
+    await asyncio.sleep(0.9)
+    late = asyncio.ensure_future(pool.run(time.sleep, 0.3))
+
+    with pytest.raises(ParseError, match="longer than"):
+        await stuck
+    assert await healthy is None
+    assert await late is None
+    assert pool.stats()["timeouts"] == 1 and pool.stats()["crashes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_jobs_killed_with_a_stuck_one_are_resubmitted(pool):
+    pool.timeout = 0.5
+    await pool.run(time.sleep, 0)                    # start the workers
+    stuck = asyncio.ensure_future(pool.run(time.sleep, 10))
+    busy = asyncio.ensure_future(pool.run(time.sleep, 0.4))
+    queued = asyncio.ensure_future(pool.run(time.sleep, 0.3))   # waits for a free worker
+
+    with pytest.raises(ParseError):
+        await stuck
+    assert await busy is None and await queued is None
+    assert pool.stats()["crashes"] == 0 and pool.stats()["resubmitted"] >= 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="RLIMIT_AS is POSIX only")
+@pytest.mark.asyncio
+async def test_memory_limit(pool):
+    with pytest.raises(ParseError):
+        await pool.run(bytearray, 2 * 1024 * 1024 * 1024)
+    assert pool.stats()["memory_errors"] == 1
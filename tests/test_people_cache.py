@@ -0,0 +1,79 @@
+"""tests/test_people_cache.py — unit tests voor PeopleCache (find_people resolutie).
+
+Run:
+    python -m pytest tests/test_people_cache.py -v
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph.models import EmailAddress
+from graph.people_cache import PeopleCache
+from graph.repository import GraphRepository
+
+JAN_D = EmailAddress(name="Jan De Smedt", address="jan.desmedt@contoso.com")
+JAN_P = EmailAddress(name="Jan Peeters", address="jan.peeters@contoso.com")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_exact_hit_is_case_and_space_insensitive():
+    cache = PeopleCache()
+    cache.put("Jan", [JAN_D, JAN_P], top=5, complete=True)
+    assert cache.get("  jan ", 5) == [JAN_D, JAN_P]
+    assert cache.stats()["hits"] == 1
+
+
+def test_complete_prefix_answers_longer_query_locally():
+    cache = PeopleCache()
+    cache.put("jan", [JAN_D, JAN_P], top=5, complete=True)
+    assert cache.get("Jan D", 5) == [JAN_D]
+    assert cache.get("jan peet", 5) == [JAN_P]
+    assert cache.stats()["prefix_hits"] == 2
+
+
+def test_incomplete_prefix_is_not_reused():
+    cache = PeopleCache()
+    cache.put("jan", [JAN_D, JAN_P], top=2, complete=False)
+    assert cache.get("jan d", 2) is None
+    assert cache.get("jan", 5) is None       # a bigger top needs a new lookup
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = PeopleCache(ttl=10, clock=clock)
+    cache.put("jan", [JAN_D], top=5, complete=True)
+    clock.now = 11
+    assert cache.get("jan", 5) is None
+
+
+@pytest.mark.asyncio
+async def test_prefix_is_not_reused_when_mail_hits_were_cut_off():
+    repo = GraphRepository(
+        {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read"}, credential=StaticTokenCredential("tok")
+    )
+    mail = [EmailAddress(name=f"Jan {i}", address=f"jan{i}@klant.be") for i in range(2)]
+
+    async def none(query, top):
+        return []
+
+    async def mail_people(query, top):
+        return mail[:top]
+
+    repo._find_contacts = repo._find_directory_users = none
+    repo._find_mail_people = mail_people
+
+    assert await repo.find_people("jan", top=2) == mail
+    assert repo.people_cache.get("jan 1", 2) is None     # the mail source was full: maybe more
+    assert await repo.find_people("jan", top=3) == mail
+    assert repo.people_cache.get("jan 1", 3) == [mail[1]]
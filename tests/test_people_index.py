@@ -0,0 +1,199 @@
+"""tests/test_people_index.py — unit tests voor de lokale persoonsindex (directory snapshot + correspondenten).
+
+Geen Graph calls: get_json is een fake met vaste /users/delta- en /me/messages-pagina's.
+
+Run:
+    python -m pytest tests/test_people_index.py -v
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph.models import EmailAddress
+from graph.people_index import CorrespondentIndex, DirectorySnapshot, PrefixIndex
+from graph.repository import GraphRepository
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+
+
+def _user(uid, name, mail):
+    return {"id": uid, "displayName": name, "mail": mail, "userPrincipalName": mail}
+
+
+def _msg(mid, sender, received, to=()):
+    return {
+        "id": mid,
+        "from": {"emailAddress": {"name": sender.split("@")[0].title(), "address": sender}},
+        "toRecipients": [{"emailAddress": {"name": None, "address": t}} for t in to],
+        "receivedDateTime": received,
+    }
+
+
+class FakeGraph:
+    def __init__(self):
+        self.users = [
+            _user("u1", "Jan Peeters", "jan.peeters@contoso.com"),
+            _user("u2", "Jan De Smedt", "jan.desmedt@contoso.com"),
+            _user("u3", "Els Maes", "els.maes@contoso.com"),
+        ]
+        self.next_delta: list[dict] = []
+        self.messages = [
+            _msg("m3", "klant@colruyt.be", "2026-03-03T09:00:00Z", to=["me@contoso.com"]),
+            _msg("m2", "me@contoso.com", "2026-03-02T09:00:00Z", to=["klant@colruyt.be"]),
+            _msg("m1", "piet@lidl.be", "2026-03-01T09:00:00Z", to=["me@contoso.com"]),
+        ]
+        self.urls: list[str] = []
+        self.expired = False
+
+    async def get_json(self, url, headers=None):
+        self.urls.append(url)
+        if url.startswith("/users/delta"):
+            return {"value": self.users[:2], "@odata.nextLink": "next:users"}
+        if url == "next:users":
+            return {"value": self.users[2:], "@odata.deltaLink": "delta:users"}
+        if url == "delta:users":
+            if self.expired:
+                self.expired = False
+                raise httpx.HTTPStatusError("gone", request=None, response=httpx.Response(410))
+            changes, self.next_delta = self.next_delta, []
+            return {"value": changes, "@odata.deltaLink": "delta:users"}
+        if url.startswith("/me/messages"):
+            since = url.split("receivedDateTime ge ")[1] if "$filter" in url else ""
+            return {"value": [m for m in self.messages if m["receivedDateTime"] >= since]}
+        raise AssertionError(url)
+
+
+def test_prefix_search_is_case_insensitive_and_multi_word():
+    index = PrefixIndex()
+    index.add("a", EmailAddress(name="Jan Peeters", address="jan.peeters@contoso.com"))
+    index.add("b", EmailAddress(name="Jan De Smedt", address="jan.desmedt@contoso.com"))
+    index.add("c", EmailAddress(name="Janine Maes", address="janine@lidl.be"))
+
+    assert [p.name for p in index.search("JAN")] == ["Jan De Smedt", "Jan Peeters", "Janine Maes"]
+    assert [p.name for p in index.search("jan pee")] == ["Jan Peeters"]
+    assert [p.name for p in index.search("maes jan")] == ["Janine Maes"]
+    assert [p.name for p in index.search("jan.des")] == ["Jan De Smedt"]
+    assert [p.name for p in index.search("lidl")] == ["Janine Maes"]
+    assert index.search("xyz") == []
+
+
+def test_typos_are_tolerated_after_exact_prefixes():
+    index = PrefixIndex()
+    index.add("a", EmailAddress(name="Jan Peeters", address="jan.peeters@contoso.com"))
+    index.add("b", EmailAddress(name="Piet Peters", address="piet@lidl.be"))
+
+    # exact prefix first, then the one-typo match
+    assert [p.name for p in index.search("peters")] == ["Piet Peters", "Jan Peeters"]
+    assert [p.name for p in index.search("petters")] == ["Jan Peeters", "Piet Peters"]
+    assert [p.name for p in index.search("jna")] == []        # short tokens must be exact
+
+
+def test_remove_prunes_the_trie():
+    index = PrefixIndex()
+    index.add("a", EmailAddress(name="Jan Peeters", address="jan@x.com"))
+    index.add("a", EmailAddress(name="Jan Claes", address="jan@x.com"))
+    assert index.search("peeters") == []
+    index.remove("a")
+    assert len(index) == 0 and index._root.children == {}
+
+
+@pytest.mark.asyncio
+async def test_directory_delta_applies_updates_and_removals():
+    graph = FakeGraph()
+    directory = DirectorySnapshot(max_age=60)
+    assert not directory.is_fresh()
+    assert await directory.sync(graph.get_json) == 3
+    assert directory.is_fresh()
+    assert [p.address for p in directory.search("jan")] == ["jan.desmedt@contoso.com", "jan.peeters@contoso.com"]
+
+    graph.next_delta = [
+        {"id": "u2", "@removed": {"reason": "changed"}},
+        {"id": "u3", "displayName": "Els Maes-Janssens"},      # only the changed property
+    ]
+    assert await directory.sync(graph.get_json) == 2
+    assert [p.name for p in directory.search("jan")] == ["Els Maes-Janssens", "Jan Peeters"]
+    assert directory.search("els")[0].address == "els.maes@contoso.com"
+    assert graph.urls[-1] == "delta:users"
+
+
+@pytest.mark.asyncio
+async def test_expired_directory_delta_token_resyncs():
+    graph = FakeGraph()
+    directory = DirectorySnapshot(max_age=60)
+    await directory.sync(graph.get_json)
+    graph.expired = True
+    assert await directory.sync(graph.get_json) == 3
+    assert len(directory.index) == 3
+
+
+@pytest.mark.asyncio
+async def test_correspondents_rank_by_frequency_and_sync_incrementally():
+    graph = FakeGraph()
+    index = CorrespondentIndex(max_age=60)
+    assert await index.sync(graph.get_json) == 3
+    assert [p.address for p in index.search("k")] == ["klant@colruyt.be"]
+    assert index.search("me")[0].address == "me@contoso.com"
+    assert index.index.score("klant@colruyt.be") == 2
+
+    graph.messages.insert(0, _msg("m4", "piet@lidl.be", "2026-03-04T09:00:00Z", to=["me@contoso.com"]))
+    assert await index.sync(graph.get_json) == 1          # m3 at the boundary is not counted twice
+    assert "receivedDateTime ge 2026-03-03T09:00:00Z" in graph.urls[-1]
+    assert index.index.score("piet@lidl.be") == 2
+    assert index.search("Piet")[0].name == "Piet"
+
+
+@pytest.mark.asyncio
+async def test_find_people_is_served_locally_when_fresh():
+    graph = FakeGraph()
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        return httpx.Response(500)
+
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+
+    async def no_contacts(query, top=5):
+        return []
+
+    repo._find_contacts = no_contacts
+    repo.directory = DirectorySnapshot(max_age=60)
+    repo.correspondents = CorrespondentIndex(max_age=60)
+    await repo.directory.sync(graph.get_json)
+    await repo.correspondents.sync(graph.get_json)
+
+    people = await repo.find_people("colruyt")
+    assert [p.address for p in people] == ["klant@colruyt.be"]
+    people = await repo.find_people("jan pe")
+    assert [p.address for p in people] == ["jan.peeters@contoso.com"]
+    assert calls == []
+    assert repo.directory.stats()["local_queries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_index_schedules_a_background_sync(monkeypatch):
+    graph = FakeGraph()
+    index = CorrespondentIndex(max_age=60)
+    assert not index.usable(graph.get_json)
+    await asyncio.sleep(0)
+    await index._sync_task
+    assert index.usable(graph.get_json)
+    assert index.stats() == {"people": 3, "syncs": 1, "local_queries": 1, "live_fallbacks": 1}
+
+
+def test_one_snapshot_per_tenant(monkeypatch):
+    monkeypatch.setattr(DirectorySnapshot, "_tenants", {})
+    a = DirectorySnapshot.for_tenant("t1")
+    assert DirectorySnapshot.for_tenant("t1") is a
+    assert DirectorySnapshot.for_tenant("t2") is not a
+    assert DirectorySnapshot.for_tenant(None) is None
+    monkeypatch.setenv("GRAPH_PEOPLE_INDEX", "0")
+    assert DirectorySnapshot.for_tenant("t3") is None
+    assert CorrespondentIndex.create() is None
@@ -0,0 +1,157 @@
+"""tests/test_prefetch.py — unit tests voor het vooraf extraheren van de top search_files hits.
+
+Geen Graph calls: zoekresultaten, de metadata-$batch en de downloads komen
+van een MockTransport; downloads kunnen vertraagd worden.
+
+Run:
+    python -m pytest tests/test_prefetch.py -v
+"""
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph import mcp_router
+from graph.prefetch import Prefetcher, _Budget
+from graph.repository import GraphRepository
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Files.Read"}
+
+_FILES = [
+    {"id": "f1", "name": "Offerte.docx.txt", "file": {}},
+    {"id": "dir", "name": "Archief", "folder": {}},
+    {"id": "f2", "name": "Prijzen.csv", "file": {}},
+    {"id": "f3", "name": "Foto.png", "file": {}},
+    {"id": "f4", "name": "Notities.md", "file": {}},
+    {"id": "f5", "name": "Planning.txt", "file": {}},
+]
+
+
+class FakeDrive:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.downloads: list[str] = []
+        self.lookups: list[str] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.host == "download.example":
+            fid = request.url.path.strip("/")
+            self.downloads.append(fid)
+            await asyncio.sleep(self.delay)
+            return httpx.Response(206, content=f"tekst van {fid}".encode())
+        if request.url.path.endswith("/$batch"):
+            responses = []
+            for sub in json.loads(request.content)["requests"]:
+                fid = sub["url"].split("/items/")[1].split("?")[0]
+                self.lookups.append(fid)
+                responses.append({"id": sub["id"], "status": 200, "body": self._item(fid)})
+            return httpx.Response(200, json={"responses": responses})
+        if "/search(" in request.url.path:
+            return httpx.Response(200, json={"value": _FILES})
+        fid = request.url.path.rsplit("/", 1)[1]
+        self.lookups.append(fid)
+        return httpx.Response(200, json=self._item(fid))
+
+    @staticmethod
+    def _item(fid: str) -> dict:
+        return {
+            "id": fid, "name": f"{fid}.txt", "size": 20, "cTag": "c1",
+            "@microsoft.graph.downloadUrl": f"https://download.example/{fid}",
+        }
+
+
+def _make_repo(drive: FakeDrive, prefetcher: Prefetcher | None = None) -> GraphRepository:
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(drive))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+    repo.prefetcher = prefetcher or Prefetcher(budget=_Budget(1024 * 1024))
+    return repo
+
+
+@pytest.mark.asyncio
+async def test_search_prefetches_top_readable_hits(monkeypatch):
+    monkeypatch.setenv("GRAPH_PREFETCH_TOP", "3")
+    drive = FakeDrive()
+    repo = _make_repo(drive)
+    await mcp_router._search_files(repo, query="offerte")
+    await asyncio.sleep(0.05)
+
+    # folder and png skipped; one $batch for the three lookups
+    assert sorted(drive.downloads) == ["f1", "f2", "f4"]
+    assert sorted(drive.lookups) == ["f1", "f2", "f4"]
+
+    drive.lookups.clear()
+    assert await repo.get_file_text("f1") == "tekst van f1"
+    texts = await repo.get_files_text_batch(["f2", "f5", "f4"])
+    assert texts == ["tekst van f2", "tekst van f5", "tekst van f4"]
+    assert drive.lookups == ["f5"]
+    assert repo.prefetcher.stats()["served"] == 3
+
+
+@pytest.mark.asyncio
+async def test_read_joins_a_running_prefetch():
+    drive = FakeDrive(delay=0.05)
+    repo = _make_repo(drive)
+    repo.prefetch_files([{"id": "f1", "name": "a.txt"}], top=3)
+    await asyncio.sleep(0.01)
+
+    assert await repo.get_file_text("f1") == "tekst van f1"
+    assert drive.downloads == ["f1"]
+    assert repo.prefetcher.stats()["served_running"] == 1
+
+
+@pytest.mark.asyncio
+async def test_prefetched_text_is_served_once():
+    drive = FakeDrive()
+    repo = _make_repo(drive)
+    repo.prefetch_files([{"id": "f1", "name": "a.txt"}], top=3)
+    await asyncio.sleep(0.02)
+    await repo.get_file_text("f1")
+    await repo.get_file_text("f1")
+    assert drive.downloads == ["f1", "f1"]
+
+
+@pytest.mark.asyncio
+async def test_entry_limit_cancels_oldest_running_prefetch():
+    drive = FakeDrive(delay=0.2)
+    repo = _make_repo(drive, Prefetcher(max_entries=2, budget=_Budget(1024 * 1024)))
+    repo.prefetch_files([{"id": "f1", "name": "a.txt"}, {"id": "f2", "name": "b.txt"}], top=3)
+    await asyncio.sleep(0.01)
+    repo.prefetch_files([{"id": "f3", "name": "c.txt"}], top=3)
+    await asyncio.sleep(0.01)
+
+    stats = repo.prefetcher.stats()
+    assert stats["cancelled"] == 1 and stats["unused"] == 1 and stats["entries"] == 2
+    assert await repo.prefetcher.take("f1") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_drops_oldest_unread_text():
+    budget = _Budget(limit=20)
+    drive = FakeDrive()
+    repo = _make_repo(drive, Prefetcher(budget=budget))
+    repo.prefetch_files([{"id": "f1", "name": "a.txt"}, {"id": "f2", "name": "b.txt"}], top=3)
+    await asyncio.sleep(0.02)
+
+    # two texts of 12 bytes do not fit in 20: the older one is dropped
+    assert repo.prefetcher.stats()["entries"] == 1
+    assert budget.used <= 20
+    assert await repo.prefetcher.take("f2") == "tekst van f2"
+    assert budget.used == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_prefetch_is_not_served():
+    now = [0.0]
+    drive = FakeDrive()
+    repo = _make_repo(drive, Prefetcher(ttl=60, budget=_Budget(1024), clock=lambda: now[0]))
+    repo.prefetch_files([{"id": "f1", "name": "a.txt"}], top=3)
+    await asyncio.sleep(0.02)
+    now[0] = 61
+    assert await repo.prefetcher.take("f1") is None
+    assert repo.prefetcher.stats()["unused"] == 1
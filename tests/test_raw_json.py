@@ -0,0 +1,119 @@
+"""tests/test_raw_json.py — unit tests voor het raw-JSON pad van de lijst-endpoints.
+
+Geen echte Graph calls: de raw httpx client draait op een MockTransport en
+de SDK client wordt niet aangeroepen.
+
+Run:
+    python -m pytest tests/test_raw_json.py -v
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph.repository import GraphRepository
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+
+_MESSAGE = {
+    "id": "m1",
+    "subject": "Offerte",
+    "from": {"emailAddress": {"name": "Jan Peeters", "address": "jan@contoso.com"}},
+    "receivedDateTime": "2026-03-02T08:15:00Z",
+    "webLink": "https://outlook/m1",
+}
+
+
+def _make_repo(handler, raw_json=True) -> GraphRepository:
+    raw = httpx.AsyncClient(
+        base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler)
+    )
+    return GraphRepository(
+        _SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw, raw_json=raw_json
+    )
+
+
+def test_raw_json_defaults_to_env(monkeypatch):
+    monkeypatch.setenv("GRAPH_RAW_JSON", "1")
+    assert _make_repo(lambda r: None, raw_json=None).raw_json is True
+    monkeypatch.delenv("GRAPH_RAW_JSON")
+    assert _make_repo(lambda r: None, raw_json=None).raw_json is False
+
+
+@pytest.mark.asyncio
+async def test_inbox_maps_json_to_email():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"value": [_MESSAGE, {"id": "m2", "receivedDateTime": "2026-03-01T00:00:00Z"}]})
+
+    emails = await _make_repo(handler).get_inbox()
+
+    assert seen[0].url.path == "/v1.0/me/mailFolders/inbox/messages"
+    assert seen[0].url.params["$orderby"] == "receivedDateTime DESC"
+    assert seen[0].headers["Authorization"] == "Bearer tok"
+    assert emails[0].sender_name == "Jan Peeters"
+    assert emails[0].sender_email == "jan@contoso.com"
+    assert emails[0].received.year == 2026
+    assert emails[1].subject == "" and emails[1].sender_email is None
+
+
+@pytest.mark.asyncio
+async def test_search_emails_sends_search_and_top():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"value": [_MESSAGE]})
+
+    emails = await _make_repo(handler).search_emails(sender="jan", subject="Offerte", top=5)
+
+    params = seen[0].url.params
+    assert seen[0].url.path == "/v1.0/me/messages"
+    assert params["$top"] == "5"
+    assert params["$search"] == '"subject:Offerte* AND from:jan"' and "$filter" not in params
+    assert [e.id for e in emails] == ["m1"]
+
+
+@pytest.mark.asyncio
+async def test_drive_search_maps_json_to_file_without_drive_lookup():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"value": [
+            {
+                "id": "f1", "name": "Budget 2026.xlsx", "size": 2048,
+                "createdDateTime": "2026-01-05T10:00:00Z",
+                "lastModifiedDateTime": "2026-02-01T10:00:00Z",
+                "file": {"mimeType": "application/vnd.ms-excel"},
+                "parentReference": {"id": "root-id", "driveId": "d1"},
+                "webUrl": "https://onedrive/f1",
+            },
+            {"id": "d2", "name": "Archief", "folder": {"childCount": 3}},
+        ]})
+
+    files = await _make_repo(handler).search_drive_items_sdk("o'brien budget", top=10)
+
+    assert len(seen) == 1
+    assert seen[0].url.raw_path.startswith(b"/v1.0/me/drive/root/search(q='o%27%27brien%20budget')")
+    assert files[0].name == "Budget 2026.xlsx" and not files[0].is_folder
+    assert files[0].parent_id == "root-id" and files[0].modified.month == 2
+    assert files[1].is_folder and files[1].size is None
+
+
+@pytest.mark.asyncio
+async def test_drive_search_with_explicit_drive():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"value": []})
+
+    assert await _make_repo(handler).search_drive_items_sdk("x", drive_id="b!abc") == []
+    assert seen[0].url.raw_path.startswith(b"/v1.0/drives/b%21abc/root/search(q='x')")
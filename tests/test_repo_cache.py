@@ -0,0 +1,151 @@
+"""tests/test_repo_cache.py — unit tests voor RepositoryCache.
+
+Geen Graph calls: de factory geeft een dummy repository terug.
+
+Run:
+    python -m pytest tests/test_repo_cache.py -v
+"""
+import asyncio
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph.repo_cache import RepositoryCache, user_key
+
+
+def _jwt(oid: str, tid: str = "t1", nonce: str = "") -> str:
+    payload = base64.urlsafe_b64encode(
+        json.dumps({"oid": oid, "tid": tid, "n": nonce}).encode()
+    ).decode().rstrip("=")
+    return f"eyJhbGciOiJub25lIn0.{payload}.sig"
+
+
+class FakeRepo:
+    def __init__(self, credential):
+        self.credential = credential
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _make_cache(**kwargs):
+    async def verify(token):
+        return json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "==")).get("oid")
+    kwargs.setdefault("verify", verify)
+    return RepositoryCache(factory=FakeRepo, **kwargs)
+
+
+def test_user_key_uses_identity_not_token():
+    assert user_key(_jwt("u1", nonce="a")) == user_key(_jwt("u1", nonce="b")) == "t1:u1"
+    assert user_key("opaque-token").startswith("sha256:")
+
+
+@pytest.mark.asyncio
+async def test_token_refresh_reuses_repository():
+    cache = _make_cache()
+    first = await cache.get(_jwt("u1", nonce="a"))
+    second = await cache.get(_jwt("u1", nonce="b"))
+
+    assert first is second
+    assert second.credential.token == _jwt("u1", nonce="b")
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_size_bound_evicts_least_recently_used():
+    cache = _make_cache(max_size=2)
+    a = await cache.get(_jwt("a"))
+    await cache.get(_jwt("b"))
+    await cache.get(_jwt("a"))          # a is now most recent
+    await cache.get(_jwt("c"))          # evicts b
+
+    assert len(cache) == 2
+    assert await cache.get(_jwt("a")) is a
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_entries_expire():
+    clock = FakeClock()
+    cache = _make_cache(ttl=60, clock=clock)
+    a = await cache.get(_jwt("a"))
+    clock.now = 61
+
+    assert await cache.get(_jwt("a")) is not a
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_forged_token_is_rejected():
+    async def verify(token):
+        claims = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))
+        return "u1" if claims["n"] == "real" else "someone-else"
+
+    cache = _make_cache(verify=verify)
+    original = await cache.get(_jwt("u1", nonce="real"))
+
+    with pytest.raises(PermissionError):
+        await cache.get(_jwt("u1", nonce="forged"))
+    assert original.credential.token == _jwt("u1", nonce="real")
+
+
+@pytest.mark.asyncio
+async def test_parallel_first_calls_share_one_verification_and_repository():
+    verified = []
+    created = []
+
+    async def verify(token):
+        verified.append(token)
+        await asyncio.sleep(0.01)
+        return "u1"
+
+    def factory(credential):
+        created.append(credential)
+        return FakeRepo(credential)
+
+    cache = RepositoryCache(factory=factory, verify=verify)
+    repos = await asyncio.gather(*[cache.get(_jwt("u1", nonce="a")) for _ in range(5)])
+
+    assert all(r is repos[0] for r in repos)
+    assert len(verified) == 1 and len(created) == 1
+    # One lookup per caller: one miss, the callers that joined it are hits.
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 4)
+
+    # A refreshed token arriving in parallel with the first one still reuses the repository.
+    again = await asyncio.gather(cache.get(_jwt("u1", nonce="b")), cache.get(_jwt("u1", nonce="c")))
+    assert again[0] is again[1] is repos[0] and len(created) == 1
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 6)
+
+
+@pytest.mark.asyncio
+async def test_entry_evicted_during_verification_is_not_returned_stale():
+    clock = FakeClock()
+    gate = asyncio.Event()
+
+    async def verify(token):
+        claims = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))
+        if claims["n"] == "slow":
+            await gate.wait()
+        return claims["oid"]
+
+    cache = _make_cache(verify=verify, max_size=1, clock=clock)
+    a = await cache.get(_jwt("a"))
+    refresh = asyncio.ensure_future(cache.get(_jwt("a", nonce="slow")))
+    await asyncio.sleep(0)
+    await cache.get(_jwt("b"))          # evicts a while its refresh is being verified
+    gate.set()
+
+    fresh = await refresh
+    assert fresh is not a and fresh.credential.token == _jwt("a", nonce="slow")
+    assert len(cache) == 1 and cache.repositories() == [fresh]
@@ -0,0 +1,144 @@
+"""tests/test_search_everything.py — unit tests voor search_everything (Microsoft Search via /search/query).
+
+Geen echte Graph calls: de raw httpx client draait op een MockTransport die
+de $batch met één /search/query per entiteitstype beantwoordt.
+
+Run:
+    python -m pytest tests/test_search_everything.py -v
+"""
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph import mcp_router
+from graph.repository import GraphBatchError, GraphRepository
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Mail.Read"}
+
+_HITS = {
+    "message": [
+        {"hitId": "m1", "rank": 1, "summary": "De <c0>Colruyt</c0> offerte<ddd/>", "resource": {
+            "@odata.type": "#microsoft.graph.message", "id": "m1", "subject": "Offerte Colruyt",
+            "receivedDateTime": "2026-03-02T08:00:00Z", "webLink": "https://outlook/m1",
+            "from": {"emailAddress": {"name": "Jan", "address": "jan@contoso.com"}},
+        }},
+        {"hitId": "m2", "rank": 2, "summary": "RE: <c0>Colruyt</c0>", "resource": {
+            "id": "m2", "subject": "RE: Colruyt", "receivedDateTime": "2026-03-01T08:00:00Z",
+        }},
+    ],
+    "driveItem": [
+        {"hitId": "f1", "rank": 1, "summary": "Prijzen &amp; voorwaarden <c0>Colruyt</c0>", "resource": {
+            "id": "f1", "name": "Colruyt.docx", "webUrl": "https://onedrive/f1",
+            "lastModifiedDateTime": "2026-02-20T10:00:00Z",
+            "createdBy": {"user": {"displayName": "Els", "email": "els@contoso.com"}},
+            "lastModifiedBy": {"user": {"displayName": "Els", "email": "els@contoso.com"}},
+        }},
+    ],
+    "event": [
+        {"hitId": "e1", "rank": 1, "summary": "Overleg <c0>Colruyt</c0>", "resource": {
+            "id": "e1", "subject": "Overleg Colruyt",
+            "start": {"dateTime": "2026-04-01T09:00:00.0000000", "timeZone": "UTC"},
+        }},
+    ],
+}
+
+
+class FakeSearch:
+    """Answers $batch calls with one /search/query sub-request per entity type."""
+
+    def __init__(self, failing: set[str] = frozenset()):
+        self.failing = failing
+        self.calls: list[dict] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/$batch")
+        payload = json.loads(request.content)
+        self.calls.append(payload)
+        responses = []
+        for sub in payload["requests"]:
+            assert sub["method"] == "POST" and sub["url"] == "/search/query"
+            search = sub["body"]["requests"][0]
+            (entity,) = search["entityTypes"]
+            if entity in self.failing:
+                responses.append({"id": sub["id"], "status": 400, "body": {
+                    "error": {"code": "BadRequest", "message": f"{entity} not allowed"}}})
+                continue
+            hits = _HITS[entity][: search["size"]]
+            responses.append({"id": sub["id"], "status": 200, "body": {"value": [
+                {"searchTerms": ["colruyt"], "hitsContainers": [{"hits": hits, "total": len(hits)}]}
+            ]}})
+        return httpx.Response(200, json={"responses": responses})
+
+
+def _make_repo(handler) -> GraphRepository:
+    raw = httpx.AsyncClient(
+        base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler)
+    )
+    return GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+
+
+@pytest.mark.asyncio
+async def test_one_round_trip_ranked_across_types():
+    fake = FakeSearch()
+    repo = _make_repo(fake)
+    results = await repo.search_everything("Colruyt", top=10)
+
+    assert len(fake.calls) == 1
+    assert [r["body"]["requests"][0]["entityTypes"] for r in fake.calls[0]["requests"]] == [
+        ["message"], ["event"], ["driveItem"]
+    ]
+    # rank 1 of every type first, then rank 2
+    assert [(r.type, r.id) for r in results] == [
+        ("email", "m1"), ("event", "e1"), ("file", "f1"), ("email", "m2")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_hits_are_mapped_with_clean_snippets_and_people():
+    repo = _make_repo(FakeSearch())
+    by_id = {r.id: r for r in await repo.search_everything("Colruyt")}
+
+    mail, doc, event = by_id["m1"], by_id["f1"], by_id["e1"]
+    assert mail.title == "Offerte Colruyt" and mail.web_link == "https://outlook/m1"
+    assert mail.snippet == "De Colruyt offerte …"
+    assert [p.address for p in mail.people] == ["jan@contoso.com"]
+    assert doc.title == "Colruyt.docx" and doc.snippet == "Prijzen & voorwaarden Colruyt"
+    assert [p.name for p in doc.people] == ["Els"]
+    assert event.timestamp.isoformat() == "2026-04-01T09:00:00"
+
+
+@pytest.mark.asyncio
+async def test_types_and_top_limit_the_search():
+    fake = FakeSearch()
+    repo = _make_repo(fake)
+    results = await repo.search_everything("Colruyt", top=1, types=["email"])
+
+    assert [r.id for r in results] == ["m1"]
+    (sub,) = fake.calls[0]["requests"]
+    assert sub["body"]["requests"][0]["size"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_type_is_skipped_unless_all_fail():
+    repo = _make_repo(FakeSearch(failing={"event"}))
+    assert {r.type for r in await repo.search_everything("Colruyt")} == {"email", "file"}
+
+    repo = _make_repo(FakeSearch(failing={"message", "event", "driveItem"}))
+    with pytest.raises(GraphBatchError):
+        await repo.search_everything("Colruyt")
+
+
+@pytest.mark.asyncio
+async def test_tool_parses_types_and_rejects_unknown_ones():
+    repo = _make_repo(FakeSearch())
+    out = await mcp_router._search_everything(repo, "Colruyt", types="file, event")
+    assert [r["type"] for r in out] == ["file", "event"]
+
+    out = await mcp_router._search_everything(repo, "Colruyt", types="chat")
+    assert "error" in out
@@ -0,0 +1,99 @@
+"""tests/test_section_select.py — unit tests voor BM25 en de query-gestuurde sectieselectie van read_file.
+
+Run:
+    python -m pytest tests/test_section_select.py -v
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph import mcp_router
+from graph.bm25 import BM25, tokenize
+from graph.repository import GraphRepository
+from graph.section_select import select_sections, split_chunks
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Files.Read"}
+
+_FILLER = "Dit hoofdstuk beschrijft algemene afspraken over werkuren, verlof en opleiding op kantoor. "
+
+
+def _policy(chapters: int = 60) -> str:
+    parts = []
+    for i in range(chapters):
+        parts.append(f"Hoofdstuk {i + 1}")
+        body = _FILLER * 6
+        if i == 47:
+            body += "Onkosten voor maaltijden worden terugbetaald tot 25 euro per dag, artikel ONK-17. "
+        parts.append(body)
+        parts.append("")
+    return "\n".join(parts)
+
+
+def test_bm25_prefers_rare_terms_and_tokenizes_codes():
+    assert tokenize("Artikel ONK-17, één regel") == ["artikel", "onk", "17", "één", "regel"]
+    docs = [tokenize(t) for t in ("verlof en verlof", "verlof en onkosten", "opleiding")]
+    scores = BM25(docs).scores(tokenize("onkosten verlof"))
+    assert scores.index(max(scores)) == 1
+    assert scores[2] == 0
+
+
+def test_chunks_keep_paragraphs_and_sheet_headings():
+    text = "=== Sheet: Tarieven ===\n" + "\n".join(f"rij {i}\t{i * 10}" for i in range(300))
+    chunks = split_chunks(text, target=200)
+    assert len(chunks) > 5
+    assert all(c.heading == "=== Sheet: Tarieven ===" for c in chunks)
+    assert all(len(c.text) <= 220 for c in chunks)
+    assert "\n".join(c.text for c in chunks).split("\n") == text.split("\n")
+
+
+def test_relevant_section_past_the_head_is_selected_within_budget():
+    text = _policy()
+    assert len(text) > 30_000 and text.index("ONK-17") > 12_000
+    out = select_sections(text, "terugbetaling onkosten maaltijden", 12_000)
+    assert len(out) <= 12_000
+    assert "tot 25 euro per dag" in out
+    assert out.index("[...]") < out.index("ONK-17")
+    assert "sections selected for query 'terugbetaling onkosten maaltijden'" in out
+
+
+def test_short_text_and_empty_query_fall_back():
+    assert select_sections("kort document", "onkosten", 12_000) == "kort document"
+    out = select_sections(_policy(), "   ", 12_000)
+    assert out.startswith("Hoofdstuk 1\n") and out.endswith("[... content truncated ...]")
+
+
+@pytest.mark.asyncio
+async def test_read_file_with_query_reads_further_and_selects():
+    content = _policy().encode()
+    ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "download.example":
+            start, end = map(int, request.headers["Range"].removeprefix("bytes=").split("-"))
+            ranges.append((start, end))
+            return httpx.Response(206, content=content[start:end + 1])
+        item = {
+            "id": "f1", "name": "Beleid.txt", "size": len(content), "cTag": "c1",
+            "@microsoft.graph.downloadUrl": "https://download.example/f1",
+        }
+        if request.url.path.endswith("/$batch"):
+            return httpx.Response(200, json={"responses": [{"id": "0", "status": 200, "body": item}]})
+        return httpx.Response(200, json=item)
+
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+
+    head = await repo.get_file_text("f1")
+    assert "ONK-17" not in head
+
+    out = await mcp_router._read_file(repo, file_id="f1", query="maaltijden onkosten")
+    assert "ONK-17" in out and len(out) <= 12_000
+    assert ranges[-1] == (0, len(content) - 1)
+
+    batch = await mcp_router._read_multiple_files(repo, file_ids="f1", query="maaltijden")
+    assert len(batch) == 1 and "ONK-17" in batch[0] and len(batch[0]) <= 12_000
@@ -0,0 +1,130 @@
+"""tests/test_text_cache.py — unit tests voor TextCache en het gebruik ervan in read_file.
+
+Geen Graph calls: metadata en downloads komen van een MockTransport.
+
+Run:
+    python -m pytest tests/test_text_cache.py -v
+"""
+import os
+import sys
+import threading
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_credential import StaticTokenCredential
+from graph.repository import GraphRepository
+from graph.text_cache import TextCache, text_key
+
+_SETTINGS = {"clientId": "c", "tenantId": "t", "graphUserScopes": "User.Read Files.Read"}
+
+
+def test_key_follows_content_tag():
+    item = {"id": "f1", "cTag": "c1", "parentReference": {"driveId": "d"}}
+    assert text_key(item, 100) != text_key({**item, "cTag": "c2"}, 100)
+    assert text_key(item, 100) != text_key(item, 200)
+    assert text_key({"id": "f1"}, 100) is None
+
+
+def test_memory_tier_evicts_by_size():
+    cache = TextCache(max_memory_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    cache.get("a")                   # a is now most recent
+    cache.put("c", "12345")          # evicts b
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["memory_bytes"] == 10
+    assert stats["hit_rate"] == round(2 / 3, 3)
+
+
+def test_disk_tier_survives_restart_and_is_bounded(tmp_path):
+    cache = TextCache(directory=tmp_path, max_disk_bytes=12)
+    cache.put("a", "123456")
+    cache.put("b", "123456")
+
+    reopened = TextCache(directory=tmp_path, max_disk_bytes=12)
+    assert reopened.get("a") == "123456"
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.get("a") == "123456"
+    assert reopened.stats()["memory_hits"] == 1
+
+    reopened.put("c", "123456")      # b is least recently used on disk
+    assert len(list(tmp_path.glob("*.txt"))) == 2
+    assert TextCache(directory=tmp_path).get("b") is None
+
+
+@pytest.mark.asyncio
+async def test_unchanged_file_is_downloaded_once():
+    downloads = []
+    ctag = {"value": "c1"}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "download.example":
+            downloads.append(request)
+            return httpx.Response(206, content=b"hello world")
+        return httpx.Response(200, json={
+            "id": "f1", "name": "notes.txt", "size": 11, "cTag": ctag["value"],
+            "@microsoft.graph.downloadUrl": "https://download.example/f1",
+        })
+
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+    repo.text_cache = TextCache()
+
+    assert await repo.get_file_text("f1") == "hello world"
+    assert await repo.get_file_text("f1") == "hello world"
+    assert len(downloads) == 1
+
+    ctag["value"] = "c2"
+    await repo.get_file_text("f1")
+    assert len(downloads) == 2
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_read_and_written_off_the_event_loop(tmp_path, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "download.example":
+            return httpx.Response(206, content=b"hello world")
+        return httpx.Response(200, json={
+            "id": "f1", "name": "notes.txt", "size": 11, "cTag": "c1",
+            "@microsoft.graph.downloadUrl": "https://download.example/f1",
+        })
+
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+    repo.text_cache = TextCache(tmp_path)
+    threads = []
+    for name in ("get", "put"):
+        method = getattr(repo.text_cache, name)
+        monkeypatch.setattr(repo.text_cache, name, lambda *a, m=method: threads.append(threading.current_thread()) or m(*a))
+
+    assert await repo.get_file_text("f1") == "hello world"
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    assert await repo.get_file_text("f1") == "hello world"     # memory tier: no thread
+    assert len(threads) == 2 and repo.text_cache.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["notes.txt", "report.docx"])
+async def test_file_without_size_is_downloaded_whole(name):
+    ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "download.example":
+            ranges.append(request.headers.get("Range"))
+            return httpx.Response(200, content=b"hello world")
+        return httpx.Response(200, json={
+            "id": "f1", "name": name, "cTag": "c1",
+            "@microsoft.graph.downloadUrl": "https://download.example/f1",
+        })
+
+    raw = httpx.AsyncClient(base_url="https://graph.microsoft.com/v1.0", transport=httpx.MockTransport(handler))
+    repo = GraphRepository(_SETTINGS, credential=StaticTokenCredential("tok"), raw_client=raw)
+
+    assert await repo.get_file_text("f1") == "hello world"
+    assert ranges == [None]